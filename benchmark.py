@@ -0,0 +1,391 @@
+'''
+Benchmarks the extract, transform and load paths on synthetic data and compares the results with a saved baseline.
+Usage:
+    python benchmark.py --sizes 1000 100000 --output results.json
+    python benchmark.py --sizes 1000 100000 --baseline results.json --threshold 0.2  # exits with 1 on a regression
+The cold-start import time of the CSV to CSV path is measured too, in fresh interpreters.
+Synthetic inputs are generated once per size in --directory (default ./data/benchmark) and reused by later runs.
+The transform.json_to_dataframe case reads at most JSON_RECORDS_CAP records, since they are all held as dicts.
+'''
+
+from extract import FileExtract, DatabaseExtract
+from transform import Transformer
+from load import Loader
+from instrument import MetricsCollector
+from optional import BACKENDS
+import argparse
+import datetime
+import gc
+import itertools
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+try:  # pyarrow is only required for the Parquet case
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+MODELS = ['Mazda RX4', 'Datsun 710', 'Hornet 4 Drive', 'Valiant', 'Duster 360', 'Merc 240D', 'Fiat 128',
+          'Honda Civic', 'Toyota Corolla', 'Camaro Z28', 'Porsche 914-2', 'Lotus Europa', 'Ferrari Dino', 'Volvo 142E']
+NAMES = ['Alice', 'Bob', 'Charlie', 'David', 'Eva', 'Fiona', 'George', 'Hannah', 'Ian', 'Julia', 'Kyle', 'Liam', 'Mia',
+         'Nora', 'Oliver', 'Penelope', 'Quinn', 'Rachel', 'Steve', 'Tina']
+COUNTRIES = ['USA', 'Canada', 'UK', 'Australia', 'Germany', 'France', 'Spain', 'Italy', 'Brazil', 'Argentina']
+CITIES = ['Wonderland', 'Springfield', 'Riverdale', 'Gotham', 'Metropolis', 'Hill Valley', 'Sunnydale', 'Twin Peaks']
+PRODUCTS = ['Widget', 'Gadget', 'Doohickey', 'Gizmo', 'Thingamajig']
+CHUNK_ROWS = 1_000_000  # rows generated and written at a time, so sizes up to 10^8 rows fit in memory
+# json_normalize needs every record as a Python dict at once, so transform.json_to_dataframe times at most this many
+JSON_RECORDS_CAP = 1_000_000
+
+
+def _chunks(rows: int, chunk_rows: int = CHUNK_ROWS):
+    '''
+    Yields (start, size) pairs covering rows in steps of chunk_rows.
+    '''
+    for start in range(0, rows, chunk_rows):
+        yield start, min(chunk_rows, rows - start)
+
+
+def generate_tabular(path: str, rows: int, seed: int = 0) -> str:
+    '''
+    Writes a CSV with the columns of data/tabular.csv (model, mpg, cyl, ..., carb) and random values. About 1% of the
+    model values are missing.
+    :param path: The path of the CSV file.
+    :param rows: The number of rows.
+    :param seed: The random seed. Default is 0.
+    :return: The path.
+    '''
+    generator = np.random.default_rng(seed)
+    for start, size in _chunks(rows):
+        model = np.array(MODELS, dtype=object)[generator.integers(0, len(MODELS), size)]
+        model[generator.random(size) < 0.01] = None
+        pd.DataFrame({
+            'model': model, 'mpg': generator.uniform(10, 34, size).round(1),
+            'cyl': generator.choice([4, 6, 8], size), 'disp': generator.uniform(70, 472, size).round(1),
+            'hp': generator.integers(52, 335, size), 'drat': generator.uniform(2.7, 4.9, size).round(2),
+            'wt': generator.uniform(1.5, 5.4, size).round(3), 'qsec': generator.uniform(14.5, 22.9, size).round(2),
+            'vs': generator.integers(0, 2, size), 'am': generator.integers(0, 2, size),
+            'gear': generator.integers(3, 6, size), 'carb': generator.choice([1, 2, 3, 4, 6, 8], size),
+        }).to_csv(path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+    return path
+
+
+def generate_array_column(path: str, rows: int, max_items: int = 3, delimiter: str = '|', seed: int = 0) -> str:
+    '''
+    Writes a CSV like data/tabular_with_array_column.csv: a name column and a phone_numbers column holding one to
+    max_items delimited values.
+    :param path: The path of the CSV file.
+    :param rows: The number of rows.
+    :param max_items: The largest number of values in an array cell. Default is 3.
+    :param delimiter: The delimiter between array values. Default is |.
+    :param seed: The random seed. Default is 0.
+    :return: The path.
+    '''
+    generator = np.random.default_rng(seed)
+    for start, size in _chunks(rows):
+        counts = generator.integers(1, max_items + 1, size)
+        numbers = pd.Series(generator.integers(0, 10_000_000, counts.sum())).astype(str).str.zfill(7)
+        numbers = '555-' + numbers.str[:3] + '-' + numbers.str[3:]
+        owners = np.repeat(np.arange(size), counts)
+        phone_numbers = numbers.groupby(owners).agg(delimiter.join)
+        pd.DataFrame({'name': np.array(NAMES, dtype=object)[generator.integers(0, len(NAMES), size)],
+                      'phone_numbers': phone_numbers.to_numpy()}) \
+            .to_csv(path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+    return path
+
+
+def generate_nested_json(path: str, records: int, max_orders: int = 3, seed: int = 0) -> str:
+    '''
+    Writes JSON Lines records shaped like data/json.json: id, name, email, a nested address and a list of orders.
+    :param path: The path of the JSON Lines file.
+    :param records: The number of records.
+    :param max_orders: The largest number of orders per record. Default is 3.
+    :param seed: The random seed. Default is 0.
+    :return: The path.
+    '''
+    generator = np.random.default_rng(seed)
+    with open(path, 'w') as file:
+        for start, size in _chunks(records, CHUNK_ROWS // 10):
+            names = generator.integers(0, len(NAMES), size)
+            cities = generator.integers(0, len(CITIES), size)
+            order_counts = generator.integers(1, max_orders + 1, size)
+            products = generator.integers(0, len(PRODUCTS), order_counts.sum())
+            quantities = generator.integers(1, 10, order_counts.sum())
+            offsets = np.concatenate([[0], np.cumsum(order_counts)])
+            lines = []
+            for index in range(size):
+                record_id = start + index + 1
+                orders = [{'order_id': record_id * 100 + number, 'product': PRODUCTS[products[offset]],
+                           'quantity': int(quantities[offset])}
+                          for number, offset in enumerate(range(offsets[index], offsets[index + 1]), start=1)]
+                name = NAMES[names[index]]
+                address = {'street': f'{record_id} Apple St', 'city': CITIES[cities[index]],
+                           'zip': f'{record_id % 100_000:05d}'}
+                lines.append(json.dumps({'id': record_id, 'name': name, 'email': f'{name.lower()}{record_id}@example.com',
+                                         'address': address, 'orders': orders}))
+            file.write('\n'.join(lines) + '\n')
+    return path
+
+
+def generate_database(path: str, rows: int, table: str = 'people', batch_size: int = 100_000, seed: int = 0) -> str:
+    '''
+    Creates a SQLite database with a people table (name, age, country) like data/database.db, inserting rows in
+    batches with executemany inside a single transaction.
+    :param path: The path of the database file. An existing table of the same name is replaced.
+    :param rows: The number of rows.
+    :param table: The table name. Default is people.
+    :param batch_size: The number of rows per executemany call. Default is 100,000.
+    :param seed: The random seed. Default is 0.
+    :return: The path.
+    '''
+    generator = np.random.default_rng(seed)
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute('PRAGMA journal_mode = OFF')  # a generated file needs no crash recovery
+        conn.execute('PRAGMA synchronous = OFF')
+        conn.execute(f'DROP TABLE IF EXISTS {table}')
+        conn.execute(f'CREATE TABLE {table} (name TEXT, age INTEGER, country TEXT)')
+        with conn:
+            for _, size in _chunks(rows, batch_size):
+                batch = zip(np.array(NAMES)[generator.integers(0, len(NAMES), size)].tolist(),
+                            generator.integers(20, 81, size).tolist(),
+                            np.array(COUNTRIES)[generator.integers(0, len(COUNTRIES), size)].tolist())
+                conn.executemany(f'INSERT INTO {table} (name, age, country) VALUES (?, ?, ?)', batch)
+    finally:
+        conn.close()
+    return path
+
+
+def generate_inputs(directory: str, rows: int) -> dict:
+    '''
+    Generates (or reuses) every synthetic input of a size.
+    :param directory: The directory holding the inputs.
+    :param rows: The number of rows (or records) of each input.
+    :return: A dictionary of input kind (tabular, array, json, database) to path, plus an output directory.
+    '''
+    os.makedirs(directory, exist_ok=True)
+    generators = {'tabular': (generate_tabular, 'csv'), 'array': (generate_array_column, 'csv'),
+                  'json': (generate_nested_json, 'jsonl'), 'database': (generate_database, 'db')}
+    inputs = {}
+    for kind, (generate, extension) in generators.items():
+        path = os.path.join(directory, f'{kind}_{rows}.{extension}')
+        if not os.path.exists(path):
+            temp_path = f'{path}.tmp'
+            generate(temp_path, rows)
+            os.replace(temp_path, path)  # an interrupted run never leaves a partial input behind
+        inputs[kind] = path
+    inputs['output'] = os.path.join(directory, 'output')  # where the load cases write
+    os.makedirs(inputs['output'], exist_ok=True)
+    return inputs
+
+
+def _read_tabular(inputs):
+    return FileExtract().read_tabular(delimiter=',', file_path=inputs['tabular'])
+
+
+def _consume(iterator) -> None:
+    for _ in iterator:
+        pass
+
+
+def _database(inputs) -> DatabaseExtract:
+    return DatabaseExtract(connection_url=f'sqlite:///{os.path.abspath(inputs["database"])}')
+
+
+def _json_records(inputs) -> list:
+    with open(inputs['json'], 'r') as file:
+        return [json.loads(line) for line in itertools.islice(file, JSON_RECORDS_CAP)]
+
+
+# Every case is (setup, run): setup prepares the arguments of run from the generated inputs and is not timed.
+CASES = {
+    'extract.read_tabular': (lambda inputs: (inputs,), _read_tabular),
+    'extract.read_tabular_chunks': (
+        lambda inputs: (inputs,),
+        lambda inputs: _consume(FileExtract().read_tabular_chunks(',', inputs['tabular'], chunk_rows=100_000))),
+    'extract.read_json_lines': (
+        lambda inputs: (inputs,), lambda inputs: _consume(FileExtract().read_json_lines(inputs['json']))),
+    'extract.query': (lambda inputs: (_database(inputs),), lambda database: database.query('SELECT * FROM people')),
+    'extract.query_batches': (
+        lambda inputs: (_database(inputs),),
+        lambda database: _consume(database.query_batches('SELECT * FROM people', batch_size=100_000))),
+    'transform.replace_and_fill': (
+        lambda inputs: (_read_tabular(inputs),),
+        lambda data: Transformer(raw_data=data).replace_values('cyl', 4, 40).fill_missing_values('model')),
+    'transform.explode_column': (
+        lambda inputs: (FileExtract().read_tabular(delimiter=',', file_path=inputs['array']),),
+        lambda data: Transformer(raw_data=data).explode_column('phone_numbers', delimiter='|')),
+    'transform.json_to_dataframe': (
+        lambda inputs: (_json_records(inputs),),
+        lambda records: Transformer(raw_data=records).json_to_dataframe(record_path='orders',
+                                                                        meta=['id', ['address', 'city']])),
+    'load.write_to_file': (
+        lambda inputs: (_read_tabular(inputs), os.path.join(inputs['output'], 'output.csv')),
+        lambda data, path: Loader(data=data).write_to_file(path=path)),
+    'load.write_to_parquet': (
+        lambda inputs: (_read_tabular(inputs), os.path.join(inputs['output'], 'output.parquet')),
+        lambda data, path: Loader(data=data).write_to_parquet(path=path)),
+}
+
+
+# What a CSV to CSV job imports, timed in a fresh interpreter, which reports the seconds and the backends it loaded
+IMPORT_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+from extract import FileExtract
+from transform import Transformer
+from load import Loader
+seconds = time.perf_counter() - start
+print(json.dumps({'seconds': seconds, 'backends': sorted(set(sys.argv[1:]) & set(sys.modules))}))
+'''
+
+
+def measure_import_time(repeat: int = 5) -> dict:
+    '''
+    Measures the cold-start cost of the common CSV to CSV path: the time to import FileExtract, Transformer and Loader
+    in a fresh interpreter, and which optional backends (see optional.BACKENDS) that loads. A backend loaded at import
+    time is a regression even if the time is within the threshold.
+    :param repeat: The number of fresh interpreters to time. The fastest is kept. Default is 5.
+    :return: A dictionary of seconds and backends (the backends imported).
+    '''
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT, *BACKENDS], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout
+        runs.append(json.loads(output))
+    return min(runs, key=lambda run: run['seconds'])
+
+
+def _commit() -> str:
+    '''
+    Returns the current git commit, or None outside a git checkout.
+    '''
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes: list, directory: str = './data/benchmark', cases: list = None, repeat: int = 3,
+                   memory: bool = True, import_time: bool = True) -> dict:
+    '''
+    Times each case on the generated inputs of each size, keeping the fastest of repeat runs, and measures its peak
+    memory and per-method breakdown in one more run with instrument.MetricsCollector (tracemalloc slows code down, so
+    it is never on while timing).
+    :param sizes: The input sizes in rows (e.g. - [1000, 100000]).
+    :param directory: The directory holding the generated inputs. Default is ./data/benchmark.
+    :param cases: The names of the cases to run (see CASES). Runs every case if not provided.
+    :param repeat: The number of timed runs per case and size. Default is 3.
+    :param memory: Whether to measure peak memory. Default is True.
+    :param import_time: Whether to measure the cold-start import time (see measure_import_time) as the import.csv_to_csv
+                        case, under a size of 0. Default is True.
+    :return: A dictionary with run metadata under meta and, under results, case name to size to seconds,
+             rows_per_second, peak_memory and methods (the collector summary).
+    '''
+    cases = cases or [case for case in CASES if case != 'load.write_to_parquet' or pa is not None]
+    results = {}
+    if import_time:
+        results['import.csv_to_csv'] = {'0': measure_import_time(repeat=max(repeat, 5))}
+        print(f'import.csv_to_csv: {results["import.csv_to_csv"]["0"]["seconds"]:.4f}s')
+    for rows in sizes:
+        inputs = generate_inputs(directory, rows)
+        for case in cases:
+            setup, run = CASES[case]
+            timings = []
+            for _ in range(repeat):
+                args = setup(inputs)
+                gc.collect()
+                start = time.perf_counter()
+                run(*args)
+                timings.append(time.perf_counter() - start)
+            result = {'seconds': min(timings), 'rows_per_second': rows / min(timings) if min(timings) else None}
+            if memory:
+                args = setup(inputs)
+                gc.collect()
+                with MetricsCollector(track_memory=True) as metrics:
+                    run(*args)
+                methods = {method: totals for stage in metrics.summary().values() for method, totals in stage.items()}
+                result['peak_memory'] = max((totals['memory_peak'] for totals in methods.values()), default=0)
+                result['methods'] = methods
+            results.setdefault(case, {})[str(rows)] = result
+            print(f'{case} {rows} rows: {result["seconds"]:.4f}s')
+    meta = {'commit': _commit(), 'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'python': platform.python_version(), 'pandas': pd.__version__, 'platform': platform.platform(),
+            'cpus': os.cpu_count(), 'repeat': repeat}
+    return {'meta': meta, 'results': results}
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.1) -> list:
+    '''
+    Compares two benchmark results case by case and size by size.
+    :param baseline: The results of an earlier run (e.g. - loaded from the JSON saved by a previous commit).
+    :param current: The results of this run.
+    :param threshold: The relative slowdown (or memory growth) above which a case counts as a regression. Default
+                      is 0.1 (10%).
+    :return: A list of dictionaries (case, size, metric, baseline, current, change) for every regression.
+    '''
+    regressions = []
+    for case, sizes in current['results'].items():
+        for size, result in sizes.items():
+            before = baseline.get('results', {}).get(case, {}).get(size)
+            if before is None:
+                continue
+            added = sorted(set(result.get('backends', [])) - set(before.get('backends', [])))
+            if added:
+                regressions.append({'case': case, 'size': size, 'metric': 'backends', 'baseline': before['backends'],
+                                    'current': result['backends'], 'change': len(added)})
+            for metric in ('seconds', 'peak_memory'):
+                if before.get(metric) and result.get(metric) is not None:
+                    change = result[metric] / before[metric] - 1
+                    if change > threshold:
+                        regressions.append({'case': case, 'size': size, 'metric': metric, 'baseline': before[metric],
+                                            'current': result[metric], 'change': change})
+    return regressions
+
+
+def main(argv: list = None) -> int:
+    '''
+    Runs the command line interface: benchmarks every case at each size, optionally saving the results and comparing
+    them with a baseline.
+    :param argv: The command line arguments. Defaults to sys.argv[1:].
+    :return: The exit status, 1 if a regression was found against the baseline and 0 otherwise.
+    '''
+    parser = argparse.ArgumentParser(description='Benchmark the extract, transform and load paths.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000],
+                        help='input sizes in rows, from 1000 up to 100000000')
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), help='cases to run (default: all)')
+    parser.add_argument('--directory', default='./data/benchmark', help='where generated inputs are kept')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per case, the fastest is kept')
+    parser.add_argument('--no-memory', action='store_true', help='skip the peak memory run')
+    parser.add_argument('--no-import-time', action='store_true', help='skip the cold-start import time')
+    parser.add_argument('--output', help='save the results as JSON (e.g. - a baseline for later commits)')
+    parser.add_argument('--baseline', help='compare with a saved baseline and exit with 1 on a regression')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative change counted as a regression')
+    args = parser.parse_args(argv)
+    results = run_benchmarks(args.sizes, args.directory, args.cases, args.repeat, memory=not args.no_memory,
+                             import_time=not args.no_import_time)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            regressions = compare(json.load(file), results, args.threshold)
+        for regression in regressions:
+            if regression['metric'] == 'backends':
+                print(f'Regression in {regression["case"]}: backends {regression["current"]} are imported at startup.')
+                continue
+            print(f'Regression in {regression["case"]} at {regression["size"]} rows: {regression["metric"]} went from '
+                  f'{regression["baseline"]:.4g} to {regression["current"]:.4g} ({regression["change"]:+.0%}).')
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
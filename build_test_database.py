@@ -1,11 +1,17 @@
 import sqlite3
 import random
+import sys
 
 # Define some sample names and countries
 names = ['Alice', 'Bob', 'Charlie', 'David', 'Eva', 'Fiona', 'George', 'Hannah', 'Ian', 'Julia', 'Kyle', 'Liam', 'Mia',
          'Nora', 'Oliver', 'Penelope', 'Quinn', 'Rachel', 'Steve', 'Tina']
 countries = ['USA', 'Canada', 'UK', 'Australia', 'Germany', 'France', 'Spain', 'Italy', 'Brazil', 'Argentina']
 
+# Number of rows to generate. Pass a larger count (e.g. - python build_test_database.py 5000000) to build a database
+# suitable for exercising partitioned and batched reads.
+rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+batch_size = 100_000
+
 # Establish a connection to the SQLite database
 database = './data/database.db'
 conn = sqlite3.connect(database)
@@ -18,12 +24,11 @@ cursor.execute(create_ddl)
 # Prepare to insert data
 insert_ddl = f'INSERT INTO people (name, age, country) VALUES (?, ?, ?)'
 
-# Generate random data and insert it into the table
-for index in range(20):
-    name = random.choice(names)
-    age = random.randint(20, 80)
-    country = random.choice(countries)
-    cursor.execute(insert_ddl, (name, age, country))
+# Generate random data and insert it into the table in batches
+for start in range(0, rows, batch_size):
+    batch = [(random.choice(names), random.randint(20, 80), random.choice(countries))
+             for _ in range(min(batch_size, rows - start))]
+    cursor.executemany(insert_ddl, batch)
 
 # Commit the changes and close the connection
 conn.commit()
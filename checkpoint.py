@@ -0,0 +1,316 @@
+'''
+Inspects and clears a stage checkpoint cache.
+Usage:
+    python checkpoint.py list [--directory .etl_checkpoints]
+    python checkpoint.py clear [--stage extract] [--older-than 7]
+'''
+
+from transform import Transformer
+from state import StateStore
+from collections.abc import Iterator
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import pickle
+import sys
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+try:  # pyarrow is optional; without it dataframes are checkpointed as pickles
+    import pyarrow  # pandas uses it for Parquet; only checked for, and for its exception types
+except ImportError:
+    pyarrow = None
+
+
+def _discard(path: str) -> None:
+    '''
+    Removes a partially written file, if it exists.
+    '''
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def file_fingerprint(path: str) -> dict:
+    '''
+    Describes a file, or every file under a directory, by path, size and modification time, for use as a checkpoint
+    input. A changed input file changes the fingerprint and so invalidates the stages that read it.
+    :param path: The file or directory path.
+    :return: A dictionary describing the file or files.
+    '''
+    if os.path.isdir(path):
+        return {'path': os.path.abspath(path), 'files': [file_fingerprint(os.path.join(root, name))
+                                                         for root, _, names in sorted(os.walk(path))
+                                                         for name in sorted(names)]}
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def _canonical(value):
+    '''
+    Converts values json cannot serialize into stable, comparable forms for hashing. Contents are hashed in full, and
+    types without a content-based form raise a TypeError.
+    '''
+    if isinstance(value, pd.DataFrame):
+        content = pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes()
+        return {'dataframe': hashlib.sha256(content).hexdigest(), 'columns': [str(col) for col in value.columns],
+                'dtypes': [str(dtype) for dtype in value.dtypes]}
+    if isinstance(value, Transformer):
+        return {'transformer': _canonical(value.raw_data) if isinstance(value.raw_data, pd.DataFrame) else None,
+                'steps': value.steps}
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    if isinstance(value, (datetime.date, datetime.datetime, pd.Timestamp)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return {'bytes': hashlib.sha256(value).hexdigest()}
+    if isinstance(value, np.ndarray):
+        content = value.tobytes() if value.dtype != object else pd.util.hash_array(value.ravel()).tobytes()
+        return {'ndarray': hashlib.sha256(content).hexdigest(), 'dtype': str(value.dtype), 'shape': value.shape}
+    if isinstance(value, (pd.Series, pd.Index)):
+        content = pd.util.hash_pandas_object(value, **({'index': True} if isinstance(value, pd.Series) else {}))
+        return {type(value).__name__.lower(): hashlib.sha256(content.to_numpy().tobytes()).hexdigest(),
+                'dtype': str(value.dtype), 'name': str(value.name)}
+    # a repr may be truncated (large arrays) or hold a memory address, so it cannot stand in for the value
+    raise TypeError(f'Cannot compute a checkpoint key from a {type(value).__name__}. Pass JSON serializable values, '
+                    f'dataframes, arrays or Series instead.')
+
+
+class CheckpointCache():
+    '''
+    The CheckpointCache class stores the output of pipeline stages on disk, keyed by a hash of everything the output
+    depends on (e.g. - the SQL text, a file fingerprint, the Transformer step list and the key of the stage before),
+    so a rerun after a failure loads finished stages instead of recomputing them. Because each key includes the keys
+    of the stages before it, changing one stage invalidates it and every stage after it, and nothing else.
+    Dataframes are stored as Parquet (as pickles without pyarrow) and other results as JSON. The cache is bounded to
+    max_bytes by evicting the least recently used entries.
+    Methods: key, get, put, cached, entries, clear, stats
+    '''
+
+    def __init__(self, directory: str = '.etl_checkpoints', max_bytes: int = 10 * 1024 ** 3) -> None:
+        '''
+        Initializes the CheckpointCache object.
+        :param directory: The directory holding the checkpoints and their index. Default is .etl_checkpoints.
+        :param max_bytes: The largest total size of the checkpoints in bytes. Default is 10 GiB.
+        '''
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index = StateStore(os.path.join(directory, 'index.json'))
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def __contains__(self, key: str) -> bool:
+        entry = self.index.get(key)
+        return entry is not None and os.path.exists(os.path.join(self.directory, entry['file']))
+
+    @staticmethod
+    def key(stage: str, *inputs, **params) -> str:
+        '''
+        Computes the checkpoint key of a stage.
+        :param stage: The name of the stage.
+        :param inputs: Everything the output depends on: keys of earlier stages, file fingerprints, dataframes,
+                       Transformers (their data and step list), SQL text, URLs...
+        :param params: Named inputs, e.g. - sql='SELECT ...'.
+        :return: A hexadecimal SHA-256 key.
+        :raises TypeError: If an input cannot be hashed by content.
+        '''
+        document = json.dumps([stage, inputs, params], sort_keys=True, default=_canonical)
+        return hashlib.sha256(document.encode('utf-8')).hexdigest()
+
+    def get(self, key: str, default=None):
+        '''
+        Loads a checkpoint and marks it as recently used.
+        :param key: The checkpoint key.
+        :param default: The value returned if there is no checkpoint for the key.
+        :return: The checkpointed output or the default.
+        '''
+        entry = self.index.get(key)
+        path = os.path.join(self.directory, entry['file']) if entry else None
+        if path is None or not os.path.exists(path):
+            self.misses += 1
+            return default
+        try:
+            if entry['format'] == 'parquet':
+                data = pd.read_parquet(path)
+            elif entry['format'] == 'pickle':
+                data = pd.read_pickle(path)
+            else:
+                with open(path, 'r') as file:
+                    data = json.load(file)
+        except FileNotFoundError:  # evicted by another writer since the check above
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.index.set(key, {**entry, 'last_access': time.time()})
+        return data
+
+    def put(self, key: str, data, stage: str = None):
+        '''
+        Stores a stage output. A Transformer is stored as its transformed data, a stream as a list of its chunks and a
+        list of dataframe chunks as a single dataframe. Dataframes Parquet cannot hold (e.g. - an object column mixing
+        strings and numbers) are pickled instead. Outputs that cannot be stored in any format are passed on unstored.
+        :param key: The checkpoint key.
+        :param data: The stage output.
+        :param stage: The name of the stage, shown by entries and the CLI.
+        :return: The output as stored (e.g. - the dataframe of a Transformer), to be passed on in place of data.
+        '''
+        if isinstance(data, Transformer):
+            data = data.get_data()
+        if isinstance(data, Iterator):
+            data = list(data)
+        if isinstance(data, list) and data and all(isinstance(chunk, pd.DataFrame) for chunk in data):
+            data = pd.concat(data, ignore_index=True)
+        if isinstance(data, pd.DataFrame):
+            file_format = 'parquet' if pyarrow is not None else 'pickle'
+        else:
+            file_format = 'json'
+            try:
+                body = json.dumps(data)
+            except (TypeError, ValueError):
+                print(f'The output of stage {stage} is not a dataframe or JSON serializable and was not checkpointed.')
+                return data
+
+        def paths(file_format: str) -> tuple:
+            name = os.path.join('objects', key[:2], f'{key}.{file_format}')
+            path = os.path.join(self.directory, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            return name, path, f'{path}.{threading.get_ident()}.tmp'
+
+        name, path, temp_path = paths(file_format)
+        if file_format == 'parquet':
+            try:
+                data.to_parquet(temp_path)
+            except (pyarrow.ArrowException, ValueError, TypeError):
+                _discard(temp_path)
+                file_format = 'pickle'
+                name, path, temp_path = paths(file_format)
+        if file_format == 'pickle':
+            try:
+                data.to_pickle(temp_path)
+            except (pickle.PicklingError, TypeError, AttributeError):
+                _discard(temp_path)
+                print(f'The output of stage {stage} could not be serialized and was not checkpointed.')
+                return data
+        elif file_format == 'json':
+            with open(temp_path, 'w') as file:
+                file.write(body)
+        os.replace(temp_path, path)  # a crash never leaves a partial checkpoint behind
+        now = time.time()
+        with self.lock:
+            self.index.set(key, {'stage': stage, 'file': name, 'format': file_format, 'bytes': os.path.getsize(path),
+                                 'rows': len(data) if isinstance(data, (pd.DataFrame, list)) else None,
+                                 'created': now, 'last_access': now})
+            self._evict(keep=key)
+        return data
+
+    def cached(self, stage: str, func, *inputs, **params) -> tuple:
+        '''
+        Returns the checkpointed output of a stage, running func and checkpointing its output on a miss.
+        :param stage: The name of the stage.
+        :param func: A callable with no arguments that computes the output (e.g. - lambda: database.query(sql)).
+        :param inputs: The inputs of the stage, as for key.
+        :param params: The named inputs of the stage, as for key.
+        :return: A tuple of the output and its key, to pass as an input of the next stage.
+        '''
+        key = self.key(stage, *inputs, **params)
+        missing = object()
+        data = self.get(key, missing)
+        if data is missing:
+            data = self.put(key, func(), stage=stage)
+        return data, key
+
+    def _evict(self, keep: str = None) -> None:
+        '''
+        Removes the least recently used checkpoints until the cache fits in max_bytes. Caller holds the lock.
+        :param keep: A key that is never evicted (the checkpoint just written).
+        '''
+        entries = sorted(self.entries(), key=lambda entry: entry['last_access'])
+        total = sum(entry['bytes'] for entry in entries)
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            if entry['key'] == keep:
+                continue
+            self._remove(entry['key'], entry)
+            total -= entry['bytes']
+
+    def _remove(self, key: str, entry: dict) -> None:
+        try:
+            os.remove(os.path.join(self.directory, entry['file']))
+        except FileNotFoundError:
+            pass
+        self.index.reset(key)
+
+    def entries(self) -> list:
+        '''
+        Lists the checkpoints, most recently used first.
+        :return: A list of dictionaries with the key, stage, format, bytes, rows, created and last_access of each.
+        '''
+        entries = [{'key': key, **entry} for key in self.index.keys() if (entry := self.index.get(key)) is not None]
+        return sorted(entries, key=lambda entry: entry['last_access'], reverse=True)
+
+    def clear(self, stage: str = None, older_than: float = None) -> int:
+        '''
+        Removes checkpoints.
+        :param stage: Only remove the checkpoints of this stage. Removes every stage if not provided.
+        :param older_than: Only remove checkpoints not used for this many seconds.
+        :return: The number of checkpoints removed.
+        '''
+        removed = 0
+        with self.lock:
+            for entry in self.entries():
+                if stage is not None and entry['stage'] != stage:
+                    continue
+                if older_than is not None and time.time() - entry['last_access'] < older_than:
+                    continue
+                self._remove(entry['key'], entry)
+                removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        '''
+        Reports the size of the cache and how often lookups were answered from it by this object.
+        :return: A dictionary of entries, bytes, max_bytes, hits and misses.
+        '''
+        entries = self.entries()
+        return {'entries': len(entries), 'bytes': sum(entry['bytes'] for entry in entries),
+                'max_bytes': self.max_bytes, 'hits': self.hits, 'misses': self.misses}
+
+
+def main(argv: list = None) -> int:
+    '''
+    Runs the command line interface: lists the checkpoints of a cache or clears them.
+    :param argv: The command line arguments. Defaults to sys.argv[1:].
+    :return: The exit status.
+    '''
+    parser = argparse.ArgumentParser(description='Inspect and clear a stage checkpoint cache.')
+    parser.add_argument('--directory', default='.etl_checkpoints', help='the checkpoint directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='list checkpoints, most recently used first')
+    clear = commands.add_parser('clear', help='remove checkpoints')
+    clear.add_argument('--stage', help='only remove checkpoints of this stage')
+    clear.add_argument('--older-than', type=float, help='only remove checkpoints unused for this many days')
+    args = parser.parse_args(argv)
+    cache = CheckpointCache(args.directory)
+    if args.command == 'list':
+        for entry in cache.entries():
+            used = datetime.datetime.fromtimestamp(entry['last_access']).isoformat(timespec='seconds')
+            print(f'{entry["key"][:16]}  {entry["stage"] or "-":<20} {entry["format"]:<8} {entry["bytes"]:>12,} B  '
+                  f'{entry["rows"] if entry["rows"] is not None else "-":>10} rows  last used {used}')
+        stats = cache.stats()
+        print(f'{stats["entries"]} checkpoints, {stats["bytes"]:,} of {stats["max_bytes"]:,} bytes')
+    else:
+        older_than = args.older_than * 86400 if args.older_than is not None else None
+        print(f'Removed {cache.clear(stage=args.stage, older_than=older_than)} checkpoints.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
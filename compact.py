@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+try:  # pyarrow is optional; without it string columns use pandas' own string dtype
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+STRING_DTYPE = 'string[pyarrow]' if pa is not None else 'string'
+
+
+def compact_dataframe(data: pd.DataFrame, category_threshold: float = 0.5, downcast: bool = True,
+                      string_dtype: str = STRING_DTYPE) -> tuple:
+    '''
+    Reduces the memory footprint of a dataframe by choosing tighter dtypes column by column. Integer columns are
+    downcast to the smallest integer type that holds their range, float columns to float32 where that loses no
+    precision, string columns with few distinct values are encoded as categoricals and the remaining string columns
+    use an Arrow-backed string dtype (or pandas' string dtype without pyarrow).
+    :param data: The dataframe to compact. It is not modified.
+    :param category_threshold: The maximum ratio of distinct values to rows for a string column to become categorical.
+                               Default is 0.5.
+    :param downcast: Whether to downcast numeric columns. Default is True.
+    :param string_dtype: The dtype for string columns that are not made categorical, or None to leave them as they are.
+                         Default is string[pyarrow], or string if pyarrow is not installed.
+    :return: A tuple of the compacted dataframe and a report dictionary with bytes_before, bytes_after and the before
+             and after dtype of every changed column.
+    '''
+    before = data.memory_usage(deep=True)
+    compacted = data.copy()
+    changes = {}
+    for col in data.columns:
+        series = data[col]
+        converted = series
+        if downcast and pd.api.types.is_integer_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+            converted = pd.to_numeric(series, downcast='unsigned' if series.notna().any() and series.min() >= 0 else 'integer')
+        elif downcast and pd.api.types.is_float_dtype(series.dtype) and series.dtype != np.float32:
+            narrowed = series.astype(np.float32)
+            if ((narrowed.astype(series.dtype) == series) | series.isna()).all():  # lossless only
+                converted = narrowed
+        elif (pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype)) \
+                and pd.api.types.infer_dtype(series, skipna=True) == 'string':
+            if len(series) and series.nunique(dropna=True) / len(series) <= category_threshold:
+                converted = series.astype('category')
+            elif string_dtype is not None and not (isinstance(series.dtype, pd.StringDtype)
+                                                   and series.dtype.storage == 'pyarrow'):
+                converted = series.astype(string_dtype)  # already Arrow-backed strings are left alone
+        if converted.dtype != series.dtype:
+            compacted[col] = converted
+            changes[col] = {'before': str(series.dtype), 'after': str(converted.dtype)}
+    report = {'bytes_before': int(before.sum()), 'bytes_after': int(compacted.memory_usage(deep=True).sum()),
+              'columns': changes}
+    return compacted, report
+
+
+def replace_categories(series: pd.Series, to_replace, value, **kwargs) -> pd.Series:
+    '''
+    Applies pd.Series.replace to a categorical column by replacing its categories rather than its values. Only the
+    distinct categories are compared and the integer codes are remapped, so the column is never decoded to objects.
+    Categories that end up equal are merged.
+    :param series: A categorical column.
+    :param to_replace: Values to find and replace.
+    :param value: Value to replace with.
+    :param kwargs: Any additional keyword arguments supported by pd.Series.replace are supported.
+    :return: The categorical column with values replaced.
+    '''
+    categories = pd.Series(series.cat.categories).replace(to_replace, value, **kwargs)
+    new_categories, category_codes = pd.factorize(categories)[::-1]
+    codes = series.cat.codes.to_numpy()
+    remapped = np.where(codes >= 0, category_codes[np.maximum(codes, 0)], -1)
+    categorical = pd.Categorical.from_codes(remapped, categories=pd.Index(new_categories),
+                                            ordered=series.cat.ordered)
+    return pd.Series(categorical, index=series.index, name=series.name)
+
+
+def fill_categories(series: pd.Series, fill_value, **kwargs) -> pd.Series:
+    '''
+    Applies pd.Series.fillna to a categorical column, adding the fill value as a category if needed.
+    :param series: A categorical column.
+    :param fill_value: Value used to fill missing values.
+    :param kwargs: Any additional keyword arguments supported by pd.Series.fillna are supported.
+    :return: The categorical column with missing values filled.
+    '''
+    if not series.isna().any():
+        return series
+    if fill_value not in series.cat.categories:
+        series = series.cat.add_categories([fill_value])
+    return series.fillna(fill_value, **kwargs)
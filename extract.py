@@ -1,16 +1,56 @@
 import pandas as pd
+import bz2
+import gzip
+import hashlib
+import glob
 import json
-from sqlalchemy import create_engine
-import pyodbc
-import praw
-import requests
+import lzma
+import numbers
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from compact import compact_dataframe
+from state import StateStore
+from instrument import instrumented, record_error
+from optional import require
+
+try:  # pyarrow is only required for the columnar (Parquet/Feather/JSON Lines) readers
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.json as pa_json
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = feather = pa_json = pq = None
+
+# Text openers by compression extension, for files parsed with the json module rather than a pandas reader
+OPENERS = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}
+
+
+def _open_text(path: str):
+    '''
+    Opens a possibly compressed file for reading as text, choosing the decompressor from the file extension.
+    :param path: The file path.
+    :return: A text file object.
+    '''
+    extension = os.path.splitext(path.lower())[1]
+    if extension in ('.zst', '.zstd'):
+        return require('zstandard').open(path, 'rt')
+    return OPENERS.get(extension, open)(path, 'rt')
 
 
 class FileExtract():
     '''
     The FileExtract class provides an object with methods for extracting data from various file formats. Instances of the
-    class support the extraction of tabular and JSON formatted data. The read methods are implicit getters.
-    Methods: read_tabular, read_json
+    class support the extraction of tabular, JSON, Parquet and Arrow IPC (Feather) formatted data. The read methods are
+    implicit getters.
+    Files that have not changed since the last run can be skipped with changed_files and read_tabular_incremental, and
+    directories of many files are read concurrently with read_many.
+    Methods: read_tabular, read_tabular_chunks, read_tabular_incremental, read_many, changed_files, commit_manifest,
+             read_parquet, read_feather, read_json, read_json_lines
     '''
 
     def __init__(self, file_path: str = None) -> None:
@@ -21,12 +61,21 @@ class FileExtract():
         '''
         self.file_path = file_path
 
-    def read_tabular(self, delimiter, file_path=None, **kwargs) -> pd.DataFrame:
+    @instrumented('extract', path_in='file_path')
+    def read_tabular(self, delimiter, file_path=None, columns: list = None, filters: list = None,
+                     compact: bool = False, **kwargs) -> pd.DataFrame:
         '''
         read_tabular: Reads tabular data, using a specified delimiter, and returns its contents as a pandas dataframe.
+        Compressed files (gzip, bz2, zip, xz, zstd) are decompressed transparently based on the file extension.
         :param delimiter: The delimiter used in the tabular data file.
         :param file_path: Path to the file whose contents will be extracted. If not provided, the file path specified
                           during object creation is used, otherwise, a value error is raised.
+        :param columns: The columns to read. Other columns are skipped while parsing. Reads every column if not provided.
+        :param filters: Row filters as (column, op, value) tuples that must all hold, or a list of such lists of which
+                        any must hold (pyarrow DNF form). Supported ops are =, ==, !=, <, <=, >, >=, in and not in. The
+                        file is filtered in chunks so only matching rows are held in memory.
+        :param compact: If True, shrink the dataframe's dtypes with compact_dataframe. The report of bytes before and
+                        after is kept in the compaction_report attribute. Default is False.
         :param kwargs: Any additional arguments supported by pd.read_csv are supported.
         :return: The extracted data as a pandas dataframe.
         '''
@@ -36,11 +85,430 @@ class FileExtract():
         if delimiter is None:
             raise ValueError('Delimiter must be provided.')
         try:
-            return pd.read_csv(effective_path, sep=delimiter, **kwargs)
+            return self._read_tabular(effective_path, delimiter, columns, filters, compact, **kwargs)
         except Exception as e:
+            record_error(e)
             print(f'Something went wrong with reading the file. Here are the details.\n{e}')
             return pd.DataFrame()  # returns empty DataFrame on error.
 
+    def _read_tabular(self, file_path: str, delimiter, columns: list, filters: list, compact: bool,
+                      **kwargs) -> pd.DataFrame:
+        '''
+        Reads a tabular file for read_tabular and read_tabular_incremental, raising any read error to the caller.
+        :return: The extracted data as a pandas dataframe.
+        '''
+        if columns is not None:
+            # parse the filter columns too, then project them away after filtering
+            kwargs['usecols'] = list(dict.fromkeys(list(columns) + self._filter_columns(filters)))
+        if not filters:
+            data = pd.read_csv(file_path, sep=delimiter, **kwargs)
+        else:
+            with pd.read_csv(file_path, sep=delimiter, chunksize=kwargs.pop('chunksize', 100_000),
+                             **kwargs) as reader:
+                data = pd.concat([chunk[self._filter_mask(chunk, filters)] for chunk in reader], ignore_index=True)
+            data = data[list(columns)] if columns is not None else data
+        if compact:
+            data, self.compaction_report = compact_dataframe(data)
+        return data
+
+    @staticmethod
+    def _filter_columns(filters: list) -> list:
+        '''
+        Lists the columns referenced by row filters.
+        :param filters: Row filters in pyarrow DNF form.
+        :return: The referenced column names.
+        '''
+        if not filters:
+            return []
+        groups = filters if isinstance(filters[0], list) else [filters]
+        return [column for group in groups for column, _, _ in group]
+
+    @staticmethod
+    def _filter_mask(data: pd.DataFrame, filters: list) -> pd.Series:
+        '''
+        Evaluates row filters against a dataframe as a vectorized boolean mask.
+        :param data: The dataframe to filter.
+        :param filters: Row filters in pyarrow DNF form.
+        :return: A boolean series that is True for rows matching the filters.
+        '''
+        comparisons = {'=': '__eq__', '==': '__eq__', '!=': '__ne__', '<': '__lt__', '<=': '__le__', '>': '__gt__',
+                       '>=': '__ge__'}
+        groups = filters if isinstance(filters[0], list) else [filters]
+        mask = pd.Series(False, index=data.index)
+        for group in groups:
+            group_mask = pd.Series(True, index=data.index)
+            for column, op, value in group:
+                if op in comparisons:
+                    group_mask &= getattr(data[column], comparisons[op])(value)
+                elif op in ('in', 'not in'):
+                    matches = data[column].isin(value)
+                    group_mask &= matches if op == 'in' else ~matches
+                else:
+                    raise ValueError(f'Unsupported filter operation {op}.')
+            mask |= group_mask
+        return mask
+
+    @instrumented('extract', path_in='file_path')
+    def read_parquet(self, file_path: str = None, columns: list = None, filters: list = None,
+                     memory_map: bool = True, **kwargs) -> pd.DataFrame:
+        '''
+        Reads a Parquet file (or directory of Parquet files) and returns its contents as a pandas dataframe. Column
+        selection and row filters are pushed down to the reader: only the requested columns are decoded and row
+        groups whose statistics rule out the filters are skipped entirely. Requires pyarrow.
+        :param file_path: Path to the Parquet file whose contents will be extracted. If not provided, the file path
+                          specified during object creation is used, otherwise, a value error is raised.
+        :param columns: The columns to read. Reads every column if not provided.
+        :param filters: Row filters as (column, op, value) tuples that must all hold, or a list of such lists of which
+                        any must hold (pyarrow DNF form).
+        :param memory_map: Whether to memory map local files instead of reading them into memory. Default is True.
+        :param kwargs: Any additional arguments supported by pyarrow.parquet.read_table are supported.
+        :return: The extracted data as a pandas dataframe.
+        '''
+        effective_path = self._columnar_path(file_path)
+        try:
+            return pq.read_table(effective_path, columns=columns, filters=filters or None, memory_map=memory_map,
+                                 **kwargs).to_pandas()
+        except Exception as e:
+            record_error(e)
+            print(f'Something went wrong with reading the Parquet file. Here are the details.\n{e}')
+            return pd.DataFrame()  # returns empty DataFrame on error.
+
+    @instrumented('extract', path_in='file_path')
+    def read_feather(self, file_path: str = None, columns: list = None, filters: list = None,
+                     memory_map: bool = True) -> pd.DataFrame:
+        '''
+        Reads an Arrow IPC (Feather) file and returns its contents as a pandas dataframe. Only the requested columns
+        are read and, with memory mapping, uncompressed files are read without copying. Row filters are evaluated on
+        the Arrow data before conversion to pandas. Requires pyarrow.
+        :param file_path: Path to the Feather file whose contents will be extracted. If not provided, the file path
+                          specified during object creation is used, otherwise, a value error is raised.
+        :param columns: The columns to read. Reads every column if not provided.
+        :param filters: Row filters as (column, op, value) tuples that must all hold, or a list of such lists of which
+                        any must hold (pyarrow DNF form).
+        :param memory_map: Whether to memory map the file instead of reading it into memory. Default is True.
+        :return: The extracted data as a pandas dataframe.
+        '''
+        effective_path = self._columnar_path(file_path)
+        try:
+            read_columns = None
+            if columns is not None:
+                read_columns = list(dict.fromkeys(list(columns) + self._filter_columns(filters)))
+            table = feather.read_table(effective_path, columns=read_columns, memory_map=memory_map)
+            if filters:
+                table = table.filter(pq.filters_to_expression(filters))
+            return table.select(list(columns)).to_pandas() if columns is not None else table.to_pandas()
+        except Exception as e:
+            record_error(e)
+            print(f'Something went wrong with reading the Feather file. Here are the details.\n{e}')
+            return pd.DataFrame()  # returns empty DataFrame on error.
+
+    def _columnar_path(self, file_path: str) -> str:
+        '''
+        Resolves the file path of a columnar read and checks that pyarrow is available.
+        :param file_path: The file path passed to the read method.
+        :return: The effective file path.
+        '''
+        if pa is None:
+            raise ImportError('pyarrow is required for Parquet and Feather input. Install it with pip install pyarrow.')
+        effective_path = file_path if file_path is not None else self.file_path
+        if effective_path is None:
+            raise ValueError('File path must be set at initialization or provided.')
+        return effective_path
+
+    @instrumented('extract', path_in='file_path')
+    def read_tabular_chunks(self, delimiter, file_path=None, chunk_rows: int = None, chunk_bytes: int = None,
+                            **kwargs) -> Iterator[pd.DataFrame]:
+        '''
+        Streams tabular data, using a specified delimiter, as a sequence of pandas dataframes so that files larger than
+        memory can be processed. Only one chunk is held in memory at a time.
+        :param delimiter: The delimiter used in the tabular data file.
+        :param file_path: Path to the file whose contents will be extracted. If not provided, the file path specified
+                          during object creation is used, otherwise, a value error is raised.
+        :param chunk_rows: The number of rows in each chunk.
+        :param chunk_bytes: An approximate budget of raw file bytes per chunk. The row count is estimated from the
+                            average line length at the head of the file. Ignored if chunk_rows is provided.
+        :param kwargs: Any additional arguments supported by pd.read_csv are supported.
+        :return: A generator of pandas dataframes.
+        '''
+        effective_path = file_path if file_path is not None else self.file_path
+        if effective_path is None:
+            raise ValueError('File path must be set at initialization or provided.')
+        if delimiter is None:
+            raise ValueError('Delimiter must be provided.')
+        if chunk_rows is None and chunk_bytes is None:
+            raise ValueError('A chunk_rows or chunk_bytes value must be provided.')
+        if chunk_rows is None:
+            chunk_rows = self._estimate_rows(effective_path, chunk_bytes)
+        return self._iter_tabular_chunks(effective_path, delimiter, chunk_rows, **kwargs)
+
+    @staticmethod
+    def _iter_tabular_chunks(file_path, delimiter, chunk_rows: int, **kwargs) -> Iterator[pd.DataFrame]:
+        '''
+        Generator backing read_tabular_chunks. Kept separate so argument errors are raised at call time rather than on
+        the first iteration.
+        '''
+        try:
+            with pd.read_csv(file_path, sep=delimiter, chunksize=chunk_rows, **kwargs) as reader:
+                yield from reader
+        except Exception as e:
+            record_error(e)
+            print(f'Something went wrong with reading the file. Here are the details.\n{e}')
+
+    @staticmethod
+    def _estimate_rows(file_path, chunk_bytes: int, sample_bytes: int = 1 << 16) -> int:
+        '''
+        Estimates how many rows of a delimited file fit within a byte budget from the average line length of a sample
+        taken at the head of the file.
+        :param file_path: Path to the file being estimated.
+        :param chunk_bytes: The byte budget per chunk.
+        :param sample_bytes: The number of bytes sampled from the head of the file.
+        :return: The estimated number of rows, at least one.
+        '''
+        with open(file_path, 'rb') as file:
+            sample = file.read(sample_bytes)
+        lines = max(sample.count(b'\n'), 1)
+        return max(int(chunk_bytes // (len(sample) / lines or 1)), 1)
+
+    @instrumented('extract', path_in='file_path')
+    def read_json_lines(self, file_path: str = None, block_size: int = 1 << 24, **kwargs) -> Iterator:
+        '''
+        Streams a JSON Lines (newline-delimited JSON) file in batches of roughly block_size bytes. With pyarrow, each
+        batch is parsed straight into a columnar pyarrow RecordBatch without creating Python objects per record, ready
+        for Transformer.json_to_dataframe; without pyarrow, each batch is a list of dictionaries.
+        :param file_path: Path to the JSON Lines file whose contents will be extracted. If not provided, the file path
+                          specified during object creation is used, otherwise, a value error is raised.
+        :param block_size: The approximate number of bytes parsed per batch. Default is 16 MiB.
+        :param kwargs: Any additional arguments supported by pyarrow.json.ParseOptions are supported (pyarrow only).
+        :return: A generator of record batches (or lists of dictionaries).
+        '''
+        effective_path = file_path if file_path is not None else self.file_path
+        if effective_path is None:
+            raise ValueError('File path must be set at initialization or provided.')
+        return self._iter_json_lines(effective_path, block_size, **kwargs)
+
+    @staticmethod
+    def _iter_json_lines(file_path, block_size: int, **kwargs) -> Iterator:
+        '''
+        Generator backing read_json_lines.
+        '''
+        try:
+            if pa is not None:
+                reader = pa_json.open_json(file_path, read_options=pa_json.ReadOptions(block_size=block_size),
+                                           parse_options=pa_json.ParseOptions(**kwargs))
+                yield from reader
+                return
+            batch, batch_bytes = [], 0
+            with open(file_path, 'r') as file:
+                for line in file:
+                    if line.strip():
+                        batch.append(json.loads(line))
+                        batch_bytes += len(line)
+                    if batch_bytes >= block_size:
+                        yield batch
+                        batch, batch_bytes = [], 0
+            if batch:
+                yield batch
+        except Exception as e:
+            record_error(e)
+            print(f'Something went wrong with reading the JSON Lines file. Here are the details:\n{e}')
+
+    def changed_files(self, pattern: str, state: StateStore, use_hash: bool = True, commit: bool = False) -> list:
+        '''
+        Lists the files matching a glob pattern that are new or have changed since they were last recorded in a
+        manifest of path, size, modification time and content hash kept in a StateStore. Files whose size and
+        modification time are unchanged are skipped without being read; files that were only touched are detected by
+        their hash. Reset the manifest with state.reset(f'manifest:{pattern}') to reprocess every file.
+        :param pattern: A glob pattern (e.g. - data/drops/*.csv) or a directory, whose files are all considered.
+        :param state: The StateStore holding the manifest.
+        :param use_hash: Whether to confirm changes with a SHA-256 content hash. Default is True.
+        :param commit: Whether to record the changed files in the manifest now. Default is False.
+        :return: A sorted list of the paths of new or changed files.
+        '''
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '*')
+        key = f'manifest:{pattern}'
+        manifest = state.get(key, {})
+        current, changed = {}, []
+        for path in sorted(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path)):
+            previous = manifest.get(path)
+            fingerprint = self._fingerprint(path, previous, use_hash)
+            current[path] = fingerprint
+            if fingerprint != previous:
+                if previous is None or not use_hash or fingerprint['sha256'] != previous.get('sha256'):
+                    changed.append(path)
+        self._pending_manifest = (state, key, current)
+        if commit:
+            self.commit_manifest()
+        return changed
+
+    def commit_manifest(self) -> None:
+        '''
+        Records the files listed by the last changed_files call in the manifest, so they are skipped by the next run.
+        Call it once the changed files have been processed successfully.
+        '''
+        if getattr(self, '_pending_manifest', None) is not None:
+            state, key, manifest = self._pending_manifest
+            state.set(key, manifest)
+            self._pending_manifest = None
+
+    @staticmethod
+    def _fingerprint(path: str, previous: dict, use_hash: bool) -> dict:
+        '''
+        Builds the manifest entry of a file. The content hash is reused from the previous entry when the size and
+        modification time are unchanged, so unchanged files are never read.
+        :param path: The file path.
+        :param previous: The previous manifest entry of the file, or None.
+        :param use_hash: Whether to include a SHA-256 content hash.
+        :return: A dictionary with the size, mtime and (optionally) sha256 of the file.
+        '''
+        stat = os.stat(path)
+        fingerprint = {'size': stat.st_size, 'mtime': stat.st_mtime}
+        if not use_hash:
+            return fingerprint
+        if previous and previous.get('size') == stat.st_size and previous.get('mtime') == stat.st_mtime:
+            fingerprint['sha256'] = previous.get('sha256')
+            return fingerprint
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+        fingerprint['sha256'] = digest.hexdigest()
+        return fingerprint
+
+    @instrumented('extract')
+    def read_tabular_incremental(self, delimiter, pattern: str, state: StateStore, use_hash: bool = True,
+                                 **kwargs) -> pd.DataFrame:
+        '''
+        Reads only the tabular files matching a glob pattern that are new or changed since the last run (see
+        changed_files) and records them in the manifest once they have all been read. A file that cannot be read is
+        reported and left out of the manifest, so it is read again on the next run.
+        :param delimiter: The delimiter used in the tabular data files.
+        :param pattern: A glob pattern or a directory.
+        :param state: The StateStore holding the manifest.
+        :param use_hash: Whether to confirm changes with a SHA-256 content hash. Default is True.
+        :param kwargs: Any additional arguments supported by read_tabular are supported.
+        :return: The concatenated contents of the new or changed files as a pandas dataframe.
+        '''
+        paths = self.changed_files(pattern, state, use_hash=use_hash)
+        columns, filters = kwargs.pop('columns', None), kwargs.pop('filters', None)
+        compact = kwargs.pop('compact', False)
+        frames = []
+        state, key, manifest = self._pending_manifest
+        previous = state.get(key, {})
+        for path in paths:
+            try:
+                frames.append(self._read_tabular(path, delimiter, columns, filters, compact, **dict(kwargs)))
+            except Exception as e:
+                record_error(e)
+                print(f'Something went wrong with reading the file {path}. Here are the details.\n{e}')
+                if path in previous:  # keep the last good entry, which no longer matches, so the file is retried
+                    manifest[path] = previous[path]
+                else:
+                    del manifest[path]
+        self.commit_manifest()
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    @instrumented('extract')
+    def read_many(self, pattern, file_format: str = None, delimiter: str = ',', source_column: str = None,
+                  ordered: bool = True, max_workers: int = None, executor: str = 'thread', engine: str = 'auto',
+                  stream: bool = False, **kwargs) -> pd.DataFrame | Iterator[pd.DataFrame]:
+        '''
+        Reads every file matching a glob pattern concurrently and merges them into one dataframe. Compressed files
+        (gzip, bz2, xz, and zstd with the zstandard package) are decompressed transparently based on the file
+        extension. CSV files are parsed with the multithreaded pyarrow engine when it is available and supports the
+        options given, falling back to the C engine otherwise. A file that cannot be read is reported and skipped.
+        :param pattern: A glob pattern (e.g. - data/drops/**/*.csv.gz), a directory, whose files are all read, or a
+                        list of paths and patterns.
+        :param file_format: csv, json (a record or list of records per file, flattened with json_normalize), jsonl or
+                            parquet. Inferred from each file's extension if not provided.
+        :param delimiter: The delimiter used in CSV files. Default is ','.
+        :param source_column: If provided, a column of this name holding each row's file path is added.
+        :param ordered: Whether files are merged in sorted path order (True) or in the order they finish parsing
+                        (False), which lets the first files be used sooner when streaming. Default is True.
+        :param max_workers: The number of files parsed at the same time. Defaults to the number of CPUs.
+        :param executor: 'thread' or 'process'. Threads suit the pyarrow engine and compressed files, which release the
+                         GIL; processes suit the C and python CSV engines and JSON files. Default is 'thread'.
+        :param engine: The pd.read_csv engine for CSV files, or 'auto' for pyarrow when available. Default is 'auto'.
+        :param stream: If True, return a generator yielding each file's dataframe instead of one concatenated dataframe.
+        :param kwargs: Any additional arguments supported by the reader of the format (e.g. - pd.read_csv) are supported.
+        :return: The merged data as a pandas dataframe, or a generator of per-file dataframes if stream is True.
+        '''
+        patterns = [pattern] if isinstance(pattern, (str, os.PathLike)) else pattern
+        paths = []
+        for item in map(str, patterns):
+            matches = glob.glob(os.path.join(item, '*') if os.path.isdir(item) else item, recursive=True)
+            paths.extend(path for path in matches if os.path.isfile(path))
+        paths = sorted(dict.fromkeys(paths))
+        if engine == 'auto':
+            engine = 'pyarrow' if pa is not None else None
+        if executor not in ('thread', 'process'):
+            raise ValueError('executor must be "thread" or "process".')
+        frames = self._read_many(paths, file_format, delimiter, source_column, ordered,
+                                 max_workers or os.cpu_count() or 1, executor, engine, kwargs)
+        if stream:
+            return frames
+        frames = list(frames)
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def _read_many(self, paths: list, file_format: str, delimiter: str, source_column: str, ordered: bool,
+                   max_workers: int, executor: str, engine: str, kwargs: dict) -> Iterator[pd.DataFrame]:
+        '''
+        Generator backing read_many. Parses files on a pool and yields them in path or completion order.
+        '''
+        if not paths:
+            return
+        pool = (ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor)(
+            max_workers=min(max_workers, len(paths)))
+        try:
+            futures = {pool.submit(self._read_file, path, file_format, delimiter, source_column, engine, kwargs): path
+                       for path in paths}
+            for future in (futures if ordered else as_completed(futures)):
+                try:
+                    data = future.result()
+                except Exception as e:
+                    record_error(e)
+                    print(f'Something went wrong with reading the file {futures[future]}. Here are the details.\n{e}')
+                    continue
+                yield data
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    @staticmethod
+    def _read_file(path: str, file_format: str, delimiter: str, source_column: str, engine: str,
+                   kwargs: dict) -> pd.DataFrame:
+        '''
+        Parses one file for read_many. Runs on a worker thread or process, so errors are raised to the caller.
+        :return: The file's contents as a pandas dataframe.
+        '''
+        if file_format is None:
+            name = path.lower()
+            for extension in ('.gz', '.bz2', '.xz', '.zst', '.zstd'):
+                name = name.removesuffix(extension)
+            file_format = os.path.splitext(name)[1].lstrip('.') or 'csv'
+        if file_format in ('csv', 'tsv', 'txt'):
+            data = None
+            if engine == 'pyarrow':
+                try:
+                    data = pd.read_csv(path, sep=delimiter, engine='pyarrow', **kwargs)
+                except ValueError:  # an option, delimiter or value the pyarrow engine does not support
+                    data = None
+            if data is None:
+                data = pd.read_csv(path, sep=delimiter, engine=None if engine == 'pyarrow' else engine, **kwargs)
+        elif file_format in ('jsonl', 'ndjson'):
+            data = pd.read_json(path, lines=True, **kwargs)
+        elif file_format == 'json':
+            with _open_text(path) as file:
+                records = json.load(file)
+            data = pd.json_normalize(records if isinstance(records, list) else [records], **kwargs)
+        elif file_format == 'parquet':
+            data = pd.read_parquet(path, **kwargs)
+        else:
+            raise ValueError(f'Unsupported file format {file_format}. Use csv, json, jsonl or parquet.')
+        if source_column is not None:
+            data[source_column] = path
+        return data
+
+    @instrumented('extract', path_in='file_path')
     def read_json(self, file_path: str = None, **kwargs) -> dict:
         '''
         Reads a JSON formatted file and returns its contents as a dictionary.
@@ -56,54 +524,779 @@ class FileExtract():
             with open(effective_path, 'r') as file:
                 return json.load(file, **kwargs)
         except Exception as e:
+            record_error(e)
             print(f'Something went wrong with reading the JSON file. Here are the details:\n{e}')
             return dict()  # returns empty dictionary on error.
 
 
+# Process-wide registries shared by every DatabaseExtract instance. Engines are keyed by URL and pool settings and
+# idle pyodbc connections are keyed by connection string, so short-lived extractors reuse connections instead of
+# paying for connection setup on every instantiation.
+_engine_registry = {}
+_odbc_registry = {}
+_registry_lock = threading.Lock()
+_pool_stats = {'engine_hits': 0, 'engine_misses': 0, 'connection_hits': 0, 'connection_misses': 0}
+
+
+def _count(stat: str) -> None:
+    '''
+    Increments a pool statistics counter.
+    :param stat: The name of the counter to increment.
+    '''
+    with _registry_lock:
+        _pool_stats[stat] += 1
+
+
+def _on_connect(dbapi_connection, connection_record) -> None:
+    '''
+    SQLAlchemy pool event fired when a new DBAPI connection is opened. Marks the record so that its first checkout is
+    counted as a pool miss.
+    '''
+    connection_record.info['fresh'] = True
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy) -> None:
+    '''
+    SQLAlchemy pool event fired on every checkout. Counts checkouts of existing connections as pool hits.
+    '''
+    _count('connection_misses' if connection_record.info.pop('fresh', False) else 'connection_hits')
+
+
+def _get_engine(connection_url: str, pool_size: int, max_overflow: int, pool_pre_ping: bool, pool_recycle: int):
+    '''
+    Returns the shared SQLAlchemy engine for a URL and pool configuration, creating it on first use.
+    :param connection_url: A connection url to connect to a database with using SQLAlchemy.
+    :param pool_size: The number of connections kept open in the pool.
+    :param max_overflow: The number of connections allowed beyond pool_size under load.
+    :param pool_pre_ping: Whether connections are tested for liveness on checkout.
+    :param pool_recycle: The number of seconds after which a connection is replaced.
+    :return: A SQLAlchemy engine.
+    '''
+    key = (connection_url, pool_size, max_overflow, pool_pre_ping, pool_recycle)
+    with _registry_lock:
+        engine = _engine_registry.get(key)
+        if engine is not None:
+            _pool_stats['engine_hits'] += 1
+            return engine
+        _pool_stats['engine_misses'] += 1
+        sqlalchemy = require('sqlalchemy')
+        try:
+            engine = sqlalchemy.create_engine(connection_url, pool_size=pool_size, max_overflow=max_overflow,
+                                   pool_pre_ping=pool_pre_ping, pool_recycle=pool_recycle)
+        except TypeError:
+            # pools without sizing (e.g. - in-memory SQLite) reject pool_size and max_overflow
+            engine = sqlalchemy.create_engine(connection_url, pool_pre_ping=pool_pre_ping, pool_recycle=pool_recycle)
+        sqlalchemy.event.listen(engine, 'connect', _on_connect)
+        sqlalchemy.event.listen(engine, 'checkout', _on_checkout)
+        _engine_registry[key] = engine
+        return engine
+
+
+def _acquire_odbc(connection_str: str, pool_recycle: int):
+    '''
+    Returns an idle pyodbc connection for a connection string, opening a new one if none is available or the idle
+    connections are older than pool_recycle seconds.
+    :param connection_str: A connection string to connect to a database with using pyodbc.
+    :param pool_recycle: The number of seconds after which a connection is replaced.
+    :return: A pyodbc connection.
+    '''
+    with _registry_lock:
+        idle = _odbc_registry.setdefault(connection_str, [])
+        while idle:
+            conn, opened_at = idle.pop()
+            if pool_recycle is None or pool_recycle < 0 or time.monotonic() - opened_at < pool_recycle:
+                _pool_stats['connection_hits'] += 1
+                return conn, opened_at
+            conn.close()
+        _pool_stats['connection_misses'] += 1
+    return require('pyodbc').connect(connection_str), time.monotonic()
+
+
+def _release_odbc(connection_str: str, conn, opened_at: float, pool_size: int) -> None:
+    '''
+    Returns a pyodbc connection to the idle pool, or closes it if the pool is full.
+    :param connection_str: The connection string the connection was opened with.
+    :param conn: The pyodbc connection.
+    :param opened_at: The monotonic time at which the connection was opened.
+    :param pool_size: The maximum number of idle connections kept for the connection string.
+    '''
+    try:
+        conn.rollback()  # end any open read transaction before the connection is reused
+    except Exception:
+        conn.close()
+        return
+    with _registry_lock:
+        idle = _odbc_registry.setdefault(connection_str, [])
+        if len(idle) < pool_size:
+            idle.append((conn, opened_at))
+            return
+    conn.close()
+
+
 class DatabaseExtract():
     '''
      The DatabaseExtract class provides an object with methods for querying data from various databases. Instances of the
      class support connections using SQLAlchemy or pyodbc depending on the input provided. Database-specific drivers must
      be installed for use with pyodbc. The query methods are implicit getters.
-     Methods: query
+     Engines and pyodbc connections are shared process-wide, so many instances for the same database reuse pooled
+     connections. Use the object as a context manager (or call close) to hand its connection back to the pool.
+     Methods: query, query_incremental, query_batches, query_partitioned, close, pool_stats, dispose_pools
      '''
 
-    def __init__(self, connection_url: str = None, connection_str: str = None) -> None:
+    def __init__(self, connection_url: str = None, connection_str: str = None, pool_size: int = 5,
+                 max_overflow: int = 10, pool_pre_ping: bool = True, pool_recycle: int = 3600) -> None:
         '''
         Initializes the DatabaseExtract object with a connection string or URL.
         :param connection_url: A connection url to connect to a database with using SQLAlchemy.
         :param connection_str: A connection string to connect to a database with using pyodbc.
+        :param pool_size: The number of connections kept open per database. Default is 5.
+        :param max_overflow: The number of SQLAlchemy connections allowed beyond pool_size under load. Default is 10.
+        :param pool_pre_ping: Whether SQLAlchemy connections are tested for liveness on checkout. Default is True.
+        :param pool_recycle: The number of seconds after which a pooled connection is replaced. Default is 3600.
         '''
         if connection_url and connection_str:
             raise ValueError('Provide a connection_url or a connection_str, not both.')
+        self.pool_size = pool_size
+        self.pool_recycle = pool_recycle
+        self.closed = False
         if connection_url:
-            self.engine = create_engine(connection_url)
+            self.engine = _get_engine(connection_url, pool_size, max_overflow, pool_pre_ping, pool_recycle)
             self.connection = self.engine.connect()
             self.connection_type = 'sqlalchemy'
         elif connection_str:
-            self.conn = pyodbc.connect(connection_str)
+            self.connection_str = connection_str
+            self.conn, self._opened_at = _acquire_odbc(connection_str, pool_recycle)
             self.connection_type = 'pyodbc'
         else:
             raise ValueError('A connection_url or connection_str must be provided.')
 
-    def query(self, sql: str) -> pd.DataFrame:
+    def __enter__(self):
+        '''
+        Enters a context in which the object holds a pooled connection.
+        :return: The DatabaseExtract object.
+        '''
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        '''
+        Returns the connection to the shared pool when the context exits.
+        '''
+        self.close()
+
+    def close(self) -> None:
+        '''
+        Returns the connection held by this object to the shared pool. The object cannot be queried afterwards.
+        '''
+        if self.closed:
+            return
+        self.closed = True
+        if self.connection_type == 'sqlalchemy':
+            self.connection.close()
+        else:
+            _release_odbc(self.connection_str, self.conn, self._opened_at, self.pool_size)
+
+    @staticmethod
+    def pool_stats() -> dict:
+        '''
+        Reports how often engines and connections were reused from the shared pools.
+        :return: A dictionary of engine and connection hit and miss counts.
+        '''
+        with _registry_lock:
+            return dict(_pool_stats)
+
+    @staticmethod
+    def dispose_pools() -> None:
+        '''
+        Disposes every shared engine, closes every idle pyodbc connection and resets the pool statistics.
+        '''
+        with _registry_lock:
+            engines = list(_engine_registry.values())
+            idle = [conn for connections in _odbc_registry.values() for conn, _ in connections]
+            _engine_registry.clear()
+            _odbc_registry.clear()
+            for stat in _pool_stats:
+                _pool_stats[stat] = 0
+        for engine in engines:
+            engine.dispose()
+        for conn in idle:
+            conn.close()
+
+    @instrumented('extract')
+    def query(self, sql: str, params=None, compact: bool = False) -> pd.DataFrame:
         '''
         Executes a SQL query using the established database connection.
         :param sql: The SQL query to execute.
+        :param params: Optional bound parameters. Use a dictionary with :name placeholders for SQLAlchemy connections and
+                       a sequence with ? placeholders for pyodbc connections.
+        :param compact: If True, shrink the dataframe's dtypes with compact_dataframe. The report of bytes before and
+                        after is kept in the compaction_report attribute. Default is False.
         :return: A pandas dataframe containing the results of the SQL query.
         '''
         if self.connection_type == 'sqlalchemy':
             try:
-                return pd.read_sql_query(sql, self.connection)
+                statement = require('sqlalchemy').text(sql) if params else sql
+                data = pd.read_sql_query(statement, self.connection, params=params)
             except Exception as e:
+                record_error(e)
                 print(f"Something went wrong with the SQLAlchemy query. Here are the details:\n{e}")
                 return pd.DataFrame()  # Return empty pandas data frame on error
         elif self.connection_type == 'pyodbc':
             try:
-                return pd.read_sql_query(sql, self.conn)
+                data = pd.read_sql_query(sql, self.conn, params=params)
             except Exception as e:
+                record_error(e)
                 print(f"Something went wrong with the pyodbc query. Here are the details:\n{e}")
                 return pd.DataFrame()  # Return empty pandas data frame on error
+        if compact:
+            data, self.compaction_report = compact_dataframe(data)
+        return data
+
+    @instrumented('extract')
+    def query_incremental(self, source: str, watermark_column: str, state: StateStore, key: str = None,
+                          initial=None, start=None, end=None, commit: bool = True, **kwargs) -> pd.DataFrame:
+        '''
+        Reads only the rows of a table or query added since the last run, using a high-watermark column (e.g. - an
+        increasing id or an updated_at timestamp). The largest watermark value read is saved in a StateStore and
+        scopes the next run to rows beyond it. Passing start and/or end backfills that range instead, without reading
+        or moving the saved watermark. Reset with state.reset(key) to read everything again.
+        :param source: A table name or a SQL query.
+        :param watermark_column: The column whose values only increase as rows are added or updated.
+        :param state: The StateStore holding the watermark.
+        :param key: The state key of the watermark. Defaults to 'watermark:<source>:<watermark_column>'.
+        :param initial: The watermark to start from when none is saved. Reads everything if not provided.
+        :param start: The inclusive lower bound of a backfill range.
+        :param end: The exclusive upper bound of a backfill range.
+        :param commit: Whether to save the new watermark now. If False, it is kept in last_watermark so it can be
+                       saved with state.set once the rows are loaded. Default is True.
+        :param kwargs: Any additional arguments supported by query (e.g. - compact) are supported.
+        :return: A pandas dataframe containing the new rows, ordered by the watermark column.
+        '''
+        key = key or f'watermark:{source}:{watermark_column}'
+        base_sql = f'SELECT * FROM ({source}) AS _incremental_source' if ' ' in source.strip() else \
+            f'SELECT * FROM {source}'
+        backfill = start is not None or end is not None
+        bounds = [(watermark_column + ' >= {}', start), (watermark_column + ' < {}', end)] if backfill else \
+            [(watermark_column + ' > {}', state.get(key, initial))]
+        bounds = [(condition, value) for condition, value in bounds if value is not None]
+        if self.connection_type == 'sqlalchemy':
+            conditions = [condition.format(f':bound_{index}') for index, (condition, _) in enumerate(bounds)]
+            params = {f'bound_{index}': value for index, (_, value) in enumerate(bounds)}
+        else:
+            conditions = [condition.format('?') for condition, _ in bounds]
+            params = [value for _, value in bounds]
+        where = f' WHERE {" AND ".join(conditions)}' if conditions else ''
+        data = self.query(f'{base_sql}{where} ORDER BY {watermark_column}', params=params or None, **kwargs)
+        self.last_watermark = None
+        if not backfill and not data.empty:
+            watermark = data[watermark_column].max()
+            watermark = watermark.isoformat() if hasattr(watermark, 'isoformat') else \
+                watermark.item() if hasattr(watermark, 'item') else watermark
+            self.last_watermark = watermark
+            if commit:
+                state.set(key, watermark)
+        return data
+
+    @instrumented('extract')
+    def query_batches(self, sql: str, params=None, batch_size: int = 10000) -> Iterator[pd.DataFrame]:
+        '''
+        Executes a SQL query and streams the results back as a sequence of pandas dataframes. SQLAlchemy connections
+        use a server-side cursor where the dialect supports one; pyodbc connections fetch rows with fetchmany. Only one
+        batch is held in memory at a time, so transformation can start before the query has finished.
+        :param sql: The SQL query to execute.
+        :param params: Optional bound parameters. Use a dictionary with :name placeholders for SQLAlchemy connections and
+                       a sequence with ? placeholders for pyodbc connections.
+        :param batch_size: The number of rows in each dataframe.
+        :return: A generator of pandas dataframes containing the results of the SQL query.
+        '''
+        if batch_size < 1:
+            raise ValueError('batch_size must be a positive integer.')
+        if self.connection_type == 'sqlalchemy':
+            return self._sqlalchemy_batches(sql, params, batch_size)
+        return self._pyodbc_batches(sql, params, batch_size)
+
+    def _sqlalchemy_batches(self, sql: str, params, batch_size: int) -> Iterator[pd.DataFrame]:
+        '''
+        Generator backing query_batches for SQLAlchemy connections.
+        '''
+        options = {'stream_results': True, 'max_row_buffer': batch_size}
+        try:
+            if params:
+                result = self.connection.execute(require('sqlalchemy').text(sql), params, execution_options=options)
+            else:
+                result = self.connection.exec_driver_sql(sql, execution_options=options)
+            with result:
+                columns = list(result.keys())
+                for rows in result.partitions(batch_size):
+                    yield pd.DataFrame.from_records(rows, columns=columns)
+        except Exception as e:
+            record_error(e)
+            print(f"Something went wrong with the SQLAlchemy query. Here are the details:\n{e}")
+
+    def _pyodbc_batches(self, sql: str, params, batch_size: int) -> Iterator[pd.DataFrame]:
+        '''
+        Generator backing query_batches for pyodbc connections.
+        '''
+        try:
+            cursor = self.conn.cursor()
+            try:
+                if params:
+                    cursor.execute(sql, params)
+                else:
+                    cursor.execute(sql)
+                columns = [column[0] for column in cursor.description]
+                while rows := cursor.fetchmany(batch_size):
+                    yield pd.DataFrame.from_records([tuple(row) for row in rows], columns=columns)
+            finally:
+                cursor.close()
+        except Exception as e:
+            record_error(e)
+            print(f"Something went wrong with the pyodbc query. Here are the details:\n{e}")
+
+    @instrumented('extract')
+    def query_partitioned(self, source: str, partition_column: str = None, lower_bound=None, upper_bound=None,
+                          num_partitions: int = 4, predicates: list = None, max_workers: int = None,
+                          stream: bool = False) -> pd.DataFrame | Iterator[pd.DataFrame]:
+        '''
+        Reads a table or query in slices that are executed concurrently, each on its own pooled connection. Slices are
+        defined either by explicit predicates or by splitting the range of a numeric partition column into equal
+        strides. Rows with a null partition column are read with the first stride. An empty source gives an empty
+        result, and a source whose partition column is entirely null is read as a single slice.
+        :param source: A table name or a SQL query to partition.
+        :param partition_column: The numeric column used to split the source. Required unless predicates are provided.
+        :param lower_bound: The lower bound of the partition column. Queried from the source if not provided.
+        :param upper_bound: The upper bound of the partition column. Queried from the source if not provided.
+        :param num_partitions: The number of strides to split the partition column range into.
+        :param predicates: A list of SQL WHERE clause predicates, one per slice. Overrides partition column strides.
+        :param max_workers: The number of concurrent connections. Defaults to one per slice.
+        :param stream: If True, return a generator that yields each slice as soon as it arrives instead of one
+                       concatenated dataframe in slice order.
+        :return: A pandas dataframe of every slice, or a generator of slice dataframes if stream is True.
+        '''
+        base_sql = f'SELECT * FROM ({source}) AS _partition_source' if ' ' in source.strip() else \
+            f'SELECT * FROM {source}'
+        if predicates is None:
+            if partition_column is None:
+                raise ValueError('A partition_column or a list of predicates must be provided.')
+            if lower_bound is None or upper_bound is None:
+                bounds = self.query(f'SELECT MIN({partition_column}) AS lower_bound, '
+                                    f'MAX({partition_column}) AS upper_bound, COUNT(*) AS row_count '
+                                    f'FROM ({base_sql}) AS _bounds')
+                if bounds.empty or not bounds.iloc[0, 2]:
+                    return iter(()) if stream else pd.DataFrame()
+                lower_bound = bounds.iloc[0, 0] if lower_bound is None else lower_bound
+                upper_bound = bounds.iloc[0, 1] if upper_bound is None else upper_bound
+            if pd.isna(lower_bound) and pd.isna(upper_bound):  # every partition column value is null
+                predicates = ['1 = 1']
+            else:
+                predicates = self._partition_predicates(partition_column, lower_bound, upper_bound, num_partitions)
+        statements = [f'SELECT * FROM ({base_sql}) AS _partition WHERE ({predicate})' for predicate in predicates]
+        max_workers = max_workers or len(statements)
+        if stream:
+            return self._stream_partitions(statements, max_workers)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            slices = list(executor.map(self._query_partition, statements))
+        return pd.concat(slices, ignore_index=True) if slices else pd.DataFrame()
+
+    def _stream_partitions(self, statements: list, max_workers: int) -> Iterator[pd.DataFrame]:
+        '''
+        Generator backing query_partitioned in stream mode. Yields slices in completion order.
+        '''
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(self._query_partition, statement) for statement in statements]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def _query_partition(self, sql: str) -> pd.DataFrame:
+        '''
+        Executes one slice of a partitioned read on a connection of its own, so slices can run concurrently.
+        :param sql: The SQL query for the slice.
+        :return: A pandas dataframe containing the slice.
+        '''
+        try:
+            if self.connection_type == 'sqlalchemy':
+                with self.engine.connect() as connection:
+                    return pd.read_sql_query(sql, connection)
+            conn, opened_at = _acquire_odbc(self.connection_str, self.pool_recycle)
+            try:
+                return pd.read_sql_query(sql, conn)
+            finally:
+                _release_odbc(self.connection_str, conn, opened_at, self.pool_size)
+        except Exception as e:
+            record_error(e)
+            print(f"Something went wrong with the partitioned query. Here are the details:\n{e}")
+            return pd.DataFrame()  # Return empty pandas data frame on error
+
+    @staticmethod
+    def _partition_predicates(column: str, lower_bound, upper_bound, num_partitions: int) -> list:
+        '''
+        Splits the range of a numeric column into equal strides and returns one WHERE clause predicate per stride. The
+        first and last strides are open-ended so rows outside the bounds are not lost.
+        :param column: The partition column.
+        :param lower_bound: The lower bound of the column.
+        :param upper_bound: The upper bound of the column.
+        :param num_partitions: The number of strides.
+        :return: A list of SQL predicates.
+        '''
+        if not all(isinstance(bound, numbers.Number) for bound in (lower_bound, upper_bound)):
+            raise ValueError('Partition bounds must be numeric. Use predicates to partition on other types.')
+        if num_partitions < 1:
+            raise ValueError('num_partitions must be a positive integer.')
+        if isinstance(lower_bound, numbers.Integral) and isinstance(upper_bound, numbers.Integral):
+            stride = (int(upper_bound) - int(lower_bound)) / num_partitions
+            edges = sorted({int(lower_bound) + int(round(stride * index)) for index in range(1, num_partitions)})
+        else:
+            stride = (float(upper_bound) - float(lower_bound)) / num_partitions
+            edges = sorted({float(lower_bound) + stride * index for index in range(1, num_partitions)})
+        if not edges:
+            return ['1 = 1']
+        predicates = [f'{column} < {edges[0]} OR {column} IS NULL']
+        predicates += [f'{column} >= {low} AND {column} < {high}' for low, high in zip(edges, edges[1:])]
+        predicates.append(f'{column} >= {edges[-1]}')
+        return predicates
+
+
+class _TokenBucket():
+    '''
+    A thread-safe token bucket used to rate limit outgoing API requests. Tokens refill continuously at `rate` per second
+    up to `capacity`; each request consumes one token and waits when none are available.
+    '''
+
+    def __init__(self, rate: float, capacity: int = None) -> None:
+        '''
+        Initializes a full token bucket.
+        :param rate: The number of requests allowed per second.
+        :param capacity: The largest burst of requests allowed at once. Defaults to the per-second rate (at least 1).
+        '''
+        if rate <= 0:
+            raise ValueError('rate must be positive.')
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        '''
+        Consumes one token, sleeping until one is available.
+        '''
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class Paginator():
+    '''
+    Base class for API pagination strategies used by APIExtract.fetch_pages. A strategy pulls the records out of each
+    page and works out the request for the next page. Strategies can be built from the "pagination" section of an
+    APIExtract configuration file with Paginator.from_config.
+    Methods: from_config, records, next_request
+    '''
+
+    def __init__(self, records_path: str = None) -> None:
+        '''
+        Initializes the paginator.
+        :param records_path: Dot-separated path to the list of records in each page (e.g. - "data.items"). If not
+                             provided, the page itself is treated as the list of records.
+        '''
+        self.records_path = records_path
+
+    @staticmethod
+    def from_config(config: dict):
+        '''
+        Builds a paginator from a configuration dictionary such as {"type": "cursor", "cursor_path": "meta.next"}.
+        :param config: A dictionary with a "type" of cursor, page or link and the keyword arguments of that strategy.
+        :return: A Paginator instance.
+        '''
+        options = dict(config)
+        strategies = {'cursor': CursorPaginator, 'page': PageNumberPaginator, 'link': LinkHeaderPaginator}
+        strategy = options.pop('type', None)
+        if strategy not in strategies:
+            raise ValueError(f'Unknown pagination type {strategy}. Use one of {sorted(strategies)}.')
+        return strategies[strategy](**options)
+
+    @staticmethod
+    def _lookup(payload, path: str):
+        '''
+        Follows a dot-separated path into a JSON payload.
+        :return: The value at the path, or None if any part of the path is missing.
+        '''
+        for key in path.split('.') if path else []:
+            if not isinstance(payload, dict):
+                return None
+            payload = payload.get(key)
+        return payload
+
+    def records(self, payload) -> list:
+        '''
+        Extracts the list of records from a page.
+        :param payload: The decoded JSON page.
+        :return: The records in the page.
+        '''
+        records = self._lookup(payload, self.records_path)
+        if records is None:
+            return []
+        return records if isinstance(records, list) else [records]
+
+    def next_request(self, response, payload, url: str, params: dict):
+        '''
+        Works out the request for the next page.
+        :param response: The HTTP response of the current page.
+        :param payload: The decoded JSON of the current page.
+        :param url: The URL of the current page.
+        :param params: The query parameters of the current page.
+        :return: A tuple of the next URL and query parameters, or None if this was the last page.
+        '''
+        raise NotImplementedError
+
+
+class CursorPaginator(Paginator):
+    '''
+    Follows an opaque cursor returned in each page and passed back as a query parameter.
+    '''
+
+    def __init__(self, cursor_param: str = 'cursor', cursor_path: str = 'next_cursor', records_path: str = None) -> None:
+        '''
+        Initializes the cursor paginator.
+        :param cursor_param: The query parameter the cursor is sent back in.
+        :param cursor_path: Dot-separated path to the next cursor in each page. A missing or empty cursor ends paging.
+        :param records_path: Dot-separated path to the list of records in each page.
+        '''
+        super().__init__(records_path)
+        self.cursor_param = cursor_param
+        self.cursor_path = cursor_path
+
+    def next_request(self, response, payload, url: str, params: dict):
+        cursor = self._lookup(payload, self.cursor_path)
+        if not cursor:
+            return None
+        return url, {**params, self.cursor_param: cursor}
+
+
+class PageNumberPaginator(Paginator):
+    '''
+    Increments a page number query parameter until a page comes back empty or short.
+    '''
+
+    def __init__(self, page_param: str = 'page', start: int = 1, page_size_param: str = None, page_size: int = None,
+                 records_path: str = None) -> None:
+        '''
+        Initializes the page number paginator.
+        :param page_param: The query parameter holding the page number.
+        :param start: The number of the first page.
+        :param page_size_param: The query parameter holding the page size, if the API accepts one.
+        :param page_size: The page size to request. A page with fewer records ends paging.
+        :param records_path: Dot-separated path to the list of records in each page.
+        '''
+        super().__init__(records_path)
+        self.page_param = page_param
+        self.start = start
+        self.page_size_param = page_size_param
+        self.page_size = page_size
+
+    def first_params(self, params: dict) -> dict:
+        '''
+        Adds the first page number (and page size) to the query parameters of the first request.
+        '''
+        params = {**params, self.page_param: params.get(self.page_param, self.start)}
+        if self.page_size_param and self.page_size:
+            params[self.page_size_param] = self.page_size
+        return params
+
+    def next_request(self, response, payload, url: str, params: dict):
+        records = self.records(payload)
+        if not records or (self.page_size and len(records) < self.page_size):
+            return None
+        return url, {**params, self.page_param: int(params[self.page_param]) + 1}
+
+
+class LinkHeaderPaginator(Paginator):
+    '''
+    Follows the rel="next" URL of the RFC 8288 Link response header, as used by GitHub-style APIs.
+    '''
+
+    def next_request(self, response, payload, url: str, params: dict):
+        next_link = response.links.get('next', {}).get('url')
+        if not next_link:
+            return None
+        return next_link, {}  # the next link already carries its query string
+
+
+class ResponseCache():
+    '''
+    An opt-in cache of decoded API responses for APIExtract. Entries are held in an in-memory LRU and, optionally,
+    written to a directory so that repeated pipeline runs can reuse them. Entries are keyed by the URL with the merged
+    parameters and headers, minus secret fields such as API keys, and expire after a per-entry TTL (the response's
+    Cache-Control max-age, or the cache default). Expired entries that carry an ETag or Last-Modified validator are
+    revalidated with a conditional request rather than downloaded again. Cached payloads are returned as-is and should
+    not be mutated by the caller.
+    Methods: key, get, put, refresh, validators, stats, clear
+    '''
+
+    # credential names only; generic names such as key often select the resource and must stay in the cache key
+    secret_fields = frozenset({'appid', 'api_key', 'apikey', 'token', 'access_token', 'client_id', 'client_secret',
+                               'password', 'authorization', 'x-api-key'})
+
+    def __init__(self, ttl: float = 300, max_entries: int = 1024, directory: str = None,
+                 secret_fields: set = None) -> None:
+        '''
+        Initializes the ResponseCache object.
+        :param ttl: The default number of seconds an entry stays fresh.
+        :param max_entries: The maximum number of entries kept in memory and on disk. Least recently used entries are
+                            evicted first.
+        :param directory: A directory to persist entries to. Entries are only kept in memory if not provided.
+        :param secret_fields: Parameter and header names (case-insensitive) left out of cache keys. Defaults to
+                              common credential names.
+        '''
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.directory = directory
+        self.secret_fields = frozenset(field.lower() for field in (secret_fields or self.secret_fields))
+        self.entries = OrderedDict()
+        self.counters = {'hits': 0, 'misses': 0, 'revalidations': 0, 'evictions': 0}
+        self.lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def key(self, url: str, params: dict = None, headers: dict = None) -> str:
+        '''
+        Builds the cache key of a request.
+        :param url: The full request URL.
+        :param params: The merged query parameters.
+        :param headers: The merged request headers.
+        :return: A hex digest identifying the request.
+        '''
+        def public(values):
+            return sorted((str(k), str(v)) for k, v in (values or {}).items() if str(k).lower() not in self.secret_fields)
+        identity = json.dumps([url, public(params), public(headers)])
+        return hashlib.sha256(identity.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.json')
+
+    def get(self, key: str) -> dict:
+        '''
+        Looks up an entry, falling back to the cache directory on a memory miss. Counts a hit for a fresh entry and a
+        miss otherwise. The entry's file is touched, so disk eviction is least recently used rather than first in.
+        :param key: The cache key.
+        :return: The entry (payload, etag, last_modified, expires, fresh), or None if there is no entry.
+        '''
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None and self.directory and os.path.exists(self._path(key)):
+                try:
+                    with open(self._path(key), 'r') as file:
+                        entry = json.load(file)
+                    self._remember(key, entry)
+                except (OSError, ValueError):
+                    entry = None
+            if entry is None:
+                self.counters['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            if self.directory:
+                try:
+                    os.utime(self._path(key))
+                except OSError:
+                    pass  # the file was evicted or removed; the entry is still served from memory
+            fresh = time.time() < entry['expires']
+            self.counters['hits' if fresh else 'misses'] += 1
+            return {**entry, 'fresh': fresh}
+
+    def put(self, key: str, payload, etag: str = None, last_modified: str = None, ttl: float = None) -> None:
+        '''
+        Stores a payload and its validators.
+        :param key: The cache key.
+        :param payload: The decoded JSON payload.
+        :param etag: The ETag response header, used for revalidation.
+        :param last_modified: The Last-Modified response header, used for revalidation.
+        :param ttl: The number of seconds the entry stays fresh. Defaults to the cache TTL.
+        '''
+        entry = {'payload': payload, 'etag': etag, 'last_modified': last_modified,
+                 'expires': time.time() + (self.ttl if ttl is None else ttl)}
+        with self.lock:
+            self._remember(key, entry)
+            if self.directory:
+                temp_path = f'{self._path(key)}.{threading.get_ident()}.tmp'
+                with open(temp_path, 'w') as file:
+                    json.dump(entry, file)
+                os.replace(temp_path, self._path(key))  # readers never see a partially written entry
+                self._evict_files()
+
+    def refresh(self, key: str, ttl: float = None) -> None:
+        '''
+        Marks an entry fresh again after the server confirmed it is unchanged (HTTP 304).
+        :param key: The cache key.
+        :param ttl: The number of seconds the entry stays fresh. Defaults to the cache TTL.
+        '''
+        with self.lock:
+            entry = self.entries.get(key)
+            self.counters['revalidations'] += 1
+        if entry is not None:
+            self.put(key, entry['payload'], entry['etag'], entry['last_modified'], ttl)
+
+    @staticmethod
+    def validators(entry: dict) -> dict:
+        '''
+        Builds the conditional request headers for an expired entry.
+        :param entry: The cache entry, or None.
+        :return: A dictionary of If-None-Match and If-Modified-Since headers.
+        '''
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def _remember(self, key: str, entry: dict) -> None:
+        '''
+        Adds an entry to the in-memory LRU, evicting the least recently used entries beyond max_entries. Caller holds
+        the lock.
+        '''
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.counters['evictions'] += 1
+
+    def _evict_files(self) -> None:
+        '''
+        Removes the least recently used entries (by file modification time, which get updates) from the cache
+        directory beyond max_entries. Caller holds the lock.
+        '''
+        paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.json')]
+        if len(paths) <= self.max_entries:
+            return
+        paths.sort(key=os.path.getmtime)
+        for path in paths[:len(paths) - self.max_entries]:
+            os.remove(path)
+
+    def stats(self) -> dict:
+        '''
+        Reports cache effectiveness.
+        :return: A dictionary of hit, miss, revalidation and eviction counts and the number of entries in memory.
+        '''
+        with self.lock:
+            return {**self.counters, 'entries': len(self.entries)}
+
+    def clear(self) -> None:
+        '''
+        Removes every entry from memory and the cache directory and resets the statistics.
+        '''
+        with self.lock:
+            self.entries.clear()
+            self.counters = dict.fromkeys(self.counters, 0)
+            if self.directory:
+                for name in os.listdir(self.directory):
+                    if name.endswith('.json'):
+                        os.remove(os.path.join(self.directory, name))
 
 
 class APIExtract():
@@ -111,16 +1304,23 @@ class APIExtract():
      The APIExtract class provides an object with methods for extracting data from APIs. Credentials can be passed in
      via a configuration file at initialization or when calling the fetch_data method. The class is flexible enough to
      allow credentials to be passed in through request headers or URL parameters to accommodate various API endpoint
-     authentication patterns. The fetch and get methods are implicit getters.
-     Methods: load_config, fetch_data, get_top_n_reddit_posts
+     authentication patterns. The fetch and get methods are implicit getters. Requests share one HTTP session so
+     connections are kept alive between calls. An optional ResponseCache serves repeated requests from memory or disk.
+     Methods: load_config, fetch_data, fetch_pages, fetch_many, get_top_n_reddit_posts
     '''
 
-    def __init__(self, config: str) -> None:
+    retry_statuses = frozenset({429, 500, 502, 503, 504})
+
+    def __init__(self, config: str, cache: ResponseCache = None) -> None:
         '''
         Initializes the APIExtract object with a configuration file.
         :param config: The path to a configuration file.
+        :param cache: An optional ResponseCache used by fetch_data and fetch_many.
         '''
         self.config = self.load_config(config)
+        self.session = require('requests').Session()
+        self.cache = cache
+        self._pool_size = None  # the connection pool size mounted by fetch_many
 
     def load_config(self, path: str) -> dict:
         '''
@@ -131,17 +1331,15 @@ class APIExtract():
         with open(path, 'r') as file:
             return json.load(file)
 
-    def fetch_data(self, url: str, command: str = '', params: dict = None, headers: dict = None) -> dict | list:
+    def _prepare_request(self, url: str, command: str = '', params: dict = None, headers: dict = None) -> tuple:
         '''
-        Sends a GET request to the specified API URL for data. Optionally appends a command/endpoint to the URL.
-        The method integrates configurations from the configuration file used at object initialization with any
-        parameters or headers passed in at method call. Configurations in the config file can be overwritten at method
-        call.
+        Merges the parameters and headers from the configuration file with those passed in at method call and appends
+        the command/endpoint to the base URL.
         :param url: The base URL for the API endpoint.
         :param command: Command/endpoint to append to the base URL.
         :param params: Query parameters to include with the GET request.
         :param headers: HTTP headers to send with the GET request.
-        :return: The response as a dictionary or list of dictionaries, depending on the API provider.
+        :return: A tuple of the full URL, the merged parameters and the merged headers.
         '''
         # use values from config else init empty dictionaries
         _params = self.config.get('parameters', {}).copy()
@@ -152,14 +1350,217 @@ class APIExtract():
         # if supplying headers at method call, update headers dictionary with new headers
         if headers:
             _headers.update(headers)
-        url += command  # append command/endpoint to base URL
+        return url + command, _params, _headers  # append command/endpoint to base URL
+
+    @instrumented('extract')
+    def fetch_data(self, url: str, command: str = '', params: dict = None, headers: dict = None) -> dict | list:
+        '''
+        Sends a GET request to the specified API URL for data. Optionally appends a command/endpoint to the URL.
+        The method integrates configurations from the configuration file used at object initialization with any
+        parameters or headers passed in at method call. Configurations in the config file can be overwritten at method
+        call.
+        :param url: The base URL for the API endpoint.
+        :param command: Command/endpoint to append to the base URL.
+        :param params: Query parameters to include with the GET request.
+        :param headers: HTTP headers to send with the GET request.
+        :return: The response as a dictionary or list of dictionaries, depending on the API provider.
+        '''
+        url, _params, _headers = self._prepare_request(url, command, params, headers)
         try:
-            response = requests.get(url, params=_params, headers=_headers)
-            return response.json()
+            return self._get_json(url, _params, _headers)[2]
         except Exception as e:
+            record_error(e)
             print(f'Something went wrong with the API call. Here are the details.\n{e}')
             return dict()  # Return empty dictionary if error
 
+    def _get_json(self, url: str, params: dict, headers: dict, retry_statuses=frozenset()) -> tuple:
+        '''
+        Sends a GET request, going through the response cache when one is configured. Fresh entries are returned
+        without a request and expired entries are revalidated with a conditional request.
+        :param url: The full request URL.
+        :param params: The merged query parameters.
+        :param headers: The merged request headers.
+        :param retry_statuses: Status codes whose bodies are not decoded because the request will be retried.
+        :return: A tuple of the status code, the response headers and the decoded payload.
+        '''
+        key = entry = None
+        if self.cache is not None:
+            key = self.cache.key(url, params, headers)
+            entry = self.cache.get(key)
+            if entry is not None and entry['fresh']:
+                return 200, {}, entry['payload']
+            headers = {**headers, **self.cache.validators(entry)}
+        response = self.session.get(url, params=params, headers=headers)
+        if response.status_code == 304 and entry is not None:
+            self.cache.refresh(key, self._max_age(response.headers))
+            return 200, response.headers, entry['payload']
+        if response.status_code in retry_statuses:
+            return response.status_code, response.headers, None
+        payload = response.json()
+        cache_control = response.headers.get('Cache-Control', '').lower()
+        if self.cache is not None and response.ok and 'no-store' not in cache_control:
+            self.cache.put(key, payload, response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                           self._max_age(response.headers))
+        return response.status_code, response.headers, payload
+
+    @staticmethod
+    def _max_age(response_headers) -> float:
+        '''
+        Reads the max-age directive of a Cache-Control response header.
+        :return: The max-age in seconds, or None if the header does not set one.
+        '''
+        for directive in response_headers.get('Cache-Control', '').split(','):
+            name, _, value = directive.strip().partition('=')
+            if name.lower() == 'max-age' and value.isdigit():
+                return float(value)
+        return None
+
+    @instrumented('extract')
+    def fetch_pages(self, url: str, command: str = '', params: dict = None, headers: dict = None,
+                    paginator: Paginator = None, prefetch: int = 1, max_pages: int = None, by_page: bool = False):
+        '''
+        Streams the records of a paginated API endpoint. Pages are requested by a background thread that stays up to
+        `prefetch` pages ahead, so network latency overlaps with processing of the current page and no more than
+        prefetch + 1 pages are held in memory. Parameters and headers are merged with the configuration file as in
+        fetch_data.
+        :param url: The base URL for the API endpoint.
+        :param command: Command/endpoint to append to the base URL.
+        :param params: Query parameters to include with the first request.
+        :param headers: HTTP headers to send with every request.
+        :param paginator: The pagination strategy. If not provided, one is built from the "pagination" section of the
+                          configuration file.
+        :param prefetch: The number of pages fetched ahead of the consumer.
+        :param max_pages: The maximum number of pages to request. Unlimited if not provided.
+        :param by_page: If True, yield each page's list of records instead of individual records. Useful as chunks for
+                        a streaming Transformer.
+        :return: A generator of records (or lists of records if by_page is True).
+        '''
+        if paginator is None:
+            if 'pagination' not in self.config:
+                raise ValueError('A paginator must be provided or configured under "pagination" in the config file.')
+            paginator = Paginator.from_config(self.config['pagination'])
+        url, _params, _headers = self._prepare_request(url, command, params, headers)
+        if isinstance(paginator, PageNumberPaginator):
+            _params = paginator.first_params(_params)
+        return self._iter_pages(url, _params, _headers, paginator, max(prefetch, 1), max_pages, by_page)
+
+    def _iter_pages(self, url: str, params: dict, headers: dict, paginator: Paginator, prefetch: int,
+                    max_pages: int, by_page: bool):
+        '''
+        Generator backing fetch_pages. Consumes pages from a bounded queue filled by a producer thread.
+        '''
+        pages = queue.Queue(maxsize=prefetch)
+        stop = threading.Event()
+        done = object()  # sentinel marking the end of the stream
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            request, page_count = (url, params), 0
+            try:
+                while request is not None and (max_pages is None or page_count < max_pages):
+                    response = self.session.get(request[0], params=request[1], headers=headers)
+                    response.raise_for_status()
+                    payload = response.json()
+                    page_count += 1
+                    if not put(paginator.records(payload)):
+                        return
+                    request = paginator.next_request(response, payload, *request)
+            except Exception as e:
+                put(e)
+                return
+            put(done)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        try:
+            while (page := pages.get()) is not done:
+                if isinstance(page, Exception):
+                    record_error(page)
+                    print(f'Something went wrong with the paginated API call. Here are the details.\n{page}')
+                    return
+                if by_page:
+                    yield page
+                else:
+                    yield from page
+        finally:
+            stop.set()  # releases the producer if the consumer stops early
+
+    @instrumented('extract')
+    def fetch_many(self, url: str, batch: list, headers: dict = None, max_concurrency: int = 8,
+                   rate_limit: float = None, burst: int = None, retries: int = 3, backoff: float = 0.5) -> list:
+        '''
+        Sends a batch of GET requests concurrently over the shared session. Requests that fail with a 429 or 5xx
+        status, a connection error or a timeout are retried with exponential backoff (or the server's Retry-After
+        delay). Other errors, such as a response that is not JSON, are not retried.
+        :param url: The base URL for the API endpoint.
+        :param batch: A list of (command, params) tuples, one per request. Configuration file parameters and headers
+                      are merged into each request as in fetch_data.
+        :param headers: HTTP headers to send with every request.
+        :param max_concurrency: The maximum number of requests in flight at once.
+        :param rate_limit: The maximum number of requests started per second. Unlimited if not provided.
+        :param burst: The largest burst of requests allowed by the rate limiter. Defaults to the per-second rate.
+        :param retries: The number of times a failed request is retried.
+        :param backoff: The delay in seconds before the first retry. Doubles with each further retry.
+        :return: A list of responses, in the same order as the batch. Failed requests are returned as empty dictionaries.
+        '''
+        bucket = _TokenBucket(rate_limit, burst) if rate_limit else None
+        if max_concurrency != self._pool_size:  # size the pool once, rather than replacing it (and its connections)
+            adapter = require('requests.adapters').HTTPAdapter(pool_connections=max_concurrency,
+                                                               pool_maxsize=max_concurrency)
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+            self._pool_size = max_concurrency
+        prepared = [self._prepare_request(url, command, params, headers) for command, params in batch]
+        errors = []
+
+        def fetch(request: tuple) -> dict | list:
+            try:
+                return self._fetch_with_retry(*request, bucket, retries, backoff)
+            except Exception as e:
+                errors.append(e)
+                print(f'Something went wrong with the API call to {request[0]}. Here are the details.\n{e}')
+                return dict()  # Return empty dictionary if the request failed
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            responses = list(executor.map(fetch, prepared))
+        for error in errors:
+            record_error(error)  # on the calling thread, where the instrumented call is active
+        return responses
+
+    def _fetch_with_retry(self, url: str, params: dict, headers: dict, bucket: _TokenBucket, retries: int,
+                          backoff: float) -> dict | list:
+        '''
+        Sends one GET request of a batch, waiting on the rate limiter and retrying transient failures.
+        :return: The response as a dictionary or list of dictionaries.
+        :raises: The last error if every attempt failed, or the first error that is not transient.
+        '''
+        exceptions = require('requests').exceptions
+        for attempt in range(retries + 1):
+            if bucket is not None:
+                bucket.acquire()
+            try:
+                status_code, response_headers, payload = self._get_json(url, params, headers, self.retry_statuses)
+                if status_code not in self.retry_statuses:
+                    return payload
+                error = exceptions.HTTPError(f'HTTP {status_code} from {url}')
+                retry_after = response_headers.get('Retry-After')
+                delay = float(retry_after) if retry_after and retry_after.isdigit() else backoff * 2 ** attempt
+            except (exceptions.ConnectionError, exceptions.Timeout) as e:
+                error = e
+                delay = backoff * 2 ** attempt
+            if attempt < retries:
+                time.sleep(delay)
+        raise error
+
+    @instrumented('extract')
     def get_top_n_reddit_posts(self, sub: str, user_agent: str = 'localhost', top: int = 10) -> pd.DataFrame:
         '''
         Retrieves the top N posts from a specified subreddit.
@@ -171,6 +1572,7 @@ class APIExtract():
         # pull credentials from Reddit API with praw-specific configuration file. Praw is a module that handles
         # authC/authZ to the Reddit API.
         client_id, client_secret = self.config['client_id'], self.config['client_secret']
+        praw = require('praw')
         try:
             reddit = praw.Reddit(client_id=client_id, client_secret=client_secret, user_agent=user_agent)
             subreddit = reddit.subreddit(sub)
@@ -180,5 +1582,6 @@ class APIExtract():
                     for post in top_posts]
             return pd.DataFrame(data)
         except Exception as e:
+            record_error(e)
             print(f'Something went wrong with getting data from the reddit API. Here are the details\n{e}')
             return pd.DataFrame()  # Return empty pandas data frame if error.
@@ -0,0 +1,306 @@
+from collections.abc import Iterator
+from dataclasses import asdict, dataclass
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+_hooks = ()  # replaced rather than mutated, so the disabled check in every call is a single truthiness test
+_hooks_lock = threading.Lock()
+_memory_hooks = 0  # registered hooks that asked for memory tracking
+_started_tracing = False  # whether tracemalloc was started here (and should be stopped here)
+_active = threading.local()  # stack of the instrumented calls running on each thread
+
+
+@dataclass
+class CallMetrics():
+    '''
+    Measurements of one instrumented call, passed to every registered hook. Values that do not apply to a call (e.g. -
+    bytes_in for a database query) are None.
+    '''
+    stage: str  # extract, transform or load
+    method: str  # e.g. - FileExtract.read_tabular
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0  # CPU time of the calling thread
+    rows_in: int = None
+    rows_out: int = None
+    bytes_in: int = None  # size of the file read
+    bytes_out: int = None  # size of the file or object written
+    memory_peak: int = None  # peak bytes allocated above the starting point, when memory tracking is on
+    error: str = None  # the error raised, or printed and replaced with an empty result
+
+
+def add_hook(hook) -> None:
+    '''
+    Registers a hook that is called with a CallMetrics object after every instrumented call. Instrumentation is
+    disabled, at the cost of one check per call, while no hook is registered. A hook with a truthy track_memory
+    attribute turns on tracemalloc, which slows allocation-heavy code noticeably.
+    :param hook: A callable taking a CallMetrics object (e.g. - a MetricsCollector).
+    '''
+    global _hooks, _memory_hooks, _started_tracing
+    with _hooks_lock:
+        _hooks = _hooks + (hook,)
+        if getattr(hook, 'track_memory', False):
+            _memory_hooks += 1
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _started_tracing = True
+
+
+def remove_hook(hook) -> None:
+    '''
+    Unregisters a hook added with add_hook.
+    :param hook: The hook to remove.
+    '''
+    global _hooks, _memory_hooks, _started_tracing
+    with _hooks_lock:
+        if hook not in _hooks:
+            return
+        hooks = list(_hooks)
+        hooks.remove(hook)
+        _hooks = tuple(hooks)
+        if getattr(hook, 'track_memory', False):
+            _memory_hooks -= 1
+            if not _memory_hooks and _started_tracing:
+                tracemalloc.stop()
+                _started_tracing = False
+
+
+def enabled() -> bool:
+    '''
+    Returns whether any hook is registered.
+    '''
+    return bool(_hooks)
+
+
+def record_error(error: BaseException) -> None:
+    '''
+    Attaches an error to the instrumented call running on this thread. Used where errors are printed and replaced
+    with an empty result, so hooks still see them.
+    :param error: The error.
+    '''
+    if _hooks and getattr(_active, 'calls', None):
+        _active.calls[-1].error = f'{type(error).__name__}: {error}'
+
+
+def _rows(value) -> int:
+    '''
+    Counts the rows of a dataframe, Arrow table or batch, list or Transformer. Returns None for anything else.
+    '''
+    if hasattr(value, 'raw_data'):  # Transformer
+        value = value.raw_data
+    if hasattr(value, 'num_rows'):
+        return value.num_rows
+    if hasattr(value, 'shape') or isinstance(value, list):
+        return len(value)
+    return None
+
+
+def _size(path) -> int:
+    '''
+    Returns the size of a local file, or the total size of the files under a local directory, or None.
+    '''
+    if not isinstance(path, (str, os.PathLike)):
+        return None
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+    return None
+
+
+def _emit(metrics: CallMetrics) -> None:
+    for hook in _hooks:
+        try:
+            hook(metrics)
+        except Exception as e:
+            print(f'Something went wrong in an instrumentation hook. Here are the details.\n{e}')
+
+
+class _Measure():
+    '''
+    Measures the wall time, thread CPU time and (if tracemalloc is tracing) peak memory of a block of code and makes
+    its CallMetrics the target of record_error.
+    '''
+
+    def __init__(self, metrics: CallMetrics, memory: bool = True) -> None:
+        self.metrics = metrics
+        self.memory = memory and tracemalloc.is_tracing()
+
+    def __enter__(self):
+        if not hasattr(_active, 'calls'):
+            _active.calls = []
+        _active.calls.append(self.metrics)
+        if self.memory:
+            self.memory_start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()  # approximate for nested calls, which reset the peak of the outer call
+        self.wall_start, self.cpu_start = time.perf_counter(), time.thread_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.metrics.wall_seconds += time.perf_counter() - self.wall_start
+        self.metrics.cpu_seconds += time.thread_time() - self.cpu_start
+        if self.memory:
+            self.metrics.memory_peak = max(self.metrics.memory_peak or 0,
+                                           tracemalloc.get_traced_memory()[1] - self.memory_start)
+        if exc_value is not None:
+            self.metrics.error = f'{exc_type.__name__}: {exc_value}'
+        _active.calls.pop()
+
+
+def _measure_stream(iterator: Iterator, metrics: CallMetrics):
+    '''
+    Passes a stream through, adding the time spent producing each chunk and the rows produced to the metrics of the
+    call that returned it. The metrics are emitted when the stream is exhausted or closed.
+    '''
+    metrics.rows_out = 0
+    try:
+        while True:
+            with _Measure(metrics, memory=False):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            metrics.rows_out += _rows(item) or 0
+            yield item
+    finally:
+        _emit(metrics)
+
+
+def instrumented(stage: str, path_in: str = None, path_out: str = None):
+    '''
+    Decorates a method so every call is measured and passed to the registered hooks as a CallMetrics object. When no
+    hook is registered the method is called directly. A returned stream is measured as it is consumed.
+    :param stage: The stage of the method (extract, transform or load).
+    :param path_in: The name of the argument holding the path of the file read, falling back to self.file_path.
+    :param path_out: The name of the argument holding the path of the file written.
+    :return: The decorator.
+    '''
+    def decorator(func):
+        signature = inspect.signature(func)
+        method = func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _hooks:
+                return func(*args, **kwargs)
+            arguments = signature.bind_partial(*args, **kwargs).arguments
+            owner = arguments.get('self')
+            metrics = CallMetrics(stage, method, rows_in=_rows(getattr(owner, 'raw_data', getattr(owner, 'data', None))))
+            if path_in is not None:
+                metrics.bytes_in = _size(arguments.get(path_in) or getattr(owner, 'file_path', None))
+            with _Measure(metrics):
+                try:
+                    result = func(*args, **kwargs)
+                except BaseException:
+                    _emit(metrics)
+                    raise
+            if isinstance(result, Iterator):
+                return _measure_stream(result, metrics)
+            metrics.rows_out = _rows(result)
+            metrics.bytes_out = _size(arguments.get(path_out)) if path_out is not None else \
+                getattr(result, 'bytes_uploaded', None)
+            _emit(metrics)
+            return result
+        return wrapper
+    return decorator
+
+
+class MetricsCollector():
+    '''
+    The MetricsCollector class is a hook that aggregates CallMetrics per stage and method, and reports them as a JSON
+    summary or in the Prometheus text exposition format. Use it as a context manager to register it for a block of
+    code, or register it with add_hook.
+    Methods: summary, to_json, to_prometheus, clear
+    '''
+
+    def __init__(self, track_memory: bool = False, keep_calls: bool = False) -> None:
+        '''
+        Initializes the MetricsCollector object.
+        :param track_memory: Whether to measure the peak memory of each call with tracemalloc. Default is False.
+        :param keep_calls: Whether to keep every CallMetrics object in the calls attribute. Default is False.
+        '''
+        self.track_memory = track_memory
+        self.keep_calls = keep_calls
+        self.lock = threading.Lock()
+        self.clear()
+
+    def __enter__(self):
+        add_hook(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        remove_hook(self)
+
+    def __call__(self, metrics: CallMetrics) -> None:
+        with self.lock:
+            if self.keep_calls:
+                self.calls.append(metrics)
+            totals = self.totals.setdefault((metrics.stage, metrics.method), {
+                'calls': 0, 'errors': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'rows_in': 0, 'rows_out': 0,
+                'bytes_in': 0, 'bytes_out': 0, 'memory_peak': 0})
+            totals['calls'] += 1
+            totals['errors'] += metrics.error is not None
+            for name in ('wall_seconds', 'cpu_seconds', 'rows_in', 'rows_out', 'bytes_in', 'bytes_out'):
+                totals[name] += getattr(metrics, name) or 0
+            totals['memory_peak'] = max(totals['memory_peak'], metrics.memory_peak or 0)
+
+    def clear(self) -> None:
+        '''
+        Forgets every collected measurement.
+        '''
+        self.totals = {}
+        self.calls = []
+
+    def summary(self) -> dict:
+        '''
+        Aggregates the collected measurements.
+        :return: A dictionary of stage to method to totals (calls, errors, wall_seconds, cpu_seconds, rows_in,
+                 rows_out, bytes_in, bytes_out and the largest memory_peak).
+        '''
+        with self.lock:
+            summary = {}
+            for (stage, method), totals in sorted(self.totals.items()):
+                summary.setdefault(stage, {})[method] = dict(totals)
+            return summary
+
+    def to_json(self, path: str = None) -> str:
+        '''
+        Serializes the summary (and every call, if kept) to JSON.
+        :param path: If provided, the JSON is also written to this file.
+        :return: The JSON document.
+        '''
+        document = {'summary': self.summary()}
+        if self.keep_calls:
+            document['calls'] = [asdict(metrics) for metrics in self.calls]
+        text = json.dumps(document, indent=2)
+        if path is not None:
+            with open(path, 'w') as file:
+                file.write(text)
+        return text
+
+    def to_prometheus(self, prefix: str = 'etl_tool') -> str:
+        '''
+        Formats the summary in the Prometheus text exposition format, e.g. for a node exporter textfile collector or
+        a push gateway.
+        :param prefix: The prefix of every metric name. Default is etl_tool.
+        :return: The metrics as text.
+        '''
+        metrics = [('calls', 'counter', 'Instrumented calls.'), ('errors', 'counter', 'Calls that failed.'),
+                   ('wall_seconds', 'counter', 'Wall time spent in calls.'),
+                   ('cpu_seconds', 'counter', 'CPU time spent in calls.'),
+                   ('rows_in', 'counter', 'Rows passed into calls.'), ('rows_out', 'counter', 'Rows returned by calls.'),
+                   ('bytes_in', 'counter', 'Bytes of files read.'), ('bytes_out', 'counter', 'Bytes written.'),
+                   ('memory_peak', 'gauge', 'Largest peak memory of a call in bytes.')]
+        summary = self.summary()
+        lines = []
+        for name, kind, description in metrics:
+            metric = f'{prefix}_{name}' + ('_total' if kind == 'counter' else '')
+            lines += [f'# HELP {metric} {description}', f'# TYPE {metric} {kind}']
+            for stage, methods in summary.items():
+                for method, totals in methods.items():
+                    lines.append(f'{metric}{{stage="{stage}",method="{method}"}} {totals[name]}')
+        return '\n'.join(lines) + '\n'
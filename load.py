@@ -1,42 +1,124 @@
-from extract import FileExtract, DatabaseExtract, APIExtract
+from extract import DatabaseExtract
 from transform import Transformer
+from instrument import instrumented, record_error
+from optional import require
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from urllib.parse import quote as url_quote
+import io
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+import zlib
 import pandas as pd
-import boto3
+
+try:  # pyarrow is only required for the columnar (Parquet/Feather) writers
+    import pyarrow as pa
+    import pyarrow.fs as pafs
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pafs = pq = None
+
+
+# The largest number of bound parameters per statement, which limits the rows in one multi-row VALUES insert.
+# Unknown dialects get a conservative default.
+_MAX_PARAMETERS = {'sqlite': 32766, 'postgresql': 65535, 'mysql': 65535, 'mariadb': 65535, 'mssql': 2098}
+_DEFAULT_MAX_PARAMETERS = 999
+
+# Column types used when a pyodbc connection has to create the target table (SQL Server names; SQLite accepts them).
+_ODBC_TYPES = {'i': 'BIGINT', 'u': 'BIGINT', 'f': 'FLOAT', 'b': 'BIT', 'M': 'DATETIME2'}
+
+
+@dataclass
+class UploadResult():
+    '''
+    Summary of a multipart upload returned by Loader.write_to_s3_multipart.
+    '''
+    bucket: str
+    key: str
+    bytes_raw: int  # bytes of CSV produced before compression
+    bytes_uploaded: int  # bytes sent to S3 after compression
+    parts: int
+    seconds: float
+
+    @property
+    def throughput(self) -> float:
+        '''
+        The upload throughput in megabytes (of uploaded data) per second.
+        '''
+        return self.bytes_uploaded / 1e6 / self.seconds if self.seconds else 0.0
 
 
 class Loader():
     '''
     The Loader class provides functionality to write data to either local filesystems or AWS S3 buckets.
-    It supports custom delimiters for the output files.
-    Methods: write_to_file, write_to_s3
+    It supports custom delimiters for the output files. A stream of dataframe chunks (e.g. - from a streaming
+    Transformer) can be written incrementally, with the header written once. Columnar Parquet and Arrow IPC (Feather)
+    output requires pyarrow.
+    Rows can be bulk loaded into a database (write_to_database) over the connection pools DatabaseExtract uses, or
+    written as a Hive-style partitioned dataset (write_partitioned) locally or on S3.
+    Methods: write_to_file, write_to_s3, write_to_s3_multipart, write_to_parquet, write_to_feather, write_to_database,
+             write_partitioned
     '''
 
-    def __init__(self, data: pd.DataFrame):
+    def __init__(self, data: pd.DataFrame | Iterator[pd.DataFrame] | Transformer):
         '''
-        Initializes the Loader object with a pandas dataframe.
-        :param data: The pandas data frame to be written to a file or S3 bucket.
+        Initializes the Loader object with a pandas dataframe or an iterator of pandas dataframe chunks.
+        :param data: The pandas data frame, or chunks of one, to be written to a file or S3 bucket. A Transformer may
+                     also be passed, in which case its (optimized) plan is run and its data is loaded.
         '''
-        if isinstance(data, pd.DataFrame):
+        if isinstance(data, Transformer):
+            data = data.get_data()
+        if isinstance(data, (pd.DataFrame, Iterator)):
             self.data = data
         else:
-            raise ValueError('Only dataframes can be used in the constructor.')
+            raise ValueError('Only dataframes or iterators of dataframes can be used in the constructor.')
+
+    def _write_csv_chunks(self, buffer, delimiter=',', index=False, **kwargs):
+        '''
+        Appends each chunk of a dataframe stream to an open text buffer. The header is only written with the first
+        chunk.
+        :param buffer: An open, writable text buffer.
+        :param delimiter: The delimiter character to use in the CSV file.
+        :param index: Whether to write row names (index).
+        :param kwargs: Any additional keyword arguments to pass to pd.DataFrame.to_csv().
+        '''
+        header = kwargs.pop('header', True)
+        for chunk in self.data:
+            chunk.to_csv(path_or_buf=buffer, sep=delimiter, index=index, header=header, **kwargs)
+            header = False
 
+    @instrumented('load', path_out='path')
     def write_to_file(self, path: str, delimiter=',', index=False, **kwargs):
         '''
-        Writes the pandas data frame to a local file in CSV format with a specified delimiter.
+        Writes the pandas data frame to a local file in CSV format with a specified delimiter. A stream of chunks is
+        appended to the file one chunk at a time and can only be written once.
         :param path: The file path or buffer where the CSV file will be saved.
         :param delimiter: The delimiter character to use in the CSV file (default is ',').
         :param index: Whether to write row names (index). Default is False.
         :param kwargs: Any additional keyword arguments to pass to pd.DataFrame.to_csv().
         '''
         try:
-            self.data.to_csv(path_or_buf=path, sep=delimiter, index=index, **kwargs)
+            if isinstance(self.data, pd.DataFrame):
+                self.data.to_csv(path_or_buf=path, sep=delimiter, index=index, **kwargs)
+            elif hasattr(path, 'write'):
+                self._write_csv_chunks(path, delimiter=delimiter, index=index, **kwargs)
+            else:
+                with open(path, 'w', newline='') as file:
+                    self._write_csv_chunks(file, delimiter=delimiter, index=index, **kwargs)
         except Exception as e:
+            record_error(e)
             print(f'Something went wrong writing the data. Here are the details.\n{e}')
 
+    @instrumented('load')
     def write_to_s3(self, bucket_name: str, output_file_name: str, delimiter=',', **kwargs):
         '''
-        Writes the pandas data frame to a CSV file and uploads it to an AWS S3 bucket using a specified delimiter.
+        Writes the pandas data frame to a CSV file and uploads it to an AWS S3 bucket using a specified delimiter. A
+        stream of chunks is written through a single open S3 file handle one chunk at a time.
         :param bucket_name: The name of the AWS S3 bucket.
         :param output_file_name: The name of the file to create within the S3 bucket.
         :param delimiter: The delimiter character to use in the CSV file (default is ',').
@@ -44,7 +126,670 @@ class Loader():
         '''
         s3_path = f's3://{bucket_name}/{output_file_name}'  # construct full s3 URI from bucket and object key
         try:
-            self.data.to_csv(path_or_buf=s3_path, sep=delimiter, index=False, **kwargs)
+            if isinstance(self.data, pd.DataFrame):
+                self.data.to_csv(path_or_buf=s3_path, sep=delimiter, index=False, **kwargs)
+            else:
+                import fsspec  # installed alongside s3fs, which pandas already requires for s3:// paths
+                with fsspec.open(s3_path, 'w', newline='') as file:
+                    self._write_csv_chunks(file, delimiter=delimiter, index=False, **kwargs)
             print(f'Successfully wrote results to {s3_path}.')
         except Exception as e:
+            record_error(e)
+            print(f'Something went wrong writing the data to s3. Here are the details.\n{e}')
+
+    @instrumented('load')
+    def write_to_s3_multipart(self, bucket_name: str, output_file_name: str, delimiter=',',
+                              part_size: int = 8 * 1024 * 1024, max_workers: int = 4, compression: str = None,
+                              rows_per_write: int = 50_000, s3_client=None, **kwargs) -> UploadResult:
+        '''
+        Streams the pandas data frame (or each chunk of a dataframe stream) to an AWS S3 object as CSV using a
+        multipart upload. Rows are serialized and optionally compressed on the fly, and each part is uploaded from a
+        thread pool as soon as it is full, so the full CSV is never held in memory. At most two parts per worker are
+        buffered at once. A failed part is noticed before the next part is submitted, and the multipart upload is then
+        aborted, without serializing the rest of the data, so no partial object or orphaned parts are left behind.
+        :param bucket_name: The name of the AWS S3 bucket.
+        :param output_file_name: The name of the file to create within the S3 bucket.
+        :param delimiter: The delimiter character to use in the CSV file (default is ',').
+        :param part_size: The size of each uploaded part in bytes. S3 requires at least 5 MiB. Default is 8 MiB.
+        :param max_workers: The number of parts uploaded concurrently. Default is 4.
+        :param compression: Compress the object on the fly with gzip or zstd (requires zstandard). Default is None.
+        :param rows_per_write: The number of rows serialized at a time.
+        :param s3_client: A boto3 S3 client. A default client is created if not provided.
+        :param kwargs: Any additional keyword arguments to pass to pd.DataFrame.to_csv().
+        :return: An UploadResult with the bytes, parts and time taken, or None if the upload failed.
+        '''
+        if part_size < 5 * 1024 * 1024:
+            raise ValueError('part_size must be at least 5 MiB.')
+        compressor = self._compressor(compression)
+        client = s3_client or require('boto3').client('s3')
+        started = time.perf_counter()
+        upload_id = None
+        try:
+            upload_id = client.create_multipart_upload(Bucket=bucket_name, Key=output_file_name)['UploadId']
+            in_flight = threading.BoundedSemaphore(max_workers * 2)
+
+            def upload_part(number: int, body: bytes) -> dict:
+                try:
+                    response = client.upload_part(Bucket=bucket_name, Key=output_file_name, UploadId=upload_id,
+                                                  PartNumber=number, Body=body)
+                    return {'PartNumber': number, 'ETag': response['ETag']}
+                finally:
+                    in_flight.release()
+
+            futures, unfinished, buffer, bytes_raw, bytes_uploaded = [], [], bytearray(), 0, 0
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                def submit(body: bytes) -> None:
+                    in_flight.acquire()  # blocks serialization while the upload queue is full
+                    for future in [future for future in unfinished if future.done()]:
+                        unfinished.remove(future)
+                        if future.exception() is not None:  # stop at the first failed part rather than at the end
+                            in_flight.release()
+                            for queued in unfinished:
+                                queued.cancel()
+                            raise future.exception()
+                    future = executor.submit(upload_part, len(futures) + 1, body)
+                    futures.append(future)
+                    unfinished.append(future)
+
+                for text in self._csv_pieces(delimiter, rows_per_write, **kwargs):
+                    raw = text.encode('utf-8')
+                    bytes_raw += len(raw)
+                    buffer += compressor.compress(raw) if compressor else raw
+                    while len(buffer) >= part_size:
+                        bytes_uploaded += part_size
+                        submit(bytes(buffer[:part_size]))
+                        del buffer[:part_size]
+                if compressor:
+                    buffer += compressor.flush()
+                if buffer or not futures:  # the last part may be smaller than part_size
+                    bytes_uploaded += len(buffer)
+                    submit(bytes(buffer))
+                parts = [future.result() for future in futures]
+            client.complete_multipart_upload(Bucket=bucket_name, Key=output_file_name, UploadId=upload_id,
+                                             MultipartUpload={'Parts': parts})
+            result = UploadResult(bucket=bucket_name, key=output_file_name, bytes_raw=bytes_raw,
+                                  bytes_uploaded=bytes_uploaded, parts=len(parts),
+                                  seconds=time.perf_counter() - started)
+            print(f'Successfully wrote results to s3://{bucket_name}/{output_file_name}.')
+            return result
+        except Exception as e:
+            if upload_id is not None:
+                try:
+                    client.abort_multipart_upload(Bucket=bucket_name, Key=output_file_name, UploadId=upload_id)
+                except Exception:
+                    pass  # the original error is the one worth reporting
+            record_error(e)
             print(f'Something went wrong writing the data to s3. Here are the details.\n{e}')
+            return None
+
+    @staticmethod
+    def _compressor(compression: str):
+        '''
+        Creates a streaming compressor with compress and flush methods.
+        :param compression: gzip, zstd or None.
+        :return: The compressor, or None if compression is None.
+        '''
+        if compression is None:
+            return None
+        if compression == 'gzip':
+            return zlib.compressobj(wbits=31)  # 31 selects the gzip container
+        if compression == 'zstd':
+            return require('zstandard').ZstdCompressor().compressobj()
+        raise ValueError('compression must be gzip, zstd or None.')
+
+    def _csv_pieces(self, delimiter=',', rows_per_write: int = 50_000, **kwargs):
+        '''
+        Serializes the data to CSV text a slice of rows at a time, with the header only in the first piece.
+        :param delimiter: The delimiter character to use in the CSV text.
+        :param rows_per_write: The number of rows serialized at a time.
+        :param kwargs: Any additional keyword arguments to pass to pd.DataFrame.to_csv().
+        :return: A generator of CSV text.
+        '''
+        header = kwargs.pop('header', True)
+        index = kwargs.pop('index', False)
+        for chunk in self._frames():
+            for start in range(0, len(chunk), rows_per_write):
+                yield chunk.iloc[start:start + rows_per_write].to_csv(sep=delimiter, index=index, header=header,
+                                                                       **kwargs)
+                header = False
+
+    def _frames(self):
+        '''
+        Iterates over the data as dataframes: the dataframe itself, or each chunk of a dataframe stream.
+        '''
+        if isinstance(self.data, pd.DataFrame):
+            yield self.data
+        else:
+            yield from self.data
+
+    @staticmethod
+    def _require_pyarrow() -> None:
+        '''
+        Raises an informative error if pyarrow is not installed.
+        '''
+        if pa is None:
+            raise ImportError('pyarrow is required for Parquet and Feather output. Install it with pip install pyarrow.')
+
+    @instrumented('load', path_out='path')
+    def write_to_parquet(self, path: str, compression: str = 'snappy', use_dictionary: bool | list = True,
+                         row_group_size: int = None, **kwargs):
+        '''
+        Writes the pandas data frame to a Parquet file. A stream of chunks is written incrementally, one or more row
+        groups per chunk, so the full output is never held in memory. Every chunk must share the first chunk's columns.
+        :param path: The local file path or filesystem URI (e.g. - s3://bucket/key.parquet) to write to.
+        :param compression: The compression codec: snappy, gzip, brotli, zstd, lz4 or none. Default is snappy.
+        :param use_dictionary: Whether to dictionary encode columns, or a list of the columns to dictionary encode.
+        :param row_group_size: The maximum number of rows per row group. Defaults to one row group per chunk.
+        :param kwargs: Any additional keyword arguments to pass to pyarrow.parquet.ParquetWriter.
+        '''
+        self._require_pyarrow()
+        writer = None
+        try:
+            for chunk in self._frames():
+                if writer is None:
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+                    writer = pq.ParquetWriter(path, table.schema, compression=compression,
+                                              use_dictionary=use_dictionary, **kwargs)
+                else:
+                    table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+                writer.write_table(table, row_group_size=row_group_size)
+        except Exception as e:
+            record_error(e)
+            print(f'Something went wrong writing the Parquet file. Here are the details.\n{e}')
+        finally:
+            if writer is not None:
+                writer.close()
+
+    @instrumented('load', path_out='path')
+    def write_to_feather(self, path: str, compression: str = 'lz4', **kwargs):
+        '''
+        Writes the pandas data frame to an Arrow IPC file (Feather version 2). A stream of chunks is written
+        incrementally as record batches. Every chunk must share the first chunk's columns.
+        :param path: The local file path or filesystem URI (e.g. - s3://bucket/key.feather) to write to.
+        :param compression: The buffer compression codec: lz4, zstd or None. Default is lz4.
+        :param kwargs: Any additional keyword arguments to pass to pyarrow.ipc.IpcWriteOptions.
+        '''
+        self._require_pyarrow()
+        options = pa.ipc.IpcWriteOptions(compression=compression, **kwargs)
+        writer = sink = schema = None
+        try:
+            for chunk in self._frames():
+                if writer is None:
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+                    schema = table.schema
+                    if '://' in path:
+                        filesystem, file_path = pafs.FileSystem.from_uri(path)
+                        sink = filesystem.open_output_stream(file_path)
+                    else:
+                        sink = pa.OSFile(path, 'wb')
+                    writer = pa.ipc.new_file(sink, schema, options=options)
+                else:
+                    table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+                writer.write_table(table)
+        except Exception as e:
+            record_error(e)
+            print(f'Something went wrong writing the Feather file. Here are the details.\n{e}')
+        finally:
+            if writer is not None:
+                writer.close()
+            if sink is not None:
+                sink.close()
+
+    @instrumented('load', path_out='path')
+    def write_partitioned(self, path: str, partition_by: str | list, file_format: str = 'parquet',
+                          max_workers: int = 4, target_file_size: int = 128 * 1024 * 1024, compression: str = None,
+                          delimiter=',', s3_client=None, **kwargs) -> dict:
+        '''
+        Writes the pandas data frame (or each chunk of a dataframe stream) as a Hive-style partitioned dataset: rows are
+        grouped by the partition columns and written under col=value/ directories (e.g. - country=UK/year=2024/), which
+        query engines such as pyarrow.dataset, Spark or Athena use to skip partitions. The partition columns are
+        encoded in the directory names rather than in the files. Files are written concurrently by a thread pool and
+        split so each holds about target_file_size bytes.
+        Output is committed atomically: local files are written under path/_temporary and moved into place only once
+        every file has been written, and S3 objects (each of which appears whole) are deleted again if any fails. The
+        _manifest.json listing every file is written last, so readers that follow it never see partial output.
+        :param path: A local directory or an S3 URI (e.g. - s3://bucket/prefix).
+        :param partition_by: The column, or list of columns, to partition by.
+        :param file_format: parquet (requires pyarrow) or csv. Default is parquet.
+        :param max_workers: The number of files written concurrently. Default is 4.
+        :param target_file_size: The approximate size of each file in bytes, estimated from a sample of the first
+                                 chunk. Default is 128 MiB.
+        :param compression: The Parquet codec (default snappy) or the CSV compression (e.g. - gzip, default none).
+        :param delimiter: The delimiter character to use in CSV files (default is ',').
+        :param s3_client: A boto3 S3 client. A default client is created if not provided.
+        :param kwargs: Any additional keyword arguments to pass to pyarrow.parquet.write_table or
+                       pd.DataFrame.to_csv().
+        :return: The manifest as a dictionary (files with their partition values, rows and bytes), or None if the write
+                 failed.
+        '''
+        partition_by = [partition_by] if isinstance(partition_by, str) else list(partition_by)
+        if file_format not in ('parquet', 'csv'):
+            raise ValueError('file_format must be parquet or csv.')
+        if file_format == 'parquet':
+            self._require_pyarrow()
+        compression = compression if compression is not None or file_format == 'csv' else 'snappy'
+        extension = '.parquet' if file_format == 'parquet' else \
+            '.csv' + {'gzip': '.gz', 'bz2': '.bz2', 'xz': '.xz', 'zstd': '.zst'}.get(compression, '')
+        run_id = uuid.uuid4().hex[:12]
+        if path.startswith('s3://'):
+            bucket, _, prefix = path[len('s3://'):].partition('/')
+            prefix = prefix.rstrip('/')
+            client = s3_client or require('boto3').client('s3')
+            staging = None
+        else:
+            bucket = prefix = client = None
+            staging = os.path.join(path, '_temporary', run_id)
+        uploaded, lock = [], threading.Lock()
+        in_flight = threading.BoundedSemaphore(max_workers * 2)
+
+        def write_file(directory: str, values: dict, frame: pd.DataFrame, number: int) -> dict:
+            try:
+                body = self._serialize(frame, file_format, compression, delimiter, **kwargs)
+                name = f'{directory}/part-{run_id}-{number:05d}{extension}'
+                if staging is None:
+                    key = f'{prefix}/{name}' if prefix else name
+                    client.put_object(Bucket=bucket, Key=key, Body=body)
+                    with lock:
+                        uploaded.append(key)
+                else:
+                    os.makedirs(os.path.join(staging, directory), exist_ok=True)
+                    with open(os.path.join(staging, name), 'wb') as file:
+                        file.write(body)
+                return {'path': name, 'partition': values, 'rows': len(frame), 'bytes': len(body)}
+            finally:
+                in_flight.release()
+
+        try:
+            futures, buffers, rows_per_file = [], {}, None
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                def submit(directory: str, values: dict, frame: pd.DataFrame) -> None:
+                    in_flight.acquire()  # blocks grouping while the write queue is full
+                    futures.append(executor.submit(write_file, directory, values, frame, len(futures)))
+
+                for chunk in self._frames():
+                    missing = [column for column in partition_by if column not in chunk.columns]
+                    if missing:
+                        raise ValueError(f'The partition columns {missing} do not exist in the DataFrame.')
+                    if rows_per_file is None:
+                        rows_per_file = self._rows_per_file(chunk.drop(columns=partition_by), target_file_size,
+                                                            file_format, compression, delimiter, **kwargs)
+                    for keys, group in chunk.groupby(partition_by, sort=False, dropna=False, observed=True):
+                        keys = keys if isinstance(keys, tuple) else (keys,)
+                        values = {column: self._partition_value(key) for column, key in zip(partition_by, keys)}
+                        directory = '/'.join(f'{url_quote(str(column), safe="")}={url_quote(value, safe="")}'
+                                             for column, value in values.items())
+                        frames, rows, _ = buffers.get(directory, ([], 0, values))
+                        frames.append(group.drop(columns=partition_by))
+                        rows += len(group)
+                        while rows >= rows_per_file:  # emit full files as soon as a partition has enough rows
+                            data = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+                            submit(directory, values, data.iloc[:rows_per_file])
+                            frames, rows = [data.iloc[rows_per_file:]], rows - rows_per_file
+                        buffers[directory] = (frames, rows, values)
+                for directory, (frames, rows, values) in buffers.items():
+                    if rows:
+                        submit(directory, values, pd.concat(frames, ignore_index=True))
+                files = [future.result() for future in futures]
+            return self._commit_partitions(path, staging, files, partition_by, file_format, run_id, client, bucket,
+                                           prefix)
+        except Exception as e:
+            if staging is not None:
+                shutil.rmtree(staging, ignore_errors=True)
+            for start in range(0, len(uploaded), 1000):  # delete_objects takes at most 1000 keys
+                try:
+                    client.delete_objects(Bucket=bucket, Delete={'Objects': [{'Key': key} for key in
+                                                                             uploaded[start:start + 1000]]})
+                except Exception:
+                    pass  # the original error is the one worth reporting
+            record_error(e)
+            print(f'Something went wrong writing the partitioned dataset. Here are the details.\n{e}')
+            return None
+
+    @staticmethod
+    def _partition_value(value) -> str:
+        '''
+        Formats a partition value for a directory name, with Hive's name for missing values.
+        '''
+        if value is None or (not isinstance(value, str) and pd.isna(value)):
+            return '__HIVE_DEFAULT_PARTITION__'
+        if isinstance(value, pd.Timestamp) and value == value.normalize():
+            return value.date().isoformat()  # 2024-01-01 rather than 2024-01-01 00:00:00
+        return str(value)
+
+    @staticmethod
+    def _serialize(frame: pd.DataFrame, file_format: str, compression: str, delimiter=',', **kwargs) -> bytes:
+        '''
+        Serializes a dataframe to Parquet or CSV bytes.
+        '''
+        if file_format == 'parquet':
+            sink = pa.BufferOutputStream()
+            pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), sink, compression=compression, **kwargs)
+            return sink.getvalue().to_pybytes()
+        buffer = io.BytesIO()
+        frame.to_csv(buffer, sep=delimiter, index=False, compression=compression, **kwargs)
+        return buffer.getvalue()
+
+    def _rows_per_file(self, chunk: pd.DataFrame, target_file_size: int, file_format: str, compression: str,
+                       delimiter=',', **kwargs) -> int:
+        '''
+        Estimates how many rows make a file of target_file_size bytes by serializing a sample of up to 10,000 rows.
+        '''
+        sample = chunk.head(10_000)
+        if sample.empty:
+            return 1_000_000
+        bytes_per_row = len(self._serialize(sample, file_format, compression, delimiter, **kwargs)) / len(sample)
+        return max(1, int(target_file_size / bytes_per_row))
+
+    @staticmethod
+    def _commit_partitions(path: str, staging: str, files: list, partition_by: list, file_format: str, run_id: str,
+                           client, bucket: str, prefix: str) -> dict:
+        '''
+        Publishes the written files and writes the manifest, which also lists the files of earlier writes to the same
+        dataset.
+        '''
+        manifest_name = '_manifest.json'
+        previous = []
+        if staging is None:
+            manifest_key = f'{prefix}/{manifest_name}' if prefix else manifest_name
+            try:
+                previous = json.loads(client.get_object(Bucket=bucket, Key=manifest_key)['Body'].read())['files']
+            except client.exceptions.NoSuchKey:
+                pass
+        else:
+            manifest_path = os.path.join(path, manifest_name)
+            if os.path.exists(manifest_path):
+                with open(manifest_path, 'r') as file:
+                    previous = json.load(file)['files']
+            for entry in files:
+                destination = os.path.join(path, entry['path'])
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                os.replace(os.path.join(staging, entry['path']), destination)
+            shutil.rmtree(staging, ignore_errors=True)
+            temporary = os.path.dirname(staging)
+            if not os.listdir(temporary):
+                os.rmdir(temporary)
+        manifest = {'format': file_format, 'partition_by': partition_by, 'run_id': run_id,
+                    'rows': sum(entry['rows'] for entry in previous + files), 'files': previous + files}
+        body = json.dumps(manifest, indent=2)
+        if staging is None:
+            client.put_object(Bucket=bucket, Key=manifest_key, Body=body.encode('utf-8'))
+        else:
+            with open(f'{manifest_path}.tmp', 'w') as file:
+                file.write(body)
+            os.replace(f'{manifest_path}.tmp', manifest_path)
+        return manifest
+
+    @instrumented('load')
+    def write_to_database(self, table: str, connection_url: str = None, connection_str: str = None,
+                          if_exists: str = 'append', mode: str = 'insert', key_columns: list = None,
+                          batch_size: int = 10_000, method: str = 'auto', fast_executemany: bool = True) -> int:
+        '''
+        Bulk loads the data into a database table over a SQLAlchemy URL or pyodbc connection string, reusing the
+        connection pools shared with DatabaseExtract. Rows are sent batch_size at a time, each batch in its own
+        transaction, so a failure leaves the batches before it committed. SQLite loads run with PRAGMA synchronous=OFF
+        (restored afterwards) and pyodbc loads use fast_executemany.
+        :param table: The name of the target table. It is created from the first chunk's columns if it does not exist.
+        :param connection_url: A connection url to connect to the database with using SQLAlchemy.
+        :param connection_str: A connection string to connect to the database with using pyodbc.
+        :param if_exists: What to do if the table exists: append, replace (drop and recreate) or fail. Default is
+                          append.
+        :param mode: insert appends rows; upsert inserts rows and updates those whose key_columns already exist, using
+                     ON CONFLICT (SQLite, PostgreSQL) or ON DUPLICATE KEY (MySQL), and merge otherwise; merge deletes
+                     rows matching the keys of each batch and inserts the batch. Upserts need a unique index on
+                     key_columns, which is created along with the table. Default is insert.
+        :param key_columns: The columns identifying a row, required for upsert and merge.
+        :param batch_size: The number of rows per batch and transaction. Default is 10,000.
+        :param method: How rows are sent: executemany, values (multi-row INSERT ... VALUES statements), copy
+                       (PostgreSQL COPY, insert mode only) or auto, which picks copy on PostgreSQL, executemany on
+                       SQL Server and pyodbc (where fast_executemany binds whole batches) and values otherwise.
+                       Default is auto.
+        :param fast_executemany: Whether to enable pyodbc's fast_executemany (array parameter binding). Default is True.
+        :return: The number of rows written, or None if the load failed.
+        '''
+        if if_exists not in ('append', 'replace', 'fail'):
+            raise ValueError('if_exists must be append, replace or fail.')
+        if mode not in ('insert', 'upsert', 'merge'):
+            raise ValueError('mode must be insert, upsert or merge.')
+        if mode != 'insert' and not key_columns:
+            raise ValueError(f'key_columns must be provided for {mode} mode.')
+        if method not in ('auto', 'executemany', 'values', 'copy'):
+            raise ValueError('method must be auto, executemany, values or copy.')
+        if batch_size < 1:
+            raise ValueError('batch_size must be a positive integer.')
+        rows = 0
+        try:
+            with DatabaseExtract(connection_url=connection_url, connection_str=connection_str) as database:
+                if database.connection_type == 'sqlalchemy':
+                    dialect = database.connection.dialect.name
+                    quote = database.connection.dialect.identifier_preparer.quote
+                else:
+                    dialect, quote = 'pyodbc', lambda name: '"' + str(name).replace('"', '""') + '"'
+                if method == 'auto':
+                    method = 'copy' if dialect == 'postgresql' and mode == 'insert' else \
+                        'executemany' if dialect in ('mssql', 'pyodbc') else 'values'
+                if method == 'copy' and (dialect != 'postgresql' or mode != 'insert'):
+                    raise ValueError('method copy is only supported in insert mode on PostgreSQL.')
+                upsert = self._upsert_clause(dialect, key_columns, quote) if mode == 'upsert' else None
+                if mode == 'upsert' and upsert is None:
+                    mode = 'merge'  # no native upsert on this dialect
+                restore = self._tune_sqlite(database) if dialect == 'sqlite' else None
+                try:
+                    created = False
+                    for chunk in self._frames():
+                        if not created:
+                            self._prepare_table(database, table, chunk, if_exists, key_columns, quote)
+                            created = True
+                        columns = [str(column) for column in chunk.columns]
+                        for start in range(0, len(chunk), batch_size):
+                            batch = chunk.iloc[start:start + batch_size]
+                            self._write_batch(database, table, columns, batch, mode, method, key_columns, quote,
+                                              upsert, fast_executemany)
+                            rows += len(batch)
+                finally:
+                    if restore is not None:
+                        restore()
+        except Exception as e:
+            record_error(e)
+            print(f'Something went wrong writing the data to the {table} table. Here are the details.\n{e}')
+            return None
+        return rows
+
+    @staticmethod
+    def _upsert_clause(dialect: str, key_columns: list, quote):
+        '''
+        Builds the clause that turns an INSERT into an upsert, as a function of the inserted columns.
+        :return: A function of the column list returning the clause, or None if the dialect has no native upsert.
+        '''
+        keys = ', '.join(quote(column) for column in key_columns)
+        if dialect in ('sqlite', 'postgresql'):
+            def clause(columns):
+                updates = [f'{quote(column)} = excluded.{quote(column)}' for column in columns
+                           if column not in key_columns]
+                return f' ON CONFLICT ({keys}) ' + (f'DO UPDATE SET {", ".join(updates)}' if updates else 'DO NOTHING')
+            return clause
+        if dialect in ('mysql', 'mariadb'):
+            def clause(columns):
+                updates = [f'{quote(column)} = VALUES({quote(column)})' for column in columns
+                           if column not in key_columns] or [f'{quote(key_columns[0])} = {quote(key_columns[0])}']
+                return f' ON DUPLICATE KEY UPDATE {", ".join(updates)}'
+            return clause
+        return None
+
+    @staticmethod
+    def _tune_sqlite(database: DatabaseExtract):
+        '''
+        Turns off fsync for a SQLite load and enlarges the page cache. The pooled connection is shared, so the settings
+        are restored afterwards.
+        :return: A function restoring the previous settings.
+        '''
+        connection = database.connection
+        previous = {pragma: connection.exec_driver_sql(f'PRAGMA {pragma}').scalar()
+                    for pragma in ('synchronous', 'cache_size')}
+        connection.exec_driver_sql('PRAGMA synchronous = OFF')
+        connection.exec_driver_sql('PRAGMA cache_size = -65536')  # 64 MiB
+        connection.commit()
+
+        def restore():
+            for pragma, value in previous.items():
+                connection.exec_driver_sql(f'PRAGMA {pragma} = {int(value)}')
+            connection.commit()
+        return restore
+
+    @staticmethod
+    def _prepare_table(database: DatabaseExtract, table: str, chunk: pd.DataFrame, if_exists: str,
+                       key_columns: list, quote) -> None:
+        '''
+        Creates (or replaces) the target table from a chunk's columns and, for upserts and merges, a unique index on
+        the key columns.
+        '''
+        if database.connection_type == 'sqlalchemy':
+            connection = database.connection
+            exists = require('sqlalchemy').inspect(connection).has_table(table)
+            connection.commit()  # end the transaction the inspection began
+        else:
+            cursor = database.conn.cursor()
+            exists = cursor.tables(table=table).fetchone() is not None
+        if exists and if_exists == 'fail':
+            raise ValueError(f'The table {table} already exists.')
+        if exists and if_exists == 'append':
+            return
+        index = None
+        if key_columns:
+            index = (f'CREATE UNIQUE INDEX {quote("ux_" + table + "_" + "_".join(key_columns))} ON {quote(table)} '
+                     f'({", ".join(quote(column) for column in key_columns)})')
+        if database.connection_type == 'sqlalchemy':
+            with connection.begin():
+                chunk.head(0).to_sql(table, connection, index=False, if_exists='replace')
+                if index is not None:
+                    connection.exec_driver_sql(index)
+        else:
+            if exists:
+                cursor.execute(f'DROP TABLE {quote(table)}')
+            definitions = ', '.join(f'{quote(column)} {_ODBC_TYPES.get(dtype.kind, "NVARCHAR(4000)")}'
+                                    for column, dtype in chunk.dtypes.items())
+            cursor.execute(f'CREATE TABLE {quote(table)} ({definitions})')
+            if index is not None:
+                cursor.execute(index)
+            database.conn.commit()
+
+    @staticmethod
+    def _records(batch: pd.DataFrame) -> list:
+        '''
+        Converts a batch to a list of row tuples of Python values, with missing values as None.
+        '''
+        columns = []
+        for _, series in batch.items():  # column by column, which is about twice as fast as converting row tuples
+            values = series.astype(object)
+            columns.append((values.where(series.notna(), None) if series.hasnans else values).tolist())
+        return list(zip(*columns))
+
+    def _write_batch(self, database: DatabaseExtract, table: str, columns: list, batch: pd.DataFrame, mode: str,
+                     method: str, key_columns: list, quote, upsert, fast_executemany: bool) -> None:
+        '''
+        Writes one batch in a single transaction. In upsert and merge modes only the last row of each key is written,
+        since a statement may not update the same row twice (e.g. - PostgreSQL's ON CONFLICT DO UPDATE).
+        '''
+        if mode != 'insert':
+            batch = batch.drop_duplicates(subset=key_columns, keep='last')
+        records = self._records(batch)
+        column_list = ', '.join(quote(column) for column in columns)
+        if database.connection_type == 'pyodbc':
+            cursor = database.conn.cursor()
+            cursor.fast_executemany = fast_executemany
+            try:
+                self._odbc_batch(cursor, table, columns, records, mode, method, key_columns, quote)
+                database.conn.commit()
+            except Exception:
+                database.conn.rollback()
+                raise
+            finally:
+                cursor.close()
+            return
+        connection = database.connection
+        positional = connection.dialect.paramstyle in ('qmark', 'format', 'pyformat')
+        marker = '?' if connection.dialect.paramstyle == 'qmark' else '%s'
+
+        def markers(count: int) -> list:
+            return [marker] * count if positional else [f':p{index}' for index in range(count)]
+
+        def run(sql: str, parameters) -> None:
+            '''
+            Executes a statement once with a tuple of parameters, or once per tuple in a list (executemany).
+            '''
+            if positional:
+                connection.exec_driver_sql(sql, parameters)
+                return
+            # named and numeric paramstyles go through SQLAlchemy's bind parameter handling
+            def bind(row):
+                return {f'p{index}': value for index, value in enumerate(row)}
+            statement = require('sqlalchemy').text(sql)
+            connection.execute(statement, [bind(row) for row in parameters] if isinstance(parameters, list)
+                               else bind(parameters))
+
+        with connection.begin():
+            if mode == 'merge':
+                key_positions = [columns.index(column) for column in key_columns]
+                conditions = ' AND '.join(f'{quote(column)} = {placeholder}'
+                                          for column, placeholder in zip(key_columns, markers(len(key_columns))))
+                run(f'DELETE FROM {quote(table)} WHERE {conditions}',
+                    [tuple(record[position] for position in key_positions) for record in records])
+            suffix = upsert(columns) if mode == 'upsert' else ''
+            if method == 'copy':
+                self._copy(connection, table, column_list, batch, quote)
+            elif method == 'values':
+                dialect = connection.dialect.name
+                rows_per_statement = max(1, _MAX_PARAMETERS.get(dialect, _DEFAULT_MAX_PARAMETERS) // len(columns))
+                if dialect == 'mssql':
+                    rows_per_statement = min(rows_per_statement, 1000)  # SQL Server's limit on VALUES rows
+                for start in range(0, len(records), rows_per_statement):
+                    group = records[start:start + rows_per_statement]
+                    flat = markers(len(group) * len(columns))
+                    values = ', '.join('(' + ', '.join(flat[row * len(columns):(row + 1) * len(columns)]) + ')'
+                                       for row in range(len(group)))
+                    run(f'INSERT INTO {quote(table)} ({column_list}) VALUES {values}{suffix}',
+                        tuple(value for row in group for value in row))
+            else:
+                run(f'INSERT INTO {quote(table)} ({column_list}) VALUES ({", ".join(markers(len(columns)))}){suffix}',
+                    records)
+
+    @staticmethod
+    def _odbc_batch(cursor, table: str, columns: list, records: list, mode: str, method: str, key_columns: list,
+                    quote) -> None:
+        '''
+        Writes one batch over a pyodbc cursor. Upserts are always merges here, as the backend is not known.
+        '''
+        column_list = ', '.join(quote(column) for column in columns)
+        if mode != 'insert':
+            key_positions = [columns.index(column) for column in key_columns]
+            conditions = ' AND '.join(f'{quote(column)} = ?' for column in key_columns)
+            cursor.executemany(f'DELETE FROM {quote(table)} WHERE {conditions}',
+                               [tuple(record[position] for position in key_positions) for record in records])
+        if method == 'values':
+            rows_per_statement = max(1, min(1000, _MAX_PARAMETERS['mssql'] // len(columns)))
+            for start in range(0, len(records), rows_per_statement):
+                group = records[start:start + rows_per_statement]
+                values = ', '.join(['(' + ', '.join(['?'] * len(columns)) + ')'] * len(group))
+                cursor.execute(f'INSERT INTO {quote(table)} ({column_list}) VALUES {values}',
+                               [value for row in group for value in row])
+        else:
+            cursor.executemany(f'INSERT INTO {quote(table)} ({column_list}) VALUES '
+                               f'({", ".join(["?"] * len(columns))})', records)
+
+    @staticmethod
+    def _copy(connection, table: str, column_list: str, batch: pd.DataFrame, quote) -> None:
+        '''
+        Streams a batch into PostgreSQL with COPY ... FROM STDIN, using psycopg2's copy_expert or psycopg's copy.
+        '''
+        buffer = io.StringIO()
+        batch.to_csv(buffer, header=False, index=False)
+        sql = f'COPY {quote(table)} ({column_list}) FROM STDIN WITH (FORMAT csv)'
+        cursor = connection.connection.cursor()
+        try:
+            if hasattr(cursor, 'copy_expert'):  # psycopg2
+                buffer.seek(0)
+                cursor.copy_expert(sql, buffer)
+            else:  # psycopg 3
+                with cursor.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+        finally:
+            cursor.close()
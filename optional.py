@@ -0,0 +1,24 @@
+import importlib
+
+# Backends loaded on first use, with what needs them and the pip package that provides them
+BACKENDS = {'sqlalchemy': ('SQLAlchemy connection URLs', 'sqlalchemy'),
+            'pyodbc': ('pyodbc connection strings', 'pyodbc'),
+            'praw': ('Reddit extraction', 'praw'),
+            'requests': ('API extraction', 'requests'),
+            'boto3': ('S3 output', 'boto3'),
+            'zstandard': ('zstd compression', 'zstandard')}
+
+
+def require(module: str):
+    '''
+    Imports a backend on first use, so importing the package does not pay for (or fail on) backends a job never
+    touches. Later calls return the module already loaded.
+    :param module: The module name, e.g. - sqlalchemy.
+    :return: The module.
+    '''
+    try:
+        return importlib.import_module(module)
+    except ImportError as e:
+        feature, package = BACKENDS.get(module.partition('.')[0], ('this feature', module))
+        raise ImportError(f'{module} is required for {feature} but could not be imported ({e}). Install it with '
+                          f'pip install {package}.') from e
@@ -0,0 +1,461 @@
+from extract import FileExtract, DatabaseExtract, APIExtract
+from transform import Transformer
+from load import Loader
+from validate import Validator
+from collections.abc import Iterator
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from functools import partial
+import importlib
+import json
+import os
+import queue
+import threading
+import time
+
+try:  # PyYAML is only required for YAML pipeline specs
+    import yaml
+except ImportError:
+    yaml = None
+
+_END = object()  # marks the end of a stream
+
+
+class _Failure():
+    '''
+    Carries an exception raised by a stream producer to its consumers.
+    '''
+
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+class _Channel():
+    '''
+    A bounded queue carrying the chunks of one stream to one consumer. Channels are closed once every step has
+    returned, so a producer whose consumers stopped early is not left blocking.
+    '''
+
+    def __init__(self, maxsize: int, cancelled: threading.Event) -> None:
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.closed = threading.Event()
+        self.cancelled = cancelled
+
+    def put(self, item) -> None:
+        while not (self.closed.is_set() or self.cancelled.is_set()):
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def drain(self):
+        '''
+        Yields the chunks of the stream until it ends, re-raising a producer error in the consumer.
+        '''
+        while True:
+            try:
+                item = self.queue.get(timeout=0.1)
+            except queue.Empty:
+                if self.cancelled.is_set():
+                    raise RuntimeError('The pipeline was cancelled.')
+                continue
+            if item is _END:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+
+
+class Step():
+    '''
+    A named unit of work in a Pipeline. The callable is passed the results of the steps it depends on as positional
+    arguments, in the order of depends_on.
+    '''
+
+    def __init__(self, name: str, func, depends_on: list = None, stream: bool = True, checkpoint=None) -> None:
+        '''
+        Initializes the Step object.
+        :param name: The unique name of the step.
+        :param func: The callable run by the step.
+        :param depends_on: The names of the steps whose results are passed to func. Default is no dependencies.
+        :param stream: Whether an iterator returned by func is streamed to dependents through bounded queues while
+                       they run (True) or collected into a list first (False). Default is True.
+        :param checkpoint: What the result depends on besides the steps before it, for the pipeline's checkpoint
+                           cache: a dictionary (e.g. - {'sql': sql}), a callable returning one when the pipeline runs
+                           (e.g. - to fingerprint input files), or True for nothing but the step name. Default is None,
+                           which never checkpoints the step.
+        '''
+        self.name = name
+        self.func = func
+        self.depends_on = list(depends_on or [])
+        self.stream = stream
+        self.checkpoint = checkpoint
+
+
+def _resolve(name: str):
+    '''
+    Resolves a class or function named in a pipeline spec.
+    :param name: A class of this package (e.g. - FileExtract, Validator, Transformer, Loader) or a dotted path (e.g. -
+                 mypackage.module.function).
+    :return: The class or function.
+    '''
+    known = {'FileExtract': FileExtract, 'DatabaseExtract': DatabaseExtract, 'APIExtract': APIExtract,
+             'Transformer': Transformer, 'Loader': Loader, 'Validator': Validator}
+    if name in known:
+        return known[name]
+    module_name, _, attribute = name.rpartition('.')
+    if not module_name:
+        raise ValueError(f'Unknown class or function {name}. Use one of {sorted(known)} or a dotted path.')
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def _run_spec_step(spec: dict, *inputs):
+    '''
+    Runs a step declared in a pipeline spec: constructs its class (or calls its function) with the spec arguments
+    and the upstream results, then calls each of its methods in order.
+    :param spec: The step spec.
+    :param inputs: The results of the steps the step depends on, in the order of depends_on.
+    :return: The value returned by the last method call, or the constructed object if no methods are listed.
+    '''
+    kwargs = dict(spec.get('args', {}))
+    bind = spec.get('input')
+    positional = ()
+    if isinstance(bind, str):
+        if len(inputs) != 1:
+            raise ValueError(f'Step {spec["name"]} binds its input to {bind} but depends on {len(inputs)} steps.')
+        kwargs[bind] = inputs[0]
+    elif isinstance(bind, dict):
+        kwargs.update({bind[dependency]: value for dependency, value in zip(spec.get('depends_on', []), inputs)})
+    else:
+        positional = inputs
+    if 'function' in spec:
+        return _resolve(spec['function'])(*positional, **kwargs)
+    instance = _resolve(spec['class'])(*positional, **kwargs)
+    result = instance
+    for call in spec.get('calls', []):
+        result = getattr(instance, call['method'])(**call.get('args', {}))
+    return result
+
+
+def _spec_fingerprint(spec: dict) -> dict:
+    '''
+    Describes a spec step for its checkpoint key: the spec itself plus the size and modification time of every local
+    file or directory named in its args, so editing the step or its input files invalidates the checkpoint.
+    '''
+    from checkpoint import file_fingerprint
+    values = list(spec.get('args', {}).values())
+    values += [value for call in spec.get('calls', []) for value in call.get('args', {}).values()]
+    files = [file_fingerprint(value) for value in values if isinstance(value, str) and os.path.exists(value)]
+    return {'spec': spec, 'files': files}
+
+
+def _checkpoint(func, cache, key: str, stage: str, *inputs):
+    '''
+    Runs a step and stores its result in the checkpoint cache.
+    :return: The result as stored, e.g. - a Transformer's data or a stream's chunks concatenated into a dataframe.
+    '''
+    return cache.put(key, func(*inputs), stage=stage)
+
+
+def _call_step(func, collect: bool, *inputs):
+    '''
+    Calls a step, collecting an iterator result into a list when it cannot be streamed (e.g. - in a process pool).
+    :return: A tuple of the result and whether it was collected from an iterator.
+    '''
+    result = func(*inputs)
+    if collect and isinstance(result, Iterator):
+        return list(result), True
+    return result, False
+
+
+class Pipeline():
+    '''
+    The Pipeline class composes extract, transform and load steps as a directed acyclic graph (DAG) and runs them
+    concurrently: every step starts as soon as the steps it depends on have finished, on a thread or process pool.
+    A step returning an iterator of chunks (e.g. - FileExtract.read_tabular_chunks or DatabaseExtract.query_batches)
+    is streamed to its dependents through bounded queues, so extraction overlaps with transforming and writing and a
+    slow consumer holds back its producer (backpressure). Steps are added in Python with add_step or declared in a
+    JSON or YAML spec with from_spec.
+    With a CheckpointCache, the results of steps added with checkpoint are stored, and a rerun (e.g. - after a
+    failure) loads them instead of running the steps again. Steps whose dependents are all loaded from checkpoints
+    are skipped entirely.
+    Methods: add_step, from_spec, order, run
+    '''
+
+    def __init__(self, max_workers: int = 4, executor: str | Executor = 'thread', queue_size: int = 8,
+                 cache=None) -> None:
+        '''
+        Initializes the Pipeline object.
+        :param max_workers: The number of steps run at the same time. Default is 4.
+        :param executor: 'thread', 'process' or an Executor instance to run the steps on. Streams are only passed
+                         through queues on threads; in a process pool iterator results are collected into lists.
+                         Default is 'thread'.
+        :param queue_size: The number of chunks buffered between a streaming step and each dependent. Default is 8.
+        :param cache: A CheckpointCache storing the results of steps added with checkpoint. Default is None.
+        '''
+        if executor not in ('thread', 'process') and not isinstance(executor, Executor):
+            raise ValueError('executor must be "thread", "process" or an Executor instance.')
+        self.max_workers = max_workers
+        self.executor = executor
+        self.queue_size = queue_size
+        self.cache = cache
+        self.steps = {}
+        self.timings = {}  # seconds spent in each step (including streaming) during the last run
+        self.checkpointed = {}  # step name to 'hit', 'miss' or 'skipped' for checkpointed steps of the last run
+
+    def add_step(self, name: str, func, depends_on: list = None, stream: bool = True, checkpoint=None):
+        '''
+        Adds a step to the pipeline.
+        :param name: The unique name of the step.
+        :param func: The callable run by the step. It is passed the results of depends_on as positional arguments.
+        :param depends_on: The names of the steps whose results are passed to func. Default is no dependencies.
+        :param stream: Whether an iterator returned by func is streamed to dependents. Default is True.
+        :param checkpoint: What the result depends on besides the steps before it, as for Step. A checkpointed step
+                           is only looked up in the cache if every step it depends on is checkpointed too, and its
+                           result is never streamed. Default is None, which never checkpoints the step.
+        :return: The Pipeline, so calls can be chained.
+        '''
+        if name in self.steps:
+            raise ValueError(f'A step named {name} already exists.')
+        self.steps[name] = Step(name, func, depends_on, stream, checkpoint)
+        return self
+
+    @classmethod
+    def from_spec(cls, spec: dict | str, cache=None):
+        '''
+        Builds a pipeline from a spec. Each step names a class (FileExtract, DatabaseExtract, APIExtract, Validator,
+        Transformer, Loader or a dotted path) with its constructor args and a list of method calls, or a function with
+        its args. The result of a class step is the value returned by its last call (Transformer methods return the
+        Transformer).
+        The results of depends_on are passed to the constructor (or function) as the keyword named by input, or as
+        positional arguments if input is not given. A step with "checkpoint": true is checkpointed under its spec and
+        the files named in its args, when the pipeline is given a cache. e.g. -
+        {"max_workers": 4, "steps": [
+            {"name": "people", "class": "FileExtract",
+             "calls": [{"method": "read_tabular_chunks", "args": {"delimiter": ",", "file_path": "people.csv",
+                                                                  "chunk_rows": 100000}}]},
+            {"name": "clean", "class": "Transformer", "depends_on": ["people"], "input": "raw_data",
+             "calls": [{"method": "fill_missing_values", "args": {"col": "name"}}]},
+            {"name": "write", "class": "Loader", "depends_on": ["clean"], "input": "data",
+             "calls": [{"method": "write_to_parquet", "args": {"path": "people.parquet"}}]}]}
+        :param spec: The spec as a dictionary, or the path to a JSON or YAML (requires PyYAML) spec file.
+        :param cache: A CheckpointCache for the steps marked checkpoint. Default is None.
+        :return: A Pipeline object.
+        '''
+        if isinstance(spec, str):
+            with open(spec, 'r') as file:
+                if spec.endswith(('.yaml', '.yml')):
+                    if yaml is None:
+                        raise ImportError('PyYAML is required for YAML pipeline specs. Install it with pip install pyyaml.')
+                    spec = yaml.safe_load(file)
+                else:
+                    spec = json.load(file)
+        options = {option: spec[option] for option in ('max_workers', 'executor', 'queue_size') if option in spec}
+        pipeline = cls(**options, cache=cache)
+        for step in spec.get('steps', []):
+            if 'name' not in step or ('class' in step) == ('function' in step):
+                raise ValueError(f'Every step needs a name and either a class or a function: {step}')
+            checkpoint = partial(_spec_fingerprint, step) if step.get('checkpoint') else None
+            pipeline.add_step(step['name'], partial(_run_spec_step, step), step.get('depends_on'),
+                              step.get('stream', True), checkpoint)
+        return pipeline
+
+    def order(self) -> list:
+        '''
+        Validates the DAG and returns its steps in a topological order.
+        :return: A list of step names in which every step follows the steps it depends on.
+        '''
+        for step in self.steps.values():
+            missing = [dependency for dependency in step.depends_on if dependency not in self.steps]
+            if missing:
+                raise ValueError(f'Step {step.name} depends on unknown steps {missing}.')
+        remaining = {name: set(step.depends_on) for name, step in self.steps.items()}
+        ordered = []
+        while remaining:
+            ready = [name for name, dependencies in remaining.items() if not dependencies]
+            if not ready:
+                raise ValueError(f'The pipeline has a dependency cycle between {sorted(remaining)}.')
+            for name in ready:
+                ordered.append(name)
+                del remaining[name]
+            for dependencies in remaining.values():
+                dependencies.difference_update(ready)
+        return ordered
+
+    def run(self) -> dict:
+        '''
+        Runs every step of the pipeline, each as soon as its dependencies have finished. If a step fails, running
+        steps are allowed to finish, no new steps are started and the error is raised.
+        :return: A dictionary of step name to result. Streams consumed by dependents are not kept, and steps skipped
+                 because of checkpoints have a result of None. A checkpoint evicted before it is loaded is treated as a
+                 miss and its step is run.
+        '''
+        ordered = self.order()
+        dependents = {name: [other for other in ordered if name in self.steps[other].depends_on] for name in ordered}
+        waiting = {name: set(self.steps[name].depends_on) for name in ordered}
+        processes = self.executor == 'process'
+        if isinstance(self.executor, Executor):
+            executor, owned = self.executor, False
+        else:
+            executor = (ProcessPoolExecutor if processes else ThreadPoolExecutor)(max_workers=self.max_workers)
+            owned = True
+        cancelled = threading.Event()
+        results, channels, opened, pumps, running, started = {}, {}, [], [], {}, {}
+        collected = set()  # steps whose iterator result was collected into a list; dependents get an iterator over it
+        launched = set()
+        missing = object()  # loaded in place of a checkpoint evicted after _checkpoint_keys found it
+        self.timings = {}
+        keys, hits = self._checkpoint_keys(ordered)
+        skipped = {name for name in hits if dependents[name] and all(other in hits for other in dependents[name])}
+        self.checkpointed = {name: 'skipped' if name in skipped else 'hit' if name in hits else 'miss' for name in keys}
+        error = None
+
+        def launch(name):
+            step = self.steps[name]
+            launched.add(name)
+            started[name] = time.perf_counter()
+            if name in hits:  # no dependent needs the result of a skipped step, so it is not loaded
+                future = Future()
+                if name in skipped:
+                    future.set_result((None, False))
+                else:
+                    load = partial(self.cache.get, keys[name], missing)
+                    threading.Thread(target=self._run_in_thread, args=(future, load, False, []), daemon=True).start()
+                running[future] = name
+                return
+            inputs = [channels.pop((dependency, name)).drain() if (dependency, name) in channels
+                      else iter(results[dependency]) if dependency in collected else results[dependency]
+                      for dependency in step.depends_on]
+            collect = processes or not step.stream or not dependents[name] or name in keys
+            func = step.func
+            if name in keys and not processes:  # a process pool cannot share the cache, so results are stored below
+                func = partial(_checkpoint, func, self.cache, keys[name], name)
+            if any(isinstance(value, Iterator) for value in inputs) and not processes:
+                future = Future()  # consumers of a stream get their own thread so a full pool cannot stall producers
+                thread = threading.Thread(target=self._run_in_thread, args=(future, func, collect, inputs),
+                                          daemon=True)
+                thread.start()
+            else:
+                future = executor.submit(_call_step, func, collect, *inputs)
+            running[future] = name
+
+        def recompute(name):
+            # runs a step whose checkpoint was evicted, first loading the checkpoints of any skipped dependencies
+            hits.discard(name)
+            launched.discard(name)
+            self.checkpointed[name] = 'miss'
+            for dependency in self.steps[name].depends_on:
+                if dependency in skipped:
+                    skipped.discard(dependency)
+                    self.checkpointed[dependency] = 'hit'
+                    waiting[name].add(dependency)
+                    launch(dependency)
+            if not waiting[name]:
+                launch(name)
+
+        try:
+            for name in ordered:
+                if not waiting[name]:
+                    launch(name)
+            while running:
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        result, was_collected = future.result()
+                        if processes and name in keys and name not in hits:
+                            result, was_collected = self.cache.put(keys[name], result, stage=name), False
+                    except BaseException as exc:
+                        if error is None:
+                            error = RuntimeError(f'Pipeline step {name} failed: {exc}')
+                            error.__cause__ = exc
+                        cancelled.set()
+                        continue
+                    if result is missing:
+                        if not cancelled.is_set():
+                            recompute(name)
+                        continue
+                    self.timings[name] = time.perf_counter() - started[name]
+                    if isinstance(result, Iterator) and any(waiting[dependent] != {name}
+                                                            for dependent in dependents[name]):
+                        result, was_collected = list(result), True  # a dependent still waits on other steps
+                    if isinstance(result, Iterator):
+                        step_channels = [_Channel(self.queue_size, cancelled) for _ in dependents[name]]
+                        channels.update({(name, dependent): channel
+                                         for dependent, channel in zip(dependents[name], step_channels)})
+                        opened.extend(step_channels)
+                        pump = threading.Thread(target=self._pump, args=(name, result, step_channels, cancelled),
+                                                daemon=True)
+                        pump.start()
+                        pumps.append(pump)
+                    else:
+                        results[name] = result
+                        if was_collected:
+                            collected.add(name)
+                    if cancelled.is_set():
+                        continue
+                    for dependent in dependents[name]:
+                        waiting[dependent].discard(name)
+                        if not waiting[dependent] and dependent not in launched:
+                            launch(dependent)
+        finally:
+            if error:
+                cancelled.set()
+            for channel in opened:  # every consumer has returned, so chunks still being produced are unwanted
+                channel.closed.set()
+            for pump in pumps:
+                pump.join()
+            if owned:
+                executor.shutdown(wait=True)
+        if error:
+            raise error
+        return results
+
+    def _checkpoint_keys(self, ordered: list) -> tuple:
+        '''
+        Computes the checkpoint key of every checkpointed step whose dependencies are all checkpointed. Each key
+        covers the step's name and checkpoint parameters and the keys of its dependencies, so a change to a step
+        invalidates it and every step after it.
+        :return: A tuple of a dictionary of step name to key and the set of steps with a stored checkpoint.
+        '''
+        keys = {}
+        if self.cache is None:
+            return keys, set()
+        for name in ordered:
+            step = self.steps[name]
+            if step.checkpoint is None or step.checkpoint is False \
+                    or any(dependency not in keys for dependency in step.depends_on):
+                continue
+            params = step.checkpoint() if callable(step.checkpoint) else \
+                step.checkpoint if isinstance(step.checkpoint, dict) else {}
+            keys[name] = self.cache.key(name, [keys[dependency] for dependency in step.depends_on], params)
+        return keys, {name for name, key in keys.items() if key in self.cache}
+
+    @staticmethod
+    def _run_in_thread(future: Future, func, collect: bool, inputs: list) -> None:
+        '''
+        Runs a step on a dedicated thread, reporting its outcome through a future.
+        '''
+        try:
+            future.set_result(_call_step(func, collect, *inputs))
+        except BaseException as exc:
+            future.set_exception(exc)
+
+    def _pump(self, name: str, iterator: Iterator, channels: list, cancelled: threading.Event) -> None:
+        '''
+        Feeds every chunk of a stream to the channel of each dependent, blocking while the slowest open channel is
+        full. The time spent producing chunks is added to the step's timing.
+        '''
+        start = time.perf_counter()
+        end = _END
+        try:
+            for item in iterator:
+                if cancelled.is_set() or all(channel.closed.is_set() for channel in channels):
+                    break
+                for channel in channels:
+                    channel.put(item)
+        except BaseException as exc:
+            end = _Failure(exc)
+        for channel in channels:
+            channel.put(end)
+        self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
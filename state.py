@@ -0,0 +1,76 @@
+import json
+import os
+import threading
+
+
+class StateStore():
+    '''
+    The StateStore class persists small pieces of pipeline state, such as incremental extraction watermarks and file
+    manifests, in a local JSON file so they survive between runs. Every change is written atomically (temp file plus
+    rename), so a crash never leaves a half-written state file behind.
+    Methods: get, set, reset, keys
+    '''
+
+    def __init__(self, path: str) -> None:
+        '''
+        Initializes the StateStore object, loading any state already saved at the path.
+        :param path: The path of the JSON state file. It is created on the first write.
+        '''
+        self.path = path
+        self.lock = threading.Lock()
+        self.state = {}
+        if os.path.exists(path):
+            with open(path, 'r') as file:
+                self.state = json.load(file)
+
+    def get(self, key: str, default=None):
+        '''
+        Returns the value saved under a key.
+        :param key: The state key.
+        :param default: The value returned if nothing is saved under the key.
+        :return: The saved value or the default.
+        '''
+        with self.lock:
+            return self.state.get(key, default)
+
+    def set(self, key: str, value) -> None:
+        '''
+        Saves a JSON serializable value under a key and writes the state file.
+        :param key: The state key.
+        :param value: The value to save.
+        '''
+        with self.lock:
+            self.state[key] = value
+            self._write()
+
+    def reset(self, key: str = None) -> None:
+        '''
+        Forgets the value saved under a key, or every value if no key is given, so the next incremental run starts
+        from scratch.
+        :param key: The state key to forget. Forgets everything if not provided.
+        '''
+        with self.lock:
+            if key is None:
+                self.state.clear()
+            else:
+                self.state.pop(key, None)
+            self._write()
+
+    def keys(self) -> list:
+        '''
+        Lists the saved keys.
+        :return: A list of state keys.
+        '''
+        with self.lock:
+            return list(self.state)
+
+    def _write(self) -> None:
+        '''
+        Writes the state file atomically. Caller holds the lock.
+        '''
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump(self.state, file, indent=2, sort_keys=True)
+        os.replace(temp_path, self.path)
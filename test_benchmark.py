@@ -0,0 +1,68 @@
+'''
+A suite of tests for testing the benchmark module functions.
+'''
+
+import sqlite3
+import tempfile
+import unittest
+import pandas as pd
+from benchmark import generate_inputs, measure_import_time, run_benchmarks, compare
+
+
+class TestBenchmark(unittest.TestCase):
+    '''
+    Tests the benchmark module functions.
+    '''
+
+    def test_generate_inputs(self):
+        '''
+        Ensures every generator produces the requested number of rows in the shape of the sample data.
+        '''
+        with tempfile.TemporaryDirectory() as directory:
+            inputs = generate_inputs(directory, 1500)
+            tabular = pd.read_csv(inputs['tabular'])
+            array = pd.read_csv(inputs['array'])
+            records = pd.read_json(inputs['json'], lines=True)
+            with sqlite3.connect(inputs['database']) as conn:
+                people = conn.execute('SELECT COUNT(*) FROM people').fetchone()[0]
+        self.assertEqual((1500, 12), tabular.shape)
+        self.assertEqual(['name', 'phone_numbers'], list(array.columns))
+        self.assertEqual(['id', 'name', 'email', 'address', 'orders'], list(records.columns))
+        self.assertEqual(1500, people)
+
+    def test_run_and_compare(self):
+        '''
+        Ensures results are recorded per case and size and a slower run is reported as a regression.
+        '''
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = run_benchmarks([100], directory=directory, cases=['extract.read_tabular', 'extract.query'],
+                                      repeat=1, import_time=False)
+        result = baseline['results']['extract.read_tabular']['100']
+        self.assertGreater(result['seconds'], 0)
+        self.assertIn('FileExtract.read_tabular', result['methods'])
+        slower = {'results': {'extract.query': {'100': {
+            'seconds': baseline['results']['extract.query']['100']['seconds'] * 2}}}}
+        regressions = compare(baseline, slower, threshold=0.5)
+        self.assertEqual([('extract.query', '100', 'seconds')],
+                         [(item['case'], item['size'], item['metric']) for item in regressions])
+        self.assertEqual([], compare(baseline, baseline))
+
+    def test_import_time(self):
+        '''
+        Ensures the CSV to CSV path imports no optional backend, so a job that only touches files starts quickly and
+        runs on hosts without ODBC drivers, and a backend creeping back in is reported as a regression.
+        '''
+        result = measure_import_time(repeat=1)
+        self.assertEqual([], result['backends'])
+        self.assertGreater(result['seconds'], 0)
+        eager = {'results': {'import.csv_to_csv': {'0': {'seconds': result['seconds'], 'backends': ['pyodbc']}}}}
+        baseline = {'results': {'import.csv_to_csv': {'0': result}}}
+        self.assertEqual(['backends'], [item['metric'] for item in compare(baseline, eager)])
+
+
+def main():
+    unittest.main()  # invoke every method
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+'''
+A suite of tests for testing the checkpoint module classes.
+TestCheckpointCache
+'''
+
+import os
+import tempfile
+import time
+import unittest
+import numpy as np
+import pandas as pd
+from checkpoint import CheckpointCache, file_fingerprint
+from pipeline import Pipeline
+from transform import Transformer
+
+
+class TestCheckpointCache(unittest.TestCase):
+    '''
+    Tests the CheckpointCache class methods and its use by Pipeline.
+    '''
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = CheckpointCache(os.path.join(self.directory.name, 'checkpoints'))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_key(self):
+        '''
+        Ensures keys are stable for equal inputs and change with any input.
+        '''
+        data = pd.DataFrame({'a': [1, 2], 'b': ['x', 'y']})
+        key = self.cache.key('clean', data, sql='SELECT 1')
+        self.assertEqual(key, self.cache.key('clean', data.copy(), sql='SELECT 1'))
+        self.assertNotEqual(key, self.cache.key('clean', data.assign(a=[1, 3]), sql='SELECT 1'))
+        self.assertNotEqual(key, self.cache.key('clean', data, sql='SELECT 2'))
+        self.assertNotEqual(key, self.cache.key('load', data, sql='SELECT 1'))
+        transformer = Transformer(data, lazy=True).replace_values('a', 1, 5)
+        self.assertNotEqual(self.cache.key('t', transformer), self.cache.key('t', Transformer(data)))
+
+    def test_key_hashes_large_arrays_in_full(self):
+        '''
+        Ensures large arrays and Series that differ in one element (where their reprs are truncated) get different
+        keys, and values without a content-based form are rejected rather than keyed by repr.
+        '''
+        first = np.arange(5000)
+        second = first.copy()
+        second[2500] = -1
+        self.assertNotEqual(self.cache.key('s', first), self.cache.key('s', second))
+        self.assertNotEqual(self.cache.key('s', pd.Series(first)), self.cache.key('s', pd.Series(second)))
+        self.assertEqual(self.cache.key('s', first), self.cache.key('s', first.copy()))
+        with self.assertRaises(TypeError):
+            self.cache.key('s', object())
+
+    def test_put_and_get(self):
+        '''
+        Ensures dataframes, Transformers, streams and JSON results round trip, and other results are passed through.
+        '''
+        data = pd.DataFrame({'a': [1, 2, 3]})
+        self.assertIsNone(self.cache.get('missing'))
+        self.cache.put('frame', data, stage='extract')
+        pd.testing.assert_frame_equal(data, self.cache.get('frame'))
+        stored = self.cache.put('transformer', Transformer(data).replace_values('a', 1, 5))
+        self.assertEqual([5, 2, 3], stored['a'].tolist())
+        stored = self.cache.put('stream', iter([data.head(1), data.tail(2)]))
+        pd.testing.assert_frame_equal(data, self.cache.get('stream'))
+        self.cache.put('records', [{'id': 1}])
+        self.assertEqual([{'id': 1}], self.cache.get('records'))
+        self.assertIn('records', self.cache)
+        unserializable = object()
+        self.assertIs(unserializable, self.cache.put('object', unserializable))
+        self.assertNotIn('object', self.cache)
+        self.assertEqual(4, CheckpointCache(self.cache.directory).stats()['entries'])  # the index is persisted
+
+    def test_put_falls_back_to_pickle(self):
+        '''
+        Ensures a dataframe Parquet cannot hold is pickled rather than failing, leaving no temporary files behind.
+        '''
+        data = pd.DataFrame({'mixed': [1, 'two', 3.0]})
+        pd.testing.assert_frame_equal(data, self.cache.put('mixed', data))
+        pd.testing.assert_frame_equal(data, self.cache.get('mixed'))
+        self.assertEqual('pickle', self.cache.entries()[0]['format'])
+        objects = [name for _, _, names in os.walk(os.path.join(self.cache.directory, 'objects')) for name in names]
+        self.assertFalse([name for name in objects if name.endswith('.tmp')])
+
+    def test_cached(self):
+        '''
+        Ensures cached only runs the function on a miss.
+        '''
+        calls = []
+        for _ in range(2):
+            data, key = self.cache.cached('extract', lambda: calls.append(1) or pd.DataFrame({'a': [1]}), sql='SELECT')
+        self.assertEqual(1, len(calls))
+        self.assertEqual(1, data['a'][0])
+        self.assertEqual({'hits': 1, 'misses': 1}, {name: self.cache.stats()[name] for name in ('hits', 'misses')})
+
+    def test_eviction_and_clear(self):
+        '''
+        Ensures the least recently used checkpoints are evicted to stay within max_bytes and clear filters by stage.
+        '''
+        data = pd.DataFrame({'a': range(1000)})
+        self.cache.put('first', data, stage='extract')
+        self.cache.max_bytes = self.cache.stats()['bytes'] * 2
+        time.sleep(0.01)
+        self.cache.put('second', data, stage='extract')
+        time.sleep(0.01)
+        self.cache.get('first')
+        time.sleep(0.01)
+        self.cache.put('third', data, stage='transform')
+        self.assertEqual(['third', 'first'], [entry['key'] for entry in self.cache.entries()])
+        self.assertEqual(1, self.cache.clear(stage='transform'))
+        self.assertEqual(['first'], [entry['key'] for entry in self.cache.entries()])
+
+    def test_pipeline_resumes(self):
+        '''
+        Ensures a rerun after a failure loads finished steps, skips steps only needed by loaded steps and reruns
+        steps downstream of a change.
+        '''
+        calls, fail = [], [True]
+
+        def extract():
+            calls.append('extract')
+            return pd.DataFrame({'a': [1, 2, 3]})
+
+        def transform(data):
+            calls.append('transform')
+            return Transformer(data).replace_values('a', 1, 5)
+
+        def load(data):
+            calls.append('load')
+            if fail[0]:
+                raise ValueError('the warehouse is down')
+            return len(data)
+
+        def build(sql):
+            return (Pipeline(cache=self.cache).add_step('extract', extract, checkpoint={'sql': sql})
+                    .add_step('transform', transform, ['extract'], checkpoint=True)
+                    .add_step('load', load, ['transform'], checkpoint=True))
+
+        with self.assertRaises(RuntimeError):
+            build('SELECT a').run()
+        fail[0] = False
+        pipeline = build('SELECT a')
+        self.assertEqual(3, pipeline.run()['load'])
+        self.assertEqual(['extract', 'transform', 'load', 'load'], calls)
+        self.assertEqual({'extract': 'skipped', 'transform': 'hit', 'load': 'miss'}, pipeline.checkpointed)
+        results = build('SELECT a').run()
+        self.assertEqual(3, results['load'])
+        self.assertIsNone(results['transform'])
+        self.assertEqual(4, len(calls))
+        build('SELECT b').run()
+        self.assertEqual(['extract', 'transform', 'load'], calls[4:])
+
+    def test_pipeline_reruns_evicted_checkpoints(self):
+        '''
+        Ensures a checkpoint evicted between the lookup and the load is treated as a miss: the step is run again,
+        after loading the checkpoint of the step it depends on, rather than returning None.
+        '''
+        calls = []
+
+        def build():
+            return (Pipeline(cache=self.cache)
+                    .add_step('extract', lambda: calls.append('extract') or pd.DataFrame({'a': [1, 2]}), checkpoint=True)
+                    .add_step('transform', lambda data: calls.append('transform') or data.assign(a=data['a'] * 2),
+                              ['extract'], checkpoint=True)
+                    .add_step('load', lambda data: calls.append('load') or data['a'].sum(), ['transform'],
+                              checkpoint=True))
+
+        build().run()
+        pipeline = build()
+        find_keys = pipeline._checkpoint_keys
+
+        def evict(ordered):
+            keys, hits = find_keys(ordered)
+            self.cache.clear(stage='load')
+            self.cache.clear(stage='transform')
+            return keys, hits
+
+        pipeline._checkpoint_keys = evict
+        self.assertEqual(6, pipeline.run()['load'])
+        self.assertEqual(['extract', 'transform', 'load', 'transform', 'load'], calls)
+        self.assertEqual({'extract': 'hit', 'transform': 'miss', 'load': 'miss'}, pipeline.checkpointed)
+
+    def test_spec_checkpoint_tracks_files(self):
+        '''
+        Ensures a spec step marked checkpoint is invalidated when its input file changes.
+        '''
+        path = os.path.join(self.directory.name, 'input.csv')
+        pd.DataFrame({'a': [1]}).to_csv(path, index=False)
+        spec = {'steps': [{'name': 'read', 'class': 'FileExtract', 'checkpoint': True,
+                           'calls': [{'method': 'read_tabular', 'args': {'delimiter': ',', 'file_path': path}}]}]}
+        Pipeline.from_spec(spec, cache=self.cache).run()
+        pipeline = Pipeline.from_spec(spec, cache=self.cache)
+        pipeline.run()
+        self.assertEqual({'read': 'hit'}, pipeline.checkpointed)
+        fingerprint = file_fingerprint(path)
+        pd.DataFrame({'a': [1, 2]}).to_csv(path, index=False)
+        os.utime(path, (fingerprint['mtime'] + 10, fingerprint['mtime'] + 10))
+        pipeline = Pipeline.from_spec(spec, cache=self.cache)
+        self.assertEqual(2, len(pipeline.run()['read']))
+        self.assertEqual({'read': 'miss'}, pipeline.checkpointed)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
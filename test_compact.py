@@ -0,0 +1,89 @@
+'''
+A suite of tests for testing the compact module functions.
+TestCompact:
+    - User must update [path_to_tabular_data] to match their system's absolute path to the cloned repository.
+'''
+
+import importlib
+import sys
+import unittest
+from unittest import mock
+import pandas as pd
+import compact
+from compact import compact_dataframe, replace_categories, fill_categories
+
+
+class TestCompact(unittest.TestCase):
+    '''
+    Tests the compact module functions.
+    User must update [path_to_tabular_data] to match their system's absolute path to the cloned repository.
+    '''
+    path_to_tabular_data = '/home/smith/Development/ds5010/github/ds5010/etl_tool/data/tabular.csv'  # user must update
+
+    def test_compact_dataframe(self):
+        '''
+        Ensures small integers are downcast, values are unchanged and the report shows the bytes saved.
+        '''
+        tabular_data = pd.read_csv(self.path_to_tabular_data)
+        compacted, report = compact_dataframe(tabular_data)
+        self.assertEqual('uint8', str(compacted['cyl'].dtype))
+        self.assertEqual('uint8', str(compacted['gear'].dtype))
+        self.assertTrue((compacted['cyl'] == tabular_data['cyl']).all())
+        self.assertLess(report['bytes_after'], report['bytes_before'])
+        self.assertEqual({'before': 'int64', 'after': 'uint8'}, report['columns']['cyl'])
+
+    def test_compact_dataframe_categorical(self):
+        '''
+        Ensures low-cardinality string columns become categorical and high-cardinality ones do not.
+        '''
+        data = pd.DataFrame({'country': ['USA', 'UK', 'USA', 'UK'] * 5, 'name': [f'name {i}' for i in range(20)]})
+        compacted, _ = compact_dataframe(data, category_threshold=0.5)
+        self.assertIsInstance(compacted['country'].dtype, pd.CategoricalDtype)
+        self.assertNotIsInstance(compacted['name'].dtype, pd.CategoricalDtype)
+
+    def test_compact_dataframe_all_missing_integers(self):
+        '''
+        Ensures a nullable integer column with only missing values is compacted without comparing NA to zero.
+        '''
+        data = pd.DataFrame({'empty': pd.array([None, None], dtype='Int64'), 'count': pd.array([1, None], dtype='Int64')})
+        compacted, _ = compact_dataframe(data)
+        self.assertTrue(compacted['empty'].isna().all())
+        self.assertEqual('UInt8', str(compacted['count'].dtype))
+
+    def test_compact_dataframe_without_pyarrow(self):
+        '''
+        Ensures string columns fall back to pandas' own string dtype when pyarrow cannot be imported.
+        '''
+        data = pd.DataFrame({'name': [f'name {i}' for i in range(20)]}, dtype=object)
+        try:
+            with mock.patch.dict(sys.modules, {'pyarrow': None}):
+                string_dtype = importlib.reload(compact).STRING_DTYPE
+                compacted, _ = compact.compact_dataframe(data)
+        finally:
+            importlib.reload(compact)  # the module is shared, so restore it with pyarrow
+        self.assertEqual('string', string_dtype)
+        self.assertIsInstance(compacted['name'].dtype, pd.StringDtype)
+
+    def test_replace_categories(self):
+        '''
+        Ensures replacing a category with an existing one merges them without decoding the column.
+        '''
+        series = pd.Series(['USA', 'UK', None, 'Canada'], dtype='category')
+        replaced = replace_categories(series, 'UK', 'USA')
+        self.assertEqual(['Canada', 'USA'], sorted(replaced.cat.categories))
+        self.assertEqual(['USA', 'USA', None, 'Canada'], replaced.astype(object).where(replaced.notna(), None).tolist())
+
+    def test_fill_categories(self):
+        '''
+        Ensures a new fill value is added as a category.
+        '''
+        series = pd.Series(['USA', None], dtype='category')
+        self.assertEqual(['USA', 'Unknown'], fill_categories(series, 'Unknown').tolist())
+
+
+def main():
+    unittest.main()  # invoke every method
+
+
+if __name__ == '__main__':
+    main()
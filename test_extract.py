@@ -14,8 +14,20 @@ TestAPIExtract:
         -- Sign up for reddit API credentials for use with PRAW (Python Reddit API Wrapper): https://praw.readthedocs.io/en/stable/getting_started/quick_start.html
 '''
 
+import bz2
+import json
+import lzma
+import os
+import tempfile
+import threading
+import time
 import unittest
-from extract import FileExtract, DatabaseExtract, APIExtract
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+import pandas as pd
+from extract import FileExtract, DatabaseExtract, APIExtract, CursorPaginator, PageNumberPaginator, ResponseCache
+from state import StateStore
+from instrument import add_hook, remove_hook
 
 
 class TestFileExtract(unittest.TestCase):
@@ -43,6 +55,78 @@ class TestFileExtract(unittest.TestCase):
         tabular_data = file_extractor.read_tabular(delimiter=',', file_path=self.path_to_tabular_data)
         self.assertEqual((32, 12), tabular_data.shape)  # expected vs actual
 
+    def test_read_tabular_compact(self):
+        '''
+        Tests the read_tabular method of the FileExtract class with compaction
+        Ensure dtypes are narrowed and a report of the memory saved is kept
+        '''
+        file_extractor = FileExtract()
+        tabular_data = file_extractor.read_tabular(delimiter=',', file_path=self.path_to_tabular_data, compact=True)
+        self.assertEqual((32, 12), tabular_data.shape)
+        self.assertEqual('uint8', str(tabular_data['gear'].dtype))
+        self.assertLess(file_extractor.compaction_report['bytes_after'],
+                        file_extractor.compaction_report['bytes_before'])
+
+    def test_read_tabular_chunks(self):
+        '''
+        Tests the read_tabular_chunks method of the FileExtract class
+        Ensure chunks honour the requested row count and together contain every row
+        '''
+        file_extractor = FileExtract(self.path_to_tabular_data)
+        chunks = list(file_extractor.read_tabular_chunks(delimiter=',', chunk_rows=10))
+        self.assertEqual([10, 10, 10, 2], [len(chunk) for chunk in chunks])  # expected vs actual
+        self.assertEqual((32, 12), pd.concat(chunks).shape)
+
+    def test_read_tabular_chunks_by_bytes(self):
+        '''
+        Tests the read_tabular_chunks method of the FileExtract class with a byte budget
+        Ensure a small byte budget splits the file into several chunks without losing rows
+        '''
+        file_extractor = FileExtract(self.path_to_tabular_data)
+        chunks = list(file_extractor.read_tabular_chunks(delimiter=',', chunk_bytes=500))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(32, sum(len(chunk) for chunk in chunks))
+
+    def test_read_tabular_compressed_with_pushdown(self):
+        '''
+        Tests the read_tabular method of the FileExtract class on a gzip file with columns and filters
+        Ensure only the requested columns and the matching rows are returned
+        '''
+        file_extractor = FileExtract()
+        with tempfile.TemporaryDirectory() as directory:
+            compressed_path = os.path.join(directory, 'tabular.csv.gz')
+            pd.read_csv(self.path_to_tabular_data).to_csv(compressed_path, index=False)
+            tabular_data = file_extractor.read_tabular(delimiter=',', file_path=compressed_path,
+                                                       columns=['model', 'mpg'], filters=[('cyl', '=', 6)])
+        self.assertEqual((7, 2), tabular_data.shape)  # seven six-cylinder cars
+
+    def test_read_parquet_with_pushdown(self):
+        '''
+        Tests the read_parquet method of the FileExtract class with columns and filters
+        Ensure only the requested columns and the matching rows are returned
+        '''
+        file_extractor = FileExtract()
+        with tempfile.TemporaryDirectory() as directory:
+            parquet_path = os.path.join(directory, 'tabular.parquet')
+            pd.read_csv(self.path_to_tabular_data).to_parquet(parquet_path, row_group_size=8)
+            tabular_data = file_extractor.read_parquet(file_path=parquet_path, columns=['model', 'cyl'],
+                                                       filters=[('cyl', '>', 4), ('gear', '=', 3)])
+        self.assertEqual((14, 2), tabular_data.shape)  # 3-gear cars with 6 or 8 cylinders
+        self.assertTrue((tabular_data['cyl'] > 4).all())
+
+    def test_read_feather_with_pushdown(self):
+        '''
+        Tests the read_feather method of the FileExtract class with columns and filters
+        Ensure only the requested columns and the matching rows are returned
+        '''
+        file_extractor = FileExtract()
+        with tempfile.TemporaryDirectory() as directory:
+            feather_path = os.path.join(directory, 'tabular.feather')
+            pd.read_csv(self.path_to_tabular_data).to_feather(feather_path)
+            tabular_data = file_extractor.read_feather(file_path=feather_path, columns=['model'],
+                                                       filters=[('cyl', 'in', [6, 8])])
+        self.assertEqual((21, 1), tabular_data.shape)
+
     def test_read_json(self):
         '''
         Tests the read_json method of the FileExtract
@@ -52,6 +136,97 @@ class TestFileExtract(unittest.TestCase):
         json_data = file_extractor.read_json(file_path=self.path_to_json_data)
         self.assertEqual(['id', 'name', 'email', 'address', 'orders'], list(json_data.keys()))  # expected vs actual
 
+    def test_read_json_lines(self):
+        '''
+        Tests the read_json_lines method of the FileExtract class
+        Ensure a small block size splits the file into several batches without losing records
+        '''
+        file_extractor = FileExtract()
+        record = file_extractor.read_json(file_path=self.path_to_json_data)
+        with tempfile.TemporaryDirectory() as directory:
+            json_lines_path = os.path.join(directory, 'records.jsonl')
+            with open(json_lines_path, 'w') as file:
+                file.write('\n'.join(json.dumps({**record, 'id': index}) for index in range(50)))
+            batches = list(file_extractor.read_json_lines(file_path=json_lines_path, block_size=1024))
+        self.assertGreater(len(batches), 1)
+        self.assertEqual(50, sum(batch.num_rows for batch in batches))
+
+    def test_read_tabular_incremental(self):
+        '''
+        Tests the read_tabular_incremental method of the FileExtract class
+        Ensure only new or modified files are read on the next run, and touched files are skipped by their hash
+        '''
+        file_extractor = FileExtract()
+        tabular_data = file_extractor.read_tabular(delimiter=',', file_path=self.path_to_tabular_data)
+        with tempfile.TemporaryDirectory() as directory:
+            state = StateStore(os.path.join(directory, 'state.json'))
+            drops = os.path.join(directory, 'drops')
+            os.makedirs(drops)
+            for index in range(2):
+                tabular_data.to_csv(os.path.join(drops, f'{index}.csv'), index=False)
+            first_run = file_extractor.read_tabular_incremental(delimiter=',', pattern=drops, state=state)
+            second_run = file_extractor.read_tabular_incremental(delimiter=',', pattern=drops, state=state)
+            os.utime(os.path.join(drops, '0.csv'), (0, 0))  # touched, content unchanged
+            tabular_data.head(3).to_csv(os.path.join(drops, '1.csv'), index=False)
+            third_run = file_extractor.read_tabular_incremental(delimiter=',', pattern=drops, state=state)
+        self.assertEqual(2 * len(tabular_data), len(first_run))
+        self.assertTrue(second_run.empty)
+        self.assertEqual(3, len(third_run))
+
+    def test_read_tabular_incremental_retries_unreadable_files(self):
+        '''
+        Tests the read_tabular_incremental method of the FileExtract class when a file fails to parse
+        Ensure the unreadable file is left out of the manifest and read again once it is fixed
+        '''
+        file_extractor = FileExtract()
+        tabular_data = file_extractor.read_tabular(delimiter=',', file_path=self.path_to_tabular_data)
+        with tempfile.TemporaryDirectory() as directory:
+            state = StateStore(os.path.join(directory, 'state.json'))
+            drops = os.path.join(directory, 'drops')
+            os.makedirs(drops)
+            tabular_data.head(1).to_csv(os.path.join(drops, 'good.csv'), index=False)
+            with open(os.path.join(drops, 'bad.csv'), 'w') as file:
+                file.write('model,mpg\n"unterminated,1\n')  # half-written file
+            first_run = file_extractor.read_tabular_incremental(delimiter=',', pattern=drops, state=state)
+            pending = file_extractor.changed_files(drops, state)  # the unchanged bad file is still pending
+            tabular_data.head(2).to_csv(os.path.join(drops, 'bad.csv'), index=False)
+            second_run = file_extractor.read_tabular_incremental(delimiter=',', pattern=drops, state=state)
+        self.assertEqual(1, len(first_run))
+        self.assertEqual([os.path.join(drops, 'bad.csv')], pending)
+        self.assertEqual(2, len(second_run))
+
+    def test_read_many(self):
+        '''
+        Tests the read_many method of the FileExtract class on a directory tree of plain and compressed files
+        Ensure files are merged in path order with their source, and unreadable files are skipped
+        '''
+        file_extractor = FileExtract()
+        tabular_data = file_extractor.read_tabular(delimiter=',', file_path=self.path_to_tabular_data)
+        with tempfile.TemporaryDirectory() as directory:
+            os.makedirs(os.path.join(directory, 'nested'))
+            paths = [os.path.join(directory, name) for name in ('0.csv', '1.csv.gz', 'nested/2.csv.bz2')]
+            for index, path in enumerate(paths):
+                tabular_data.head(index + 1).to_csv(path, index=False)
+            with open(os.path.join(directory, 'empty.csv'), 'w'):
+                pass
+            merged = file_extractor.read_many(os.path.join(directory, '**', '*.csv*'), source_column='source_file')
+            streamed = list(file_extractor.read_many(paths, executor='process', engine='c', ordered=False,
+                                                     stream=True, usecols=['model']))
+            records = os.path.join(directory, 'records.jsonl.gz')
+            tabular_data.to_json(records, orient='records', lines=True)
+            json_lines = file_extractor.read_many(records)
+            documents = []
+            for name, opener in (('records.json.bz2', bz2.open), ('records.json.xz', lzma.open)):
+                with opener(os.path.join(directory, name), 'wt') as file:
+                    json.dump(tabular_data.to_dict('records'), file)
+                documents.append(file_extractor.read_many(os.path.join(directory, name)))
+        self.assertEqual(6, len(merged))
+        self.assertEqual([paths[0]] + [paths[1]] * 2 + [paths[2]] * 3, merged['source_file'].tolist())
+        self.assertEqual([1, 2, 3], sorted(len(data) for data in streamed))
+        self.assertEqual(['model'], list(streamed[0].columns))
+        self.assertEqual(tabular_data.shape, json_lines.shape)
+        self.assertEqual([tabular_data.shape] * 2, [data.shape for data in documents])
+
 
 class TestDatabaseExtract(unittest.TestCase):
     '''
@@ -96,6 +271,104 @@ class TestDatabaseExtract(unittest.TestCase):
         data_via_sql_alchemy = database_extractor.query('SELECT * FROM people LIMIT 5')
         self.assertEqual((5, 3), data_via_sql_alchemy.shape)
 
+    def test_query_batches_with_conn_url(self):
+        '''
+        Tests the query_batches method of the DatabaseExtract class
+        Ensure batches honour the batch size and together contain every row of the query
+        '''
+        database_extractor = DatabaseExtract(connection_url=self.connection_url)
+        batches = list(database_extractor.query_batches('SELECT * FROM people', batch_size=7))
+        total_rows = len(database_extractor.query('SELECT * FROM people'))
+        self.assertTrue(all(len(batch) <= 7 for batch in batches))
+        self.assertEqual(total_rows, sum(len(batch) for batch in batches))
+
+    def test_query_batches_with_params(self):
+        '''
+        Tests the query_batches method of the DatabaseExtract class with bound parameters
+        Ensure the bound parameter is applied to every batch
+        '''
+        database_extractor = DatabaseExtract(connection_url=self.connection_url)
+        batches = database_extractor.query_batches('SELECT * FROM people WHERE age > :age', params={'age': 50},
+                                                   batch_size=5)
+        self.assertTrue(all((batch['age'] > 50).all() for batch in batches))
+
+    def test_query_partitioned(self):
+        '''
+        Tests the query_partitioned method of the DatabaseExtract class
+        Ensure the concatenated slices contain exactly the rows of the unpartitioned table
+        '''
+        database_extractor = DatabaseExtract(connection_url=self.connection_url)
+        full_data = database_extractor.query('SELECT * FROM people')
+        partitioned_data = database_extractor.query_partitioned('people', partition_column='age', num_partitions=4)
+        self.assertEqual(full_data.shape, partitioned_data.shape)
+        self.assertEqual(sorted(full_data['age']), sorted(partitioned_data['age']))
+
+    def test_query_partitioned_empty_source(self):
+        '''
+        Tests the query_partitioned method of the DatabaseExtract class on an empty table and an all-null column
+        Ensure an empty table gives an empty result in both modes and rows with only null partition values are kept
+        '''
+        with tempfile.TemporaryDirectory() as directory:
+            database_extractor = DatabaseExtract(connection_url=f'sqlite:///{directory}/empty.db')
+            with database_extractor.engine.begin() as connection:
+                connection.exec_driver_sql('CREATE TABLE events (id INTEGER, name TEXT)')
+            empty = database_extractor.query_partitioned('events', partition_column='id')
+            streamed = list(database_extractor.query_partitioned('events', partition_column='id', stream=True))
+            with database_extractor.engine.begin() as connection:
+                connection.exec_driver_sql("INSERT INTO events VALUES (NULL, 'a'), (NULL, 'b')")
+            nulls = database_extractor.query_partitioned('events', partition_column='id')
+            database_extractor.close()
+        self.assertTrue(empty.empty)
+        self.assertEqual([], streamed)
+        self.assertEqual(['a', 'b'], sorted(nulls['name']))
+
+    def test_query_partitioned_stream_with_predicates(self):
+        '''
+        Tests the query_partitioned method of the DatabaseExtract class with explicit predicates in stream mode
+        Ensure one slice is yielded per predicate
+        '''
+        database_extractor = DatabaseExtract(connection_url=self.connection_url)
+        slices = list(database_extractor.query_partitioned('SELECT name, age FROM people',
+                                                           predicates=['age < 50', 'age >= 50'], stream=True))
+        self.assertEqual(2, len(slices))
+        self.assertEqual(len(database_extractor.query('SELECT * FROM people')), sum(len(part) for part in slices))
+
+    def test_query_incremental(self):
+        '''
+        Tests the query_incremental method of the DatabaseExtract class
+        Ensure each run only returns rows past the saved watermark and a backfill leaves the watermark unchanged
+        '''
+        with tempfile.TemporaryDirectory() as directory:
+            database_extractor = DatabaseExtract(connection_url=f'sqlite:///{directory}/events.db')
+            with database_extractor.engine.begin() as connection:
+                pd.DataFrame({'id': range(10)}).to_sql('events', connection, index=False)
+            state = StateStore(os.path.join(directory, 'state.json'))
+            first_run = database_extractor.query_incremental('events', watermark_column='id', state=state)
+            with database_extractor.engine.begin() as connection:
+                pd.DataFrame({'id': range(10, 13)}).to_sql('events', connection, index=False, if_exists='append')
+            second_run = database_extractor.query_incremental('events', watermark_column='id', state=state)
+            backfill = database_extractor.query_incremental('SELECT id FROM events', watermark_column='id',
+                                                            state=state, start=2, end=5)
+            watermark = StateStore(os.path.join(directory, 'state.json')).get('watermark:events:id')
+            database_extractor.close()
+        self.assertEqual(10, len(first_run))
+        self.assertEqual([10, 11, 12], list(second_run['id']))
+        self.assertEqual([2, 3, 4], list(backfill['id']))
+        self.assertEqual(12, watermark)
+
+    def test_context_manager_reuses_pooled_connection(self):
+        '''
+        Tests the context manager lifecycle and shared pool of the DatabaseExtract class
+        Ensure the engine and connection of a closed extractor are reused by the next one
+        '''
+        DatabaseExtract.dispose_pools()
+        for _ in range(3):
+            with DatabaseExtract(connection_url=self.connection_url) as database_extractor:
+                database_extractor.query('SELECT * FROM people LIMIT 1')
+            self.assertTrue(database_extractor.closed)
+        self.assertEqual({'engine_hits': 2, 'engine_misses': 1, 'connection_hits': 2, 'connection_misses': 1},
+                         DatabaseExtract.pool_stats())
+
 
 class TestAPIExtract(unittest.TestCase):
     '''
@@ -147,6 +420,201 @@ class TestAPIExtract(unittest.TestCase):
         self.assertEqual((10, 4), top_10_reddit_posts.shape)
 
 
+class _StubAPIHandler(BaseHTTPRequestHandler):
+    '''
+    A local stand-in for a JSON API. Echoes the query parameters back, fails the first request to /flaky with a 429
+    and serves the same seven items paginated by cursor (/cursor), page number (/numbered) and Link header (/linked).
+    /etag answers conditional requests for its current version with a 304.
+    '''
+    flaky_calls = 0
+    etag_calls = 0
+    invalid_calls = 0
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/flaky' and _StubAPIHandler.flaky_calls == 0:
+            _StubAPIHandler.flaky_calls += 1
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+            self.end_headers()
+            return
+        if url.path == '/invalid':  # a successful response whose body is not JSON
+            _StubAPIHandler.invalid_calls += 1
+            self.send_response(200)
+            self.send_header('Content-Length', '9')
+            self.end_headers()
+            self.wfile.write(b'not json!')
+            return
+        query = dict(parse_qsl(url.query))
+        headers = {}
+        if url.path == '/cursor':  # 7 items, 3 per page, next offset returned as the cursor
+            offset = int(query.get('cursor', 0))
+            next_cursor = offset + 3 if offset + 3 < 7 else None
+            payload = {'data': list(range(offset, min(offset + 3, 7))), 'meta': {'next': next_cursor}}
+        elif url.path in ('/numbered', '/linked'):  # 7 items, 3 per page, pages numbered from 1
+            page = int(query.get('page', 1))
+            payload = list(range((page - 1) * 3, min(page * 3, 7)))
+            if url.path == '/linked' and page * 3 < 7:
+                headers['Link'] = f'<http://{self.headers["Host"]}/linked?page={page + 1}>; rel="next"'
+        elif url.path == '/etag':  # versioned resource supporting conditional requests
+            _StubAPIHandler.etag_calls += 1
+            if self.headers.get('If-None-Match') == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            payload, headers['ETag'] = {'version': 1}, '"v1"'
+        else:
+            payload = {'path': url.path, 'params': query}
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass  # keep test output quiet
+
+
+class TestAPIExtractBatch(unittest.TestCase):
+    '''
+    Tests the batch methods of the APIExtract class against a local stub HTTP server. No credentials are required.
+    '''
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _StubAPIHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_port}'
+        cls.config_dir = tempfile.TemporaryDirectory()
+        cls.config_path = os.path.join(cls.config_dir.name, 'stub_config.json')
+        with open(cls.config_path, 'w') as file:
+            json.dump({'parameters': {'appid': 'secret'}}, file)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.config_dir.cleanup()
+
+    def test_fetch_many_preserves_order(self):
+        '''
+        Ensures responses come back in the order of the batch and include the configuration file parameters.
+        '''
+        api_extractor = APIExtract(config=self.config_path)
+        batch = [('/weather', {'q': city}) for city in ['Boston', 'Paris', 'Tokyo', 'Lima', 'Oslo']]
+        responses = api_extractor.fetch_many(url=self.base_url, batch=batch, max_concurrency=3, rate_limit=50)
+        self.assertEqual(['Boston', 'Paris', 'Tokyo', 'Lima', 'Oslo'], [r['params']['q'] for r in responses])
+        self.assertTrue(all(r['params']['appid'] == 'secret' for r in responses))
+
+    def test_fetch_many_retries_rate_limited_requests(self):
+        '''
+        Ensures a request answered with a 429 is retried and succeeds.
+        '''
+        api_extractor = APIExtract(config=self.config_path)
+        responses = api_extractor.fetch_many(url=self.base_url, batch=[('/flaky', None)], backoff=0)
+        self.assertEqual('/flaky', responses[0]['path'])
+
+    def test_fetch_many_does_not_retry_invalid_responses(self):
+        '''
+        Ensures a response that is not JSON fails without being retried, is reported to hooks, and that repeated
+        batches reuse the session's connection pool.
+        '''
+        api_extractor = APIExtract(config=self.config_path)
+        calls = []
+        add_hook(calls.append)
+        try:
+            responses = api_extractor.fetch_many(url=self.base_url, batch=[('/invalid', None)], backoff=0)
+        finally:
+            remove_hook(calls.append)
+        self.assertEqual([dict()], responses)
+        self.assertEqual(1, _StubAPIHandler.invalid_calls)
+        self.assertIsNotNone(calls[0].error)
+        adapter = api_extractor.session.get_adapter(self.base_url)
+        api_extractor.fetch_many(url=self.base_url, batch=[('/weather', None)])
+        self.assertIs(adapter, api_extractor.session.get_adapter(self.base_url))
+
+    def test_fetch_pages_with_cursor(self):
+        '''
+        Ensures every record is yielded, in order, when following cursors.
+        '''
+        api_extractor = APIExtract(config=self.config_path)
+        paginator = CursorPaginator(cursor_param='cursor', cursor_path='meta.next', records_path='data')
+        records = list(api_extractor.fetch_pages(url=self.base_url, command='/cursor', paginator=paginator))
+        self.assertEqual(list(range(7)), records)
+
+    def test_fetch_pages_with_page_numbers_by_page(self):
+        '''
+        Ensures pages are yielded as chunks and paging stops at the first short page.
+        '''
+        api_extractor = APIExtract(config=self.config_path)
+        paginator = PageNumberPaginator(page_param='page', page_size=3)
+        pages = list(api_extractor.fetch_pages(url=self.base_url, command='/numbered', paginator=paginator,
+                                               by_page=True))
+        self.assertEqual([[0, 1, 2], [3, 4, 5], [6]], pages)
+
+    def test_fetch_pages_with_configured_link_header(self):
+        '''
+        Ensures a paginator configured in the configuration file follows Link headers.
+        '''
+        api_extractor = APIExtract(config=self.config_path)
+        api_extractor.config['pagination'] = {'type': 'link'}
+        records = list(api_extractor.fetch_pages(url=self.base_url, command='/linked', prefetch=2))
+        self.assertEqual(list(range(7)), records)
+
+    def test_fetch_data_served_from_cache(self):
+        '''
+        Ensures a repeated request is answered from the cache without reaching the server.
+        '''
+        cache = ResponseCache(ttl=60)
+        api_extractor = APIExtract(config=self.config_path, cache=cache)
+        calls_before = _StubAPIHandler.etag_calls
+        first = api_extractor.fetch_data(url=self.base_url, command='/etag')
+        second = api_extractor.fetch_data(url=self.base_url, command='/etag')
+        self.assertEqual(first, second)
+        self.assertEqual(1, _StubAPIHandler.etag_calls - calls_before)
+        self.assertEqual(1, cache.stats()['hits'])
+
+    def test_fetch_data_revalidates_expired_entry(self):
+        '''
+        Ensures an expired entry with an ETag is revalidated and reused on a 304 response.
+        '''
+        cache = ResponseCache(ttl=0)
+        api_extractor = APIExtract(config=self.config_path, cache=cache)
+        api_extractor.fetch_data(url=self.base_url, command='/etag')
+        self.assertEqual({'version': 1}, api_extractor.fetch_data(url=self.base_url, command='/etag'))
+        self.assertEqual(1, cache.stats()['revalidations'])
+
+    def test_response_cache_persists_to_disk_without_secrets(self):
+        '''
+        Ensures entries survive a new cache instance and keys ignore secret parameters.
+        '''
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ResponseCache(directory=directory)
+            key = cache.key(self.base_url + '/weather', {'q': 'Boston', 'appid': 'secret'})
+            self.assertEqual(key, cache.key(self.base_url + '/weather', {'q': 'Boston', 'appid': 'other'}))
+            cache.put(key, {'temp': 50})
+            self.assertEqual({'temp': 50}, ResponseCache(directory=directory).get(key)['payload'])
+        search = self.base_url + '/search'
+        self.assertNotEqual(cache.key(search, {'key': 'a'}), cache.key(search, {'key': 'b'}))  # not a credential
+
+    def test_response_cache_evicts_least_recently_used_files(self):
+        '''
+        Ensures reading an entry keeps its file on disk when a newer, unread entry is evicted.
+        '''
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ResponseCache(max_entries=2, directory=directory)
+            now = time.time()
+            for age, key in ((20, 'first'), (10, 'second')):
+                cache.put(key, {'key': key})
+                os.utime(os.path.join(directory, f'{key}.json'), (now - age, now - age))
+            cache.get('first')
+            cache.put('third', {'key': 'third'})
+            self.assertEqual(['first.json', 'third.json'], sorted(os.listdir(directory)))
+
+
 def main():
     unittest.main()  # invoke every method
 
@@ -0,0 +1,76 @@
+'''
+A suite of tests for testing the instrument module.
+TestInstrument:
+    - User must update [path_to_tabular_data] to match their system's absolute path to the cloned repository.
+'''
+
+import json
+import os
+import tempfile
+import unittest
+from extract import FileExtract
+from transform import Transformer
+from load import Loader
+from instrument import MetricsCollector, add_hook, remove_hook, enabled
+
+
+class TestInstrument(unittest.TestCase):
+    '''
+    Tests the instrumentation hooks and the MetricsCollector class.
+    User must update [path_to_tabular_data] to match their system's absolute path to the cloned repository.
+    '''
+    path_to_tabular_data = '/home/smith/Development/ds5010/github/ds5010/etl_tool/data/tabular.csv'  # user must update
+
+    def test_collects_every_stage(self):
+        '''
+        Ensures rows and bytes are measured across extract, transform and load and summarized as JSON.
+        '''
+        file_extractor = FileExtract()
+        with tempfile.TemporaryDirectory() as directory, MetricsCollector(track_memory=True) as metrics:
+            tabular_data = file_extractor.read_tabular(delimiter=',', file_path=self.path_to_tabular_data)
+            transformer = Transformer(raw_data=tabular_data).replace_values('cyl', 4, 40)
+            output_path = os.path.join(directory, 'output.csv')
+            Loader(data=transformer).write_to_file(path=output_path)
+            output_size = os.path.getsize(output_path)
+        summary = json.loads(metrics.to_json())['summary']
+        read = summary['extract']['FileExtract.read_tabular']
+        self.assertEqual(len(tabular_data), read['rows_out'])
+        self.assertEqual(os.path.getsize(self.path_to_tabular_data), read['bytes_in'])
+        self.assertGreater(read['memory_peak'], 0)
+        self.assertEqual(1, summary['transform']['Transformer.replace_values']['calls'])
+        self.assertEqual(output_size, summary['load']['Loader.write_to_file']['bytes_out'])
+        self.assertFalse(enabled())
+
+    def test_streams_and_swallowed_errors(self):
+        '''
+        Ensures a stream is measured as it is consumed and a printed error is still reported to hooks.
+        '''
+        file_extractor = FileExtract()
+        calls = []
+        add_hook(calls.append)
+        try:
+            chunks = list(file_extractor.read_tabular_chunks(delimiter=',', file_path=self.path_to_tabular_data,
+                                                             chunk_rows=5))
+            file_extractor.read_tabular(delimiter=',', file_path='missing.csv')
+        finally:
+            remove_hook(calls.append)
+        self.assertEqual(sum(len(chunk) for chunk in chunks), calls[0].rows_out)
+        self.assertIn('FileNotFoundError', calls[1].error)
+
+    def test_to_prometheus(self):
+        '''
+        Ensures the Prometheus exposition has a TYPE line and a labelled sample per metric.
+        '''
+        with MetricsCollector() as metrics:
+            FileExtract().read_tabular(delimiter=',', file_path=self.path_to_tabular_data)
+        text = metrics.to_prometheus()
+        self.assertIn('# TYPE etl_tool_calls_total counter', text)
+        self.assertIn('etl_tool_calls_total{stage="extract",method="FileExtract.read_tabular"} 1', text)
+
+
+def main():
+    unittest.main()  # invoke every method
+
+
+if __name__ == '__main__':
+    main()
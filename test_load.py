@@ -6,9 +6,18 @@ TestLoader:
     - User must update [path_to_tabular_data_with_array] and [output_path_for_loader] to match their system's absolute path to the cloned repository.
 '''
 
+import gzip
+import io
+import json
+import os
+import tempfile
 import unittest
+import boto3
 import pandas as pd
-from extract import FileExtract
+from moto import mock_aws
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from extract import FileExtract, DatabaseExtract
 from transform import Transformer
 from load import Loader
 
@@ -34,6 +43,18 @@ class TestLoader(unittest.TestCase):
         file_loader = Loader(data=retrieved_data)
         self.assertEqual((4, 2), file_loader.data.shape)
 
+    def test_init_with_lazy_transformer(self):
+        '''
+        Tests the initialization of a TestLoader object with a lazy Transformer
+        Ensures the Transformer's plan is run before loading.
+        '''
+        file_extractor = FileExtract()
+        raw_tabular_data = file_extractor.read_tabular(file_path=self.path_to_tabular_data_with_array, delimiter=',')
+        transformer = Transformer(raw_data=raw_tabular_data, lazy=True).explode_column(col='phone_numbers',
+                                                                                       delimiter='|')
+        file_loader = Loader(data=transformer)
+        self.assertEqual((7, 2), file_loader.data.shape)
+
     def test_write_to_file(self):
         '''
         Tests the writing of a dataset in a TestLoader object to the file system
@@ -43,6 +64,215 @@ class TestLoader(unittest.TestCase):
         file_loader = Loader(data=raw_tabular_data)
         file_loader.write_to_file(path=self.output_path_for_loader)
 
+    def test_write_chunks_to_file(self):
+        '''
+        Tests the writing of a stream of dataframe chunks to the file system
+        Ensures every chunk is appended and the header is only written once.
+        '''
+        file_extractor = FileExtract()
+        chunks = file_extractor.read_tabular_chunks(file_path=self.path_to_tabular_data_with_array, delimiter=',',
+                                                    chunk_rows=1)
+        file_loader = Loader(data=chunks)
+        with tempfile.TemporaryDirectory() as directory:
+            output_path = os.path.join(directory, 'chunks.csv')
+            file_loader.write_to_file(path=output_path)
+            written_data = pd.read_csv(output_path)
+        self.assertEqual((4, 2), written_data.shape)
+        self.assertEqual(['name', 'phone_numbers'], list(written_data.columns))
+
+    def test_write_to_parquet(self):
+        '''
+        Tests the writing of a stream of dataframe chunks to a Parquet file
+        Ensures the row group size is honoured and every row is written with the requested codec.
+        '''
+        file_extractor = FileExtract()
+        chunks = file_extractor.read_tabular_chunks(file_path=self.path_to_tabular_data_with_array, delimiter=',',
+                                                    chunk_rows=3)
+        file_loader = Loader(data=chunks)
+        with tempfile.TemporaryDirectory() as directory:
+            output_path = os.path.join(directory, 'chunks.parquet')
+            file_loader.write_to_parquet(path=output_path, compression='zstd', row_group_size=2)
+            parquet_file = pq.ParquetFile(output_path)
+            self.assertEqual(3, parquet_file.metadata.num_row_groups)  # rows 2 + 1 from the first chunk, 1 from the last
+            self.assertEqual('ZSTD', parquet_file.metadata.row_group(0).column(0).compression)
+            self.assertEqual((4, 2), parquet_file.read().shape)
+
+    def test_write_to_feather(self):
+        '''
+        Tests the writing of a dataset to an Arrow IPC (Feather) file
+        Ensures the file reads back to the original data.
+        '''
+        file_extractor = FileExtract()
+        raw_tabular_data = file_extractor.read_tabular(file_path=self.path_to_tabular_data_with_array, delimiter=',')
+        file_loader = Loader(data=raw_tabular_data)
+        with tempfile.TemporaryDirectory() as directory:
+            output_path = os.path.join(directory, 'data.feather')
+            file_loader.write_to_feather(path=output_path, compression='zstd')
+            self.assertTrue(raw_tabular_data.equals(pd.read_feather(output_path)))
+
+    def test_write_to_database(self):
+        '''
+        Tests the bulk loading of a stream of dataframe chunks into a SQLite table
+        Ensures every row arrives in batches, missing values become NULL and the connection settings are restored.
+        '''
+        file_extractor = FileExtract()
+        raw_tabular_data = file_extractor.read_tabular(file_path=self.path_to_tabular_data_with_array, delimiter=',')
+        chunks = file_extractor.read_tabular_chunks(file_path=self.path_to_tabular_data_with_array, delimiter=',',
+                                                    chunk_rows=3)
+        with tempfile.TemporaryDirectory() as directory:
+            connection_url = f'sqlite:///{directory}/load.db'
+            for method in ('executemany', 'values'):
+                rows = Loader(data=chunks if method == 'values' else raw_tabular_data).write_to_database(
+                    f'people_{method}', connection_url=connection_url, batch_size=2, method=method)
+                self.assertEqual(len(raw_tabular_data), rows)
+            with DatabaseExtract(connection_url=connection_url) as database_extractor:
+                loaded = database_extractor.query('SELECT * FROM people_values')
+                synchronous = database_extractor.connection.exec_driver_sql('PRAGMA synchronous').scalar()
+        self.assertTrue(raw_tabular_data.equals(loaded))
+        self.assertEqual(2, synchronous)  # FULL, the SQLite default
+
+    def test_write_to_database_upsert_and_merge(self):
+        '''
+        Tests the upsert and merge modes of the database loader
+        Ensures rows with existing keys are updated rather than duplicated.
+        '''
+        with tempfile.TemporaryDirectory() as directory:
+            connection_url = f'sqlite:///{directory}/load.db'
+            Loader(data=pd.DataFrame({'id': [1, 2, 3], 'score': [1.0, 2.0, None]})).write_to_database(
+                'scores', connection_url=connection_url, mode='upsert', key_columns=['id'])
+            Loader(data=pd.DataFrame({'id': [3, 4], 'score': [30.0, 40.0]})).write_to_database(
+                'scores', connection_url=connection_url, mode='upsert', key_columns=['id'])
+            Loader(data=pd.DataFrame({'id': [1, 4], 'score': [10.0, 400.0]})).write_to_database(
+                'scores', connection_url=connection_url, mode='merge', key_columns=['id'], method='executemany')
+            with DatabaseExtract(connection_url=connection_url) as database_extractor:
+                scores = database_extractor.query('SELECT * FROM scores ORDER BY id')
+        self.assertEqual([1, 2, 3, 4], list(scores['id']))
+        self.assertEqual([10.0, 2.0, 30.0, 400.0], list(scores['score']))
+
+    def test_write_to_database_repeated_keys(self):
+        '''
+        Tests the upsert and merge modes of the database loader on a batch that repeats a key
+        Ensures the last row of each key is written instead of the statement failing.
+        '''
+        data = pd.DataFrame({'id': [1, 2, 1], 'score': [1.0, 2.0, 10.0]})
+        with tempfile.TemporaryDirectory() as directory:
+            connection_url = f'sqlite:///{directory}/load.db'
+            upserted = Loader(data=data).write_to_database('scores', connection_url=connection_url, mode='upsert',
+                                                           key_columns=['id'])
+            merged = Loader(data=data.assign(score=data['score'] * 2)).write_to_database(
+                'scores', connection_url=connection_url, mode='merge', key_columns=['id'])
+            with DatabaseExtract(connection_url=connection_url) as database_extractor:
+                scores = database_extractor.query('SELECT * FROM scores ORDER BY id')
+        self.assertIsNotNone(upserted)
+        self.assertIsNotNone(merged)
+        self.assertEqual([1, 2], list(scores['id']))
+        self.assertEqual([20.0, 4.0], list(scores['score']))
+
+    def test_write_partitioned(self):
+        '''
+        Tests the writing of a stream of dataframe chunks as a Hive-style partitioned Parquet dataset
+        Ensures files are split by target size, the dataset reads back whole and no temporary files are left behind.
+        '''
+        data = pd.DataFrame({'country': ['UK', 'US', None] * 2000, 'year': [2023, 2024] * 3000,
+                             'value': range(6000)})
+        chunks = iter([data.iloc[:2500], data.iloc[2500:]])
+        with tempfile.TemporaryDirectory() as directory:
+            manifest = Loader(data=chunks).write_partitioned(directory, ['country', 'year'], target_file_size=4096)
+            with open(os.path.join(directory, '_manifest.json'), 'r') as file:
+                self.assertEqual(manifest, json.load(file))
+            dataset = ds.dataset(directory, partitioning='hive').to_table().to_pandas()
+            self.assertEqual(['_manifest.json', 'country=UK', 'country=US', 'country=__HIVE_DEFAULT_PARTITION__'],
+                             sorted(os.listdir(directory)))
+        self.assertEqual(6000, manifest['rows'])
+        self.assertGreater(len(manifest['files']), 6)  # six partitions, several files each
+        self.assertEqual(sorted(data['value']), sorted(dataset['value']))
+        self.assertEqual(2000, (dataset['country'] == 'UK').sum())
+
+    def test_write_partitioned_to_s3(self):
+        '''
+        Tests the writing of a partitioned CSV dataset to a mocked S3 bucket
+        Ensures one object is written per partition and the manifest is written last.
+        '''
+        data = pd.DataFrame({'year': [2023, 2024, 2024], 'value': [1, 2, 3]})
+        with mock_aws():
+            s3_client = boto3.client('s3', region_name='us-east-1')
+            s3_client.create_bucket(Bucket='etl-tool-test')
+            manifest = Loader(data=data).write_partitioned('s3://etl-tool-test/dataset', 'year', file_format='csv',
+                                                           s3_client=s3_client)
+            keys = sorted(item['Key'] for item in s3_client.list_objects_v2(Bucket='etl-tool-test')['Contents'])
+        self.assertEqual(['dataset/_manifest.json'] + sorted(f'dataset/{entry["path"]}' for entry in manifest['files']),
+                         keys)
+        self.assertEqual([{'year': '2023'}, {'year': '2024'}], [entry['partition'] for entry in manifest['files']])
+
+    def test_write_to_s3_multipart(self):
+        '''
+        Tests the multipart upload of a compressed dataset to a mocked S3 bucket
+        Ensures the data is split into parts and the uploaded object decompresses to every row.
+        '''
+        data = pd.DataFrame({'id': range(300_000), 'value': [f'row-{i}' for i in range(300_000)]})
+        with mock_aws():
+            s3_client = boto3.client('s3', region_name='us-east-1')
+            s3_client.create_bucket(Bucket='etl-tool-test')
+            result = Loader(data=data).write_to_s3_multipart('etl-tool-test', 'data.csv.gz', compression='gzip',
+                                                             part_size=5 * 1024 * 1024, s3_client=s3_client)
+            body = s3_client.get_object(Bucket='etl-tool-test', Key='data.csv.gz')['Body'].read()
+        self.assertEqual(len(body), result.bytes_uploaded)
+        self.assertLess(result.bytes_uploaded, result.bytes_raw)
+        self.assertEqual(data.shape, pd.read_csv(io.BytesIO(gzip.decompress(body))).shape)
+
+    def test_write_to_s3_multipart_aborts_on_failure(self):
+        '''
+        Tests that a failed part aborts the multipart upload
+        Ensures no result is returned and no incomplete upload is left in the bucket.
+        '''
+        class FailingPartClient():
+            def __init__(self, client):
+                self.client = client
+
+            def __getattr__(self, name):
+                return getattr(self.client, name)
+
+            def upload_part(self, **kwargs):
+                if kwargs['PartNumber'] == 2:
+                    raise ConnectionError('connection reset while uploading part 2')
+                return self.client.upload_part(**kwargs)
+
+        data = pd.DataFrame({'id': range(400_000), 'value': [f'row-{i}' for i in range(400_000)]})
+        with mock_aws():
+            s3_client = boto3.client('s3', region_name='us-east-1')
+            s3_client.create_bucket(Bucket='etl-tool-test')
+            result = Loader(data=data).write_to_s3_multipart('etl-tool-test', 'data.csv', part_size=5 * 1024 * 1024,
+                                                             s3_client=FailingPartClient(s3_client))
+            self.assertIsNone(result)
+            self.assertEqual([], s3_client.list_multipart_uploads(Bucket='etl-tool-test').get('Uploads', []))
+
+    def test_write_to_s3_multipart_stops_at_first_failed_part(self):
+        '''
+        Tests that a failed part stops the upload before the rest of the data is uploaded
+        Ensures later parts are not submitted once a part has failed, and the upload is aborted.
+        '''
+        class FailingClient():
+            def __init__(self):
+                self.parts, self.aborted = [], False
+
+            def create_multipart_upload(self, **kwargs):
+                return {'UploadId': 'upload'}
+
+            def upload_part(self, **kwargs):
+                self.parts.append(kwargs['PartNumber'])
+                raise ConnectionError(f'connection reset while uploading part {kwargs["PartNumber"]}')
+
+            def abort_multipart_upload(self, **kwargs):
+                self.aborted = True
+
+        data = pd.DataFrame({'id': range(500_000), 'value': ['x' * 60] * 500_000})  # about six 5 MiB parts
+        client = FailingClient()
+        result = Loader(data=data).write_to_s3_multipart('etl-tool-test', 'data.csv', part_size=5 * 1024 * 1024,
+                                                         max_workers=1, s3_client=client)
+        self.assertIsNone(result)
+        self.assertTrue(client.aborted)
+        self.assertLess(len(client.parts), 3)
+
 
 def main():
     unittest.main()  # invoke every method
@@ -0,0 +1,102 @@
+'''
+A suite of tests for testing the pipeline module classes.
+TestPipeline:
+    - User must update [path_to_tabular_data] to match their system's absolute path to the cloned repository.
+'''
+
+import json
+import os
+import tempfile
+import time
+import unittest
+import pandas as pd
+from pipeline import Pipeline
+
+
+def _numbered_chunks(count: int, produced: list):
+    for index in range(count):
+        produced.append(index)
+        yield pd.DataFrame({'n': [index]})
+
+
+class TestPipeline(unittest.TestCase):
+    '''
+    Tests the Pipeline class methods.
+    User must update [path_to_tabular_data] to match their system's absolute path to the cloned repository.
+    '''
+    path_to_tabular_data = '/home/smith/Development/ds5010/github/ds5010/etl_tool/data/tabular.csv'  # user must update
+
+    def test_independent_steps_run_concurrently(self):
+        '''
+        Ensures independent steps overlap and each step receives the results of its dependencies in order.
+        '''
+        pipeline = Pipeline(max_workers=2)
+        pipeline.add_step('left', lambda: time.sleep(0.2) or 'left')
+        pipeline.add_step('right', lambda: time.sleep(0.2) or 'right')
+        pipeline.add_step('join', lambda left, right: f'{left}-{right}', depends_on=['left', 'right'])
+        start = time.perf_counter()
+        results = pipeline.run()
+        self.assertLess(time.perf_counter() - start, 0.35)
+        self.assertEqual('left-right', results['join'])
+
+    def test_stream_is_bounded(self):
+        '''
+        Ensures a streamed step is consumed while it produces and never runs more than the queue size ahead.
+        '''
+        produced, lead = [], []
+
+        def consume(chunks):
+            frames = []
+            for index, chunk in enumerate(chunks):
+                lead.append(len(produced) - index)
+                time.sleep(0.005)
+                frames.append(chunk)
+            return pd.concat(frames, ignore_index=True)
+
+        pipeline = Pipeline(queue_size=2)
+        pipeline.add_step('extract', lambda: _numbered_chunks(20, produced))
+        pipeline.add_step('load', consume, depends_on=['extract'])
+        results = pipeline.run()
+        self.assertEqual(list(range(20)), list(results['load']['n']))
+        self.assertLessEqual(max(lead), 4)  # queue size, plus one chunk in each of the producer and consumer
+
+    def test_failure_and_cycle(self):
+        '''
+        Ensures a failing step raises with its name and a dependency cycle is rejected before running.
+        '''
+        pipeline = Pipeline().add_step('broken', lambda: 1 / 0).add_step('after', lambda value: value, ['broken'])
+        with self.assertRaisesRegex(RuntimeError, 'broken'):
+            pipeline.run()
+        cyclic = Pipeline().add_step('a', lambda b: b, ['b']).add_step('b', lambda a: a, ['a'])
+        with self.assertRaises(ValueError):
+            cyclic.run()
+
+    def test_from_spec(self):
+        '''
+        Ensures a JSON spec streams file chunks through a Transformer into a Loader.
+        '''
+        with tempfile.TemporaryDirectory() as directory:
+            output_path = os.path.join(directory, 'output.csv')
+            spec = {'steps': [
+                {'name': 'read', 'class': 'FileExtract',
+                 'calls': [{'method': 'read_tabular_chunks',
+                            'args': {'delimiter': ',', 'file_path': self.path_to_tabular_data, 'chunk_rows': 5}}]},
+                {'name': 'clean', 'class': 'Transformer', 'depends_on': ['read'], 'input': 'raw_data',
+                 'calls': [{'method': 'replace_values', 'args': {'col': 'cyl', 'to_replace': 4, 'value': 40}}]},
+                {'name': 'write', 'class': 'Loader', 'depends_on': ['clean'], 'input': 'data',
+                 'calls': [{'method': 'write_to_file', 'args': {'path': output_path}}]}]}
+            spec_path = os.path.join(directory, 'pipeline.json')
+            with open(spec_path, 'w') as file:
+                json.dump(spec, file)
+            Pipeline.from_spec(spec_path).run()
+            output = pd.read_csv(output_path)
+        expected = pd.read_csv(self.path_to_tabular_data)['cyl'].replace(4, 40)
+        self.assertEqual(list(expected), list(output['cyl']))
+
+
+def main():
+    unittest.main()  # invoke every method
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+'''
+A suite of tests for testing the state module classes.
+'''
+
+import os
+import tempfile
+import unittest
+from state import StateStore
+
+
+class TestStateStore(unittest.TestCase):
+    '''
+    Tests the StateStore class methods.
+    '''
+
+    def test_set_persists_between_instances(self):
+        '''
+        Ensures a saved value is visible to a new StateStore reading the same file and no temp file is left behind.
+        '''
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'state', 'state.json')
+            StateStore(path).set('watermark:people:id', 42)
+            self.assertEqual(42, StateStore(path).get('watermark:people:id'))
+            self.assertEqual(['state.json'], os.listdir(os.path.dirname(path)))
+
+    def test_reset(self):
+        '''
+        Ensures reset forgets one key, or every key when none is given.
+        '''
+        with tempfile.TemporaryDirectory() as directory:
+            state = StateStore(os.path.join(directory, 'state.json'))
+            state.set('a', 1)
+            state.set('b', 2)
+            state.reset('a')
+            self.assertEqual(['b'], state.keys())
+            self.assertEqual('default', state.get('a', 'default'))
+            state.reset()
+            self.assertEqual([], StateStore(state.path).keys())
+
+
+def main():
+    unittest.main()  # invoke every method
+
+
+if __name__ == '__main__':
+    main()
@@ -6,8 +6,12 @@ TestTransformer:
     - User must update [path_to_tabular_data_with_array] and [path_to_json_data] to match their system's absolute path to the cloned repository.
 '''
 
+import json
+import os
+import tempfile
 import unittest
 import pandas as pd
+import pyarrow as pa
 from extract import FileExtract
 from transform import Transformer
 
@@ -34,6 +38,35 @@ class TestTransformer(unittest.TestCase):
         processed_data = transformer.json_to_dataframe().get_data()
         self.assertIsInstance(processed_data, pd.DataFrame)
 
+    def test_json_to_dataframe_from_json_lines(self):
+        file_extractor = FileExtract()
+        records = [{**file_extractor.read_json(file_path=self.path_to_json_data), 'id': index} for index in range(20)]
+        with tempfile.TemporaryDirectory() as directory:
+            json_lines_path = os.path.join(directory, 'records.jsonl')
+            with open(json_lines_path, 'w') as file:
+                file.write('\n'.join(json.dumps(record) for record in records))
+            transformer = Transformer(raw_data=file_extractor.read_json_lines(file_path=json_lines_path,
+                                                                              block_size=1024))
+            transformer.json_to_dataframe(record_path='orders', meta=['id', ['address', 'city']])
+            processed_data = pd.concat(transformer.get_data(), ignore_index=True)
+        expected = pd.json_normalize(records, record_path='orders', meta=['id', ['address', 'city']])
+        self.assertEqual(list(expected.columns), list(processed_data.columns))
+        self.assertTrue(expected.astype(str).equals(processed_data.astype(str)))
+
+    def test_json_to_dataframe_from_arrow_without_record_path(self):
+        '''
+        Ensures Arrow input without a record_path gives the same columns, order, nulls and list values as
+        pd.json_normalize, including a record whose nested object is null.
+        '''
+        record = FileExtract().read_json(file_path=self.path_to_json_data)
+        records = [record, {**record, 'id': 2, 'address': None}, {**record, 'id': 3, 'orders': []}]
+        processed_data = Transformer(raw_data=pa.Table.from_pylist(records)).json_to_dataframe().get_data()
+        expected = pd.json_normalize(records)
+        self.assertEqual(list(expected.columns), list(processed_data.columns))
+        self.assertEqual(expected['orders'].tolist(), processed_data['orders'].tolist())
+        self.assertIsInstance(processed_data['orders'][0], list)
+        self.assertTrue(expected.astype(str).equals(processed_data.astype(str)))
+
     def test_replace_values(self):
         file_extractor = FileExtract()
         raw_tabular_data = file_extractor.read_tabular(file_path=self.path_to_tabular_data_with_array, delimiter=',')
@@ -42,6 +75,17 @@ class TestTransformer(unittest.TestCase):
         processed_data = transformer.get_data()
         self.assertEqual('replaced with adam', processed_data.loc[0, 'name'])
 
+    def test_replace_values_on_category(self):
+        file_extractor = FileExtract()
+        raw_tabular_data = file_extractor.read_tabular(file_path=self.path_to_tabular_data_with_array, delimiter=',')
+        raw_tabular_data['name'] = raw_tabular_data['name'].astype('category')
+        transformer = Transformer(raw_data=raw_tabular_data)
+        transformer.replace_values('name', 'john', 'replaced with adam')
+        transformer.fill_missing_values(col='name', fill_value='Was Missing')
+        processed_data = transformer.get_data()
+        self.assertIsInstance(processed_data['name'].dtype, pd.CategoricalDtype)  # never decoded to objects
+        self.assertEqual('replaced with adam', processed_data.loc[0, 'name'])
+
     def test_fill_missing_values(self):
         file_extractor = FileExtract()
         raw_tabular_data = file_extractor.read_tabular(file_path=self.path_to_tabular_data_with_array, delimiter=',')
@@ -58,6 +102,64 @@ class TestTransformer(unittest.TestCase):
         processed_data = transformer.get_data()
         self.assertEqual((7, 2), processed_data.shape)
 
+    def test_streaming_chain(self):
+        file_extractor = FileExtract()
+        chunks = file_extractor.read_tabular_chunks(file_path=self.path_to_tabular_data_with_array, delimiter=',',
+                                                    chunk_rows=2)
+        transformer = Transformer(raw_data=chunks)
+        transformer.fill_missing_values(col='phone_numbers', fill_value='Was Missing')
+        transformer.explode_column(col='phone_numbers', delimiter='|')
+        processed_chunks = list(transformer.get_data())
+        self.assertEqual(2, len(processed_chunks))  # one transformed chunk per input chunk
+        self.assertEqual((7, 2), pd.concat(processed_chunks).shape)
+
+    def test_lazy_matches_eager(self):
+        file_extractor = FileExtract()
+        raw_tabular_data = file_extractor.read_tabular(file_path=self.path_to_tabular_data_with_array, delimiter=',')
+        results = []
+        for lazy in (False, True):
+            transformer = Transformer(raw_data=raw_tabular_data.copy(), lazy=lazy)
+            transformer.explode_column(col='phone_numbers', delimiter='|')
+            transformer.replace_values('name', 'john', 'adam').fill_missing_values(col='phone_numbers')
+            transformer.replace_values('name', 'adam', 'replaced with adam')
+            results.append(transformer.get_data())
+        self.assertTrue(results[0].equals(results[1]))
+
+    def test_explain(self):
+        file_extractor = FileExtract()
+        raw_tabular_data = file_extractor.read_tabular(file_path=self.path_to_tabular_data_with_array, delimiter=',')
+        transformer = Transformer(raw_data=raw_tabular_data, lazy=True)
+        transformer.explode_column(col='phone_numbers', delimiter='|')
+        transformer.replace_values('name', 'john', 'adam').replace_values('name', 'jane', 'eve')
+        plan = transformer.explain().splitlines()
+        # the name replacements are fused into one step and moved ahead of the explode
+        self.assertEqual(2, len(plan))
+        self.assertTrue(plan[0].startswith("1. fused_column(col='name')"))
+        self.assertTrue(plan[1].startswith('2. explode_column'))
+        self.assertEqual((4, 2), transformer.raw_data.shape)  # nothing has run yet
+
+    def test_lazy_keeps_row_dependent_steps_in_place(self):
+        data = pd.DataFrame({'tags': ['a|b', 'c|d'], 'note': [None, 'x']})
+        results = []
+        for lazy in (False, True):
+            transformer = Transformer(raw_data=data.copy(), lazy=lazy).explode_column(col='tags', delimiter='|')
+            transformer.fill_missing_values(col='note', fill_value='first only', limit=1)
+            if lazy:
+                plan = transformer.explain().splitlines()
+                self.assertTrue(plan[0].startswith('1. explode_column'))  # limit counts rows, so it stays after
+            results.append(transformer.get_data())
+        self.assertEqual(['first only', 'x', 'x'], results[1]['note'].dropna().tolist())
+        self.assertTrue(results[0].equals(results[1]))
+
+    def test_parallel_matches_in_process(self):
+        file_extractor = FileExtract()
+        raw_tabular_data = file_extractor.read_tabular(file_path=self.path_to_tabular_data_with_array, delimiter=',')
+        in_process = Transformer(raw_data=raw_tabular_data.copy()).explode_column(col='phone_numbers', delimiter='|')
+        # a threshold of zero forces the process pool even for this small sample
+        parallel = Transformer(raw_data=raw_tabular_data.copy(), parallel=True, max_workers=2, partitions=3,
+                               parallel_threshold=0).explode_column(col='phone_numbers', delimiter='|')
+        self.assertTrue(in_process.get_data().equals(parallel.get_data()))
+
     def test_get_data(self):
         file_extractor = FileExtract()
         raw_tabular_data = file_extractor.read_tabular(file_path=self.path_to_tabular_data_with_array, delimiter=',')
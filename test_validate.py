@@ -0,0 +1,111 @@
+'''
+A suite of tests for testing the validate module classes.
+TestValidator:
+    - User must update [path_to_tabular_data] to match their system's absolute path to the cloned repository.
+'''
+
+import unittest
+import pandas as pd
+from extract import FileExtract
+from pipeline import Pipeline
+from validate import Validator, ValidationError
+
+
+class TestValidator(unittest.TestCase):
+    '''
+    Tests the Validator class methods.
+    User must update [path_to_tabular_data] to match their system's absolute path to the cloned repository.
+    '''
+    path_to_tabular_data = '/home/smith/Development/ds5010/github/ds5010/etl_tool/data/tabular.csv'  # user must update
+
+    def setUp(self):
+        self.tabular_data = FileExtract().read_tabular(delimiter=',', file_path=self.path_to_tabular_data)
+
+    def test_check_report(self):
+        '''
+        Ensures every expectation is evaluated, thresholds and severities are applied and failing values are reported.
+        '''
+        validator = (Validator(max_examples=2)
+                     .expect_columns(['model', 'mpg', 'cyl']).expect_row_count(min=10).expect_dtype('mpg', 'numeric')
+                     .expect_not_null('model').expect_range('mpg', min=15, max_ratio=0.25)
+                     .expect_values('cyl', [4, 6]).expect_unique('model').expect_unique(['cyl', 'gear'])
+                     .expect_pattern('model', r'[A-Za-z ]+', severity='warn'))
+        report = validator.check(self.tabular_data)
+        results = {(result['expectation'], str(result['column'])): result for result in report['results']}
+        self.assertFalse(report['passed'])
+        self.assertEqual(len(self.tabular_data), report['rows_checked'])
+        self.assertTrue(results[('range', 'mpg')]['passed'])  # 5 of 32 cars under 15 mpg is within 25%
+        self.assertEqual(5, results[('range', 'mpg')]['failed_rows'])
+        self.assertEqual(14, results[('values', 'cyl')]['failed_rows'])  # the eight-cylinder cars
+        self.assertEqual([8, 8], results[('values', 'cyl')]['examples'])
+        self.assertTrue(results[('unique', 'model')]['passed'])
+        self.assertFalse(results[('unique', "['cyl', 'gear']")]['passed'])
+        self.assertFalse(results[('pattern', 'model')]['passed'])  # e.g. - Mazda RX4 has a digit
+        self.assertEqual('warn', results[('pattern', 'model')]['severity'])
+
+    def test_range_on_mixed_column(self):
+        '''
+        Ensures a range check on a column of mixed types compares numeric strings as numbers and reports values that
+        are not numbers as failures instead of raising.
+        '''
+        data = pd.DataFrame({'mpg': [21, '18.5', 'n/a', 40, None]})
+        result = Validator(data).expect_range('mpg', min=15, max=30).check()['results'][0]
+        self.assertEqual(2, result['failed_rows'])
+        self.assertEqual(['n/a', 40], result['examples'])
+
+    def test_validate_raises_and_fails_fast(self):
+        '''
+        Ensures validate passes good data on, and raises on an empty extract without evaluating later expectations.
+        '''
+        validator = Validator(fail_fast=True).expect_row_count().expect_columns(['model'])
+        self.assertIs(self.tabular_data, validator.validate(self.tabular_data))
+        with self.assertRaises(ValidationError) as context:
+            validator.validate(pd.DataFrame())
+        self.assertEqual(['columns'], context.exception.report['skipped'])
+
+    def test_sampling(self):
+        '''
+        Ensures only a sample is checked while row counts use every row.
+        '''
+        data = pd.DataFrame({'a': range(100_000)})
+        report = Validator(data, sample=0.01).expect_range('a', min=0).expect_row_count(min=100_000).check()
+        self.assertTrue(report['passed'])
+        self.assertTrue(report['sampled'])
+        self.assertEqual(1000, report['rows_checked'])
+
+    def test_validate_stream(self):
+        '''
+        Ensures a stream is passed through chunk by chunk and stopped at the first chunk with a duplicate from an
+        earlier chunk.
+        '''
+        validator = Validator(expectations=[{'expect': 'unique', 'col': 'model'}])
+        chunks = FileExtract().read_tabular_chunks(delimiter=',', file_path=self.path_to_tabular_data, chunk_rows=10)
+        self.assertEqual(len(self.tabular_data), sum(len(chunk) for chunk in validator.validate(chunks)))
+        duplicated = iter([self.tabular_data.head(10), self.tabular_data.iloc[5:15], self.tabular_data.tail(5)])
+        passed = []
+        with self.assertRaises(ValidationError):
+            for chunk in validator.validate(duplicated):
+                passed.append(chunk)
+        self.assertEqual(1, len(passed))
+        self.assertEqual(5, validator.report['results'][0]['failed_rows'])
+
+    def test_pipeline_spec_step(self):
+        '''
+        Ensures a Validator step declared in a pipeline spec stops the pipeline.
+        '''
+        spec = {'steps': [
+            {'name': 'read', 'class': 'FileExtract',
+             'calls': [{'method': 'read_tabular', 'args': {'delimiter': ',', 'file_path': self.path_to_tabular_data}}]},
+            {'name': 'validate', 'class': 'Validator', 'depends_on': ['read'], 'input': 'data',
+             'args': {'expectations': [{'expect': 'range', 'col': 'mpg', 'max': 30}]}, 'calls': [{'method': 'validate'}]}]}
+        with self.assertRaises(RuntimeError) as context:
+            Pipeline.from_spec(spec).run()
+        self.assertIsInstance(context.exception.__cause__, ValidationError)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
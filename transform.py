@@ -1,25 +1,333 @@
-from extract import FileExtract, DatabaseExtract, APIExtract
+from compact import fill_categories, replace_categories
+from instrument import instrumented
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+import os
+import pickle
 import pandas as pd
 
+try:  # pyarrow is optional; it is used for Arrow IPC partition transfer and columnar JSON flattening when available
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = pc = None
+
+# Steps that only read and write a single column, element by element. They commute with steps on other columns and
+# with explode_column on another column, which lets the plan optimizer reorder and fuse them.
+COLUMN_STEPS = ('replace_values', 'fill_missing_values')
+# Keyword arguments that make a column step depend on row order or position (e.g. - fillna(limit=1) fills only the
+# first missing row), so it no longer commutes with explode_column.
+ROW_DEPENDENT_KWARGS = ('limit', 'method')
+
+
+def _is_elementwise(method: str, kwargs: dict) -> bool:
+    '''
+    Checks whether a recorded step is a column step that transforms each element independently.
+    :param method: The name of the Transformer method.
+    :param kwargs: The keyword arguments the method was called with.
+    :return: True if the step can be reordered past steps on other columns.
+    '''
+    return method in COLUMN_STEPS and all(kwargs.get(name) is None for name in ROW_DEPENDENT_KWARGS)
+
+
+def _apply_column_step(series: pd.Series, method: str, kwargs: dict) -> pd.Series:
+    '''
+    Applies a column-local step to a single column. Categorical columns are transformed through their categories
+    without being decoded.
+    :param series: The column to transform.
+    :param method: The name of the Transformer method (replace_values or fill_missing_values).
+    :param kwargs: The keyword arguments the method was called with, excluding col.
+    :return: The transformed column.
+    '''
+    kwargs = dict(kwargs)
+    categorical = isinstance(series.dtype, pd.CategoricalDtype)
+    if method == 'replace_values':
+        to_replace, value = kwargs.pop('to_replace'), kwargs.pop('value')
+        if categorical and not (pd.api.types.is_scalar(to_replace) and pd.isna(to_replace)):
+            return replace_categories(series, to_replace, value, **kwargs)
+        return series.replace(to_replace, value, **kwargs)
+    if categorical:
+        return fill_categories(series, kwargs.pop('fill_value'), **kwargs)
+    return series.fillna(kwargs.pop('fill_value'), **kwargs)
+
+
+def optimize_plan(steps: list) -> list:
+    '''
+    Optimizes a recorded list of Transformer steps. Column-local steps (replace_values, fill_missing_values) are moved
+    ahead of any explode_column on a different column, so they run before the row count is multiplied, and consecutive
+    column-local steps on the same column are fused into a single pass over that column. Steps called with limit or
+    method depend on row position and, like json_to_dataframe, are never reordered.
+    :param steps: A list of (method name, keyword arguments) tuples in call order.
+    :return: The optimized list of steps. Fused steps are ('fused_column', {'col': ..., 'steps': [...]}).
+    '''
+    plan = []
+    for method, kwargs in steps:
+        if not _is_elementwise(method, kwargs):
+            plan.append((method, kwargs))
+            continue
+        col = kwargs['col']
+        position = len(plan)
+        # walk back past steps that commute with a step on this column
+        while position > 0:
+            previous_method, previous_kwargs = plan[position - 1]
+            if previous_method == 'json_to_dataframe' or previous_kwargs.get('col') == col:
+                break
+            position -= 1
+        column_step = (method, {key: value for key, value in kwargs.items() if key != 'col'})
+        if position > 0 and plan[position - 1][0] in COLUMN_STEPS + ('fused_column',) \
+                and plan[position - 1][1]['col'] == col:
+            previous_method, previous_kwargs = plan[position - 1]
+            fused_steps = previous_kwargs['steps'] if previous_method == 'fused_column' else \
+                [(previous_method, {key: value for key, value in previous_kwargs.items() if key != 'col'})]
+            plan[position - 1] = ('fused_column', {'col': col, 'steps': fused_steps + [column_step]})
+        else:
+            plan.insert(position, (method, kwargs))
+    return plan
+
+
+def execute_plan(data, plan: list):
+    '''
+    Runs an optimized plan against a dataset.
+    :param data: The dataset to be transformed.
+    :param plan: A list of steps as returned by optimize_plan.
+    :return: The transformed dataset.
+    '''
+    transformer = Transformer(raw_data=data)
+    for method, kwargs in plan:
+        if method == 'fused_column':
+            transformer._check_column(kwargs['col'])
+            series = transformer.raw_data[kwargs['col']]
+            for column_method, column_kwargs in kwargs['steps']:
+                series = _apply_column_step(series, column_method, column_kwargs)
+            transformer.raw_data[kwargs['col']] = series  # one write back for the whole fused chain
+        else:
+            getattr(transformer, method)(**kwargs)
+    return transformer.raw_data
+
+
+class JsonFlattener():
+    '''
+    Flattens nested JSON held in Arrow record batches (e.g. - from FileExtract.read_json_lines) into pandas dataframes,
+    with the same output as pd.json_normalize. A record_path explodes a list column (such as a list of orders) into one
+    row per element, repeating any meta columns: the nested schema is compiled once into a list of column paths and
+    every batch is then flattened with vectorized Arrow kernels, without building per-record Python objects. Without a
+    record_path, json_normalize's column order and null object handling depend on the records themselves, so batches
+    are passed to pd.json_normalize.
+    Methods: compile, flatten
+    '''
+
+    _compiled = {}  # compiled column paths, shared across instances and keyed by schema and options
+
+    def __init__(self, record_path=None, meta: list = None, sep: str = '.', max_level: int = None) -> None:
+        '''
+        Initializes the JsonFlattener object.
+        :param record_path: The field (or list of nested fields) holding the list of records to explode.
+        :param meta: Fields (or lists of nested fields) to repeat on every exploded record.
+        :param sep: The separator used to join nested field names.
+        :param max_level: The maximum depth of nested structs to flatten. If None, flattens completely.
+        '''
+        self.record_path = [record_path] if isinstance(record_path, str) else record_path
+        self.meta = [[field] if isinstance(field, str) else list(field) for field in meta or []]
+        self.sep = sep
+        self.max_level = max_level
+
+    def _leaves(self, data_type, path: tuple, level: int) -> list:
+        '''
+        Lists the leaf paths below a type, descending into structs until max_level.
+        '''
+        if pa.types.is_struct(data_type) and (self.max_level is None or level < self.max_level):
+            return [leaf for field in data_type for leaf in self._leaves(field.type, path + (field.name,), level + 1)]
+        return [path]
+
+    def compile(self, schema) -> tuple:
+        '''
+        Compiles a schema into the column paths to extract. Results are cached, so each schema is only compiled once.
+        :param schema: The pyarrow schema of the batches.
+        :return: A tuple of record leaf paths and top-level leaf paths (or meta paths when exploding records).
+        '''
+        key = (schema, tuple(self.record_path or ()), tuple(map(tuple, self.meta)), self.sep, self.max_level)
+        if key not in self._compiled:
+            if self.record_path is None:
+                self._compiled[key] = ([], [leaf for field in schema for leaf in
+                                            self._leaves(field.type, (field.name,), 1)])
+            else:
+                list_type = schema.field(self.record_path[0]).type
+                for name in self.record_path[1:]:
+                    list_type = list_type.field(name).type
+                if not pa.types.is_list(list_type) and not pa.types.is_large_list(list_type):
+                    raise ValueError(f'The record_path {self.record_path} does not point to a list.')
+                record_leaves = self._leaves(list_type.value_type, (), 0)
+                self._compiled[key] = (record_leaves, [tuple(path) for path in self.meta])
+        return self._compiled[key]
+
+    @staticmethod
+    def _column(batch, path: tuple):
+        '''
+        Extracts a (possibly nested) column from a record batch, respecting struct validity.
+        '''
+        column = batch.column(path[0])
+        return pc.struct_field(column, list(path[1:])) if len(path) > 1 else column
+
+    def flatten(self, data) -> pd.DataFrame:
+        '''
+        Flattens a batch of nested records.
+        :param data: A pyarrow RecordBatch or Table.
+        :return: A flat pandas dataframe.
+        '''
+        if self.record_path is None:
+            return pd.json_normalize(data.to_pylist(), sep=self.sep, max_level=self.max_level)
+        if isinstance(data, pa.Table):
+            data = pa.RecordBatch.from_arrays([column.combine_chunks() for column in data.columns],
+                                              schema=data.schema)
+        record_leaves, paths = self.compile(data.schema)
+        names, arrays = [], []
+        records = self._column(data, tuple(self.record_path))
+        parents = pc.list_parent_indices(records)
+        values = pc.list_flatten(records)
+        for leaf in record_leaves:
+            names.append(self.sep.join(leaf) if leaf else '0')  # unnamed scalar records, as json_normalize
+            arrays.append(pc.struct_field(values, list(leaf)) if leaf else values)
+        for path in paths:
+            names.append(self.sep.join(path))
+            arrays.append(self._column(data, path).take(parents))
+        frame = pa.table(arrays, names=names).to_pandas()
+        for name, array in zip(names, arrays):
+            if pa.types.is_list(array.type) or pa.types.is_large_list(array.type):
+                frame[name] = pd.Series(array.to_pylist(), index=frame.index, dtype=object)  # lists, as json_normalize
+        return frame
+
+
+def _pack_partition(data: pd.DataFrame) -> tuple:
+    '''
+    Serializes a partition for transfer to or from a worker process. Arrow IPC is used when possible because it copies
+    column buffers instead of pickling every Python object; frames Arrow cannot represent fall back to pickle.
+    :param data: The partition.
+    :return: A (format, bytes) tuple.
+    '''
+    if pa is not None:
+        try:
+            table = pa.Table.from_pandas(data, preserve_index=True)
+            sink = pa.BufferOutputStream()
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            return 'arrow', sink.getvalue().to_pybytes()
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            pass
+    return 'pickle', pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _unpack_partition(packed: tuple) -> pd.DataFrame:
+    '''
+    Deserializes a partition packed by _pack_partition.
+    :param packed: A (format, bytes) tuple.
+    :return: The partition.
+    '''
+    kind, payload = packed
+    if kind == 'arrow':
+        return pa.ipc.open_stream(payload).read_all().to_pandas()
+    return pickle.loads(payload)
+
+
+def _execute_partition(packed: tuple, plan: list) -> tuple:
+    '''
+    Worker process entry point: runs a plan against one packed partition.
+    :param packed: The packed partition.
+    :param plan: The optimized plan.
+    :return: The packed, transformed partition.
+    '''
+    return _pack_partition(execute_plan(_unpack_partition(packed), plan))
+
+
+def execute_plan_parallel(data: pd.DataFrame, plan: list, partitions: int = None, max_workers: int = None):
+    '''
+    Runs an optimized plan against row partitions of a dataframe in a process pool and reassembles the results in the
+    original row order.
+    :param data: The dataframe to be transformed.
+    :param plan: A list of steps as returned by optimize_plan. json_to_dataframe steps are not supported.
+    :param partitions: The number of row partitions. Defaults to the number of workers.
+    :param max_workers: The number of worker processes. Defaults to the number of CPUs.
+    :return: The transformed dataframe.
+    '''
+    max_workers = max_workers or os.cpu_count() or 1
+    partitions = max(1, min(partitions or max_workers, len(data)))
+    bounds = [len(data) * index // partitions for index in range(partitions + 1)]
+    packed = (_pack_partition(data.iloc[start:stop]) for start, stop in zip(bounds, bounds[1:]))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(_execute_partition, packed, [plan] * partitions))
+    return pd.concat([_unpack_partition(result) for result in results])
+
 
 class Transformer():
     '''
     The Transformer class provides an object for applying common transformations to data. It is intended to mutate the
     data directly to keep the memory footprint light. This class can be expanded with more transformations through the
     addition of more methods.
-    Methods: json_to_dataframe, replace_values, fill_missing_values, explode_column, get_data
+    When initialized with an iterator of data chunks (e.g. - from FileExtract.read_tabular_chunks) the Transformer runs in
+    streaming mode: method calls are recorded and applied to each chunk as it is pulled through get_data.
+    In lazy mode method calls are recorded as a plan, which is optimized (see optimize_plan) and run by get_data.
+    Streaming transformers always run an optimized plan. In parallel mode (which implies lazy mode) the plan is run over
+    row partitions in a process pool when the data has at least parallel_threshold rows.
+    Methods: json_to_dataframe, replace_values, fill_missing_values, explode_column, get_data, explain
     '''
 
-    def __init__(self, raw_data):
+    def __init__(self, raw_data, lazy: bool = False, parallel: bool = False, max_workers: int = None,
+                 partitions: int = None, parallel_threshold: int = 100_000):
         '''
         Initializes the Transformer object with raw data.
-        :param raw_data: The raw dataset to be transformed.
+        :param raw_data: The raw dataset to be transformed, or an iterator of chunks to be transformed one at a time.
+        :param lazy: If True, defer every transformation until get_data is called. Default is False.
+        :param parallel: If True, run the plan over row partitions in a process pool. Default is False.
+        :param max_workers: The number of worker processes in parallel mode. Defaults to the number of CPUs.
+        :param partitions: The number of row partitions in parallel mode. Defaults to the number of workers.
+        :param parallel_threshold: The minimum number of rows for which parallel mode uses the process pool. Smaller
+                                   dataframes are transformed in-process, where pool start-up would cost more than it
+                                   saves. Default is 100,000.
         '''
         self.raw_data = raw_data
+        self.streaming = isinstance(raw_data, Iterator)
+        self.parallel = parallel
+        self.max_workers = max_workers
+        self.partitions = partitions
+        self.parallel_threshold = parallel_threshold
+        self.lazy = lazy or parallel or self.streaming
+        self.steps = []  # (method name, keyword arguments) for every transformation applied, in order
+        self.pending = []  # steps recorded but not yet applied to raw_data
+
+    def _record(self, method: str, **kwargs) -> bool:
+        '''
+        Records a transformation step. In lazy and streaming mode the step is deferred until the data is requested.
+        :param method: The name of the Transformer method being applied.
+        :param kwargs: The keyword arguments the method was called with.
+        :return: True if the step was deferred and should not be applied to raw_data now.
+        '''
+        self.steps.append((method, kwargs))
+        if self.lazy:
+            self.pending.append((method, kwargs))
+        return self.lazy
 
+    def _check_column(self, col: str) -> None:
+        '''
+        Raises a value error if a column is not present in the data.
+        :param col: The column name.
+        '''
+        if col not in self.raw_data.columns:
+            raise ValueError(f'The column {col} does not exist in the DataFrame.')
+
+    def _stream(self, plan: list):
+        '''
+        Applies an optimized plan to each chunk of the underlying iterator.
+        :param plan: The optimized plan.
+        :return: A generator of transformed chunks.
+        '''
+        for chunk in self.raw_data:
+            yield execute_plan(chunk, plan)
+
+    @instrumented('transform')
     def json_to_dataframe(self, max_level: int = None, **kwargs):
         '''
-        Transforms a JSON-like structure into a flattened pandas DataFrame.
+        Transforms a JSON-like structure into a flattened pandas DataFrame. Arrow batches (e.g. - from
+        FileExtract.read_json_lines) are flattened column by column with JsonFlattener when a record_path is given and
+        only the record_path, meta, sep and max_level options are used. The result is the same as pd.json_normalize.
         :param max_level: The maximum level of flattening. If None, flattens completely.
         :param kwargs: Any additional arguments supported by pd.json_normalize are supported.
         :return: Returns instance of the Transformer object with updated attributes. This makes method chaining possible.
@@ -27,9 +335,17 @@ class Transformer():
         if max_level is not None:
             # update the max_level arg passed to json_normalize with whatever user passes to json_to_dataframe
             kwargs['max_level'] = max_level
+        if self._record('json_to_dataframe', **kwargs):
+            return self
+        if pa is not None and isinstance(self.raw_data, (pa.Table, pa.RecordBatch)):
+            if kwargs.get('record_path') is not None and set(kwargs) <= {'record_path', 'meta', 'sep', 'max_level'}:
+                self.raw_data = JsonFlattener(**kwargs).flatten(self.raw_data)
+                return self
+            self.raw_data = self.raw_data.to_pylist()  # options only json_normalize supports
         self.raw_data = pd.json_normalize(data=self.raw_data, **kwargs)
         return self
 
+    @instrumented('transform')
     def replace_values(self, col: str, to_replace, value, **kwargs):
         '''
         Replaces occurrences of `to_replace` in the specified column with `value`.
@@ -39,11 +355,14 @@ class Transformer():
         :param kwargs: Any additional keyword arguments supported by pd.Series.replace are supported.
         :return: Returns instance of the Transformer object with updated attributes. This makes method chaining possible.
         '''
-        if col not in self.raw_data.columns:
-            raise ValueError(f"The column {col} does not exist in the DataFrame.")
-        self.raw_data[col] = self.raw_data[col].replace(to_replace, value, **kwargs)
+        if self._record('replace_values', col=col, to_replace=to_replace, value=value, **kwargs):
+            return self
+        self._check_column(col)
+        self.raw_data[col] = _apply_column_step(self.raw_data[col], 'replace_values',
+                                                dict(to_replace=to_replace, value=value, **kwargs))
         return self
 
+    @instrumented('transform')
     def fill_missing_values(self, col: str, fill_value='', **kwargs):
         '''
         Fills missing/null values in the specified column with a defined value.
@@ -52,11 +371,14 @@ class Transformer():
         :param kwargs: Any additional keyword arguments supported by pd.Series.fillna are supported.
         :return: Returns instance of the Transformer object with updated attributes. This makes method chaining possible.
         '''
-        if col not in self.raw_data.columns:
-            raise ValueError(f"The column {col} does not exist in the DataFrame.")
-        self.raw_data[col] = self.raw_data[col].fillna(fill_value, **kwargs)
+        if self._record('fill_missing_values', col=col, fill_value=fill_value, **kwargs):
+            return self
+        self._check_column(col)
+        self.raw_data[col] = _apply_column_step(self.raw_data[col], 'fill_missing_values',
+                                                dict(fill_value=fill_value, **kwargs))
         return self
 
+    @instrumented('transform')
     def explode_column(self, col: str, delimiter: str = ','):
         '''
         Expands the elements in a column split by a delimiter into rows.
@@ -64,16 +386,55 @@ class Transformer():
         :param delimiter: The delimiter used to split the column strings.
         :return: Returns instance of the Transformer object with updated attributes. This makes method chaining possible.
         '''
-        if col not in self.raw_data.columns:
-            raise ValueError(f'The column {col} does not exist in the DataFrame.')
+        if self._record('explode_column', col=col, delimiter=delimiter):
+            return self
+        self._check_column(col)
         self.raw_data[col] = self.raw_data[col].str.split(delimiter)
         self.raw_data = self.raw_data.explode(col)
         return self
 
+    def explain(self) -> str:
+        '''
+        Describes the optimized plan that get_data will run for the recorded (not yet applied) steps.
+        :return: A numbered, human-readable listing of the plan.
+        '''
+        def describe(method, kwargs):
+            arguments = ', '.join(f'{key}={value!r}' for key, value in kwargs.items())
+            return f'{method}({arguments})'
+
+        lines = []
+        for number, (method, kwargs) in enumerate(optimize_plan(self.pending), start=1):
+            if method == 'fused_column':
+                fused = ' -> '.join(describe(*step) for step in kwargs['steps'])
+                lines.append(f'{number}. fused_column(col={kwargs["col"]!r}): {fused}')
+            else:
+                lines.append(f'{number}. {describe(method, kwargs)}')
+        return '\n'.join(lines) if lines else '(no pending steps)'
+
+    @instrumented('transform')
     def get_data(self):
         '''
         Returns the current state of the data in the Transformer object. Useful for further analysis or processing
-        outside the class.
-        :return: A pandas DataFrame containing the transformed data.
+        outside the class. In lazy mode the recorded steps are optimized and applied first.
+        :return: A pandas DataFrame containing the transformed data. In streaming mode, a generator of transformed
+                 DataFrame chunks.
         '''
+        plan, self.pending = optimize_plan(self.pending), []
+        if self.streaming:
+            return self._stream(plan)
+        if plan and self._use_process_pool(plan):
+            self.raw_data = execute_plan_parallel(self.raw_data, plan, self.partitions, self.max_workers)
+        elif plan:
+            self.raw_data = execute_plan(self.raw_data, plan)
         return self.raw_data
+
+    def _use_process_pool(self, plan: list) -> bool:
+        '''
+        Decides whether a plan runs in the process pool: only in parallel mode, for dataframes of at least
+        parallel_threshold rows and for plans without json_to_dataframe (which needs the whole JSON document).
+        :param plan: The optimized plan.
+        :return: True if the plan should run in the process pool.
+        '''
+        return (self.parallel and isinstance(self.raw_data, pd.DataFrame)
+                and len(self.raw_data) >= self.parallel_threshold
+                and all(method != 'json_to_dataframe' for method, _ in plan))
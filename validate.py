@@ -0,0 +1,370 @@
+from instrument import instrumented
+from collections.abc import Iterator
+import json
+import re
+import time
+import numpy as np
+import pandas as pd
+
+_DTYPE_CHECKS = {'int': pd.api.types.is_integer_dtype, 'integer': pd.api.types.is_integer_dtype,
+                 'float': pd.api.types.is_float_dtype, 'numeric': pd.api.types.is_numeric_dtype,
+                 'bool': pd.api.types.is_bool_dtype, 'datetime': pd.api.types.is_datetime64_any_dtype,
+                 'string': lambda dtype: pd.api.types.is_string_dtype(dtype) or pd.api.types.is_object_dtype(dtype),
+                 'category': lambda dtype: isinstance(dtype, pd.CategoricalDtype)}
+
+
+class ValidationError(ValueError):
+    '''
+    Raised by Validator.validate when an error-severity expectation fails. The report attribute holds the full
+    validation report.
+    '''
+
+    def __init__(self, report: dict) -> None:
+        self.report = report
+        failures = [result['expectation'] + (f'({result["column"]})' if result['column'] is not None else '') +
+                    f': {result["failed_rows"]:,} of {result["checked_rows"]:,} failed' for result in report['results']
+                    if not result['passed'] and result['severity'] == 'error']
+        super().__init__('Validation failed: ' + '; '.join(failures))
+
+
+class Validator():
+    '''
+    The Validator class checks extracted data against a list of expectations (column presence, row counts, dtypes,
+    null ratios, value ranges, allowed values, uniqueness and regex patterns) before it reaches a Transformer, so a
+    bad load is stopped instead of surfacing as an empty or corrupt output downstream. Every expectation is evaluated
+    as a vectorized pass over its column, with the null mask of each column computed once and shared. Each expectation
+    tolerates a ratio of failing rows (max_ratio) and is either an error, which fails validation, or a warning, which
+    is only reported. Large inputs can be validated on a random sample, and streams of chunks are validated as they
+    pass through, stopping at the first chunk that fails.
+    Expectation methods return the Validator, so calls can be chained.
+    Methods: expect_columns, expect_row_count, expect_dtype, expect_not_null, expect_range, expect_values,
+             expect_unique, expect_pattern, check, validate, to_json
+    '''
+
+    def __init__(self, data=None, expectations: list = None, sample: float | int = None, seed: int = 0,
+                 fail_fast: bool = False, max_examples: int = 5) -> None:
+        '''
+        Initializes the Validator object.
+        :param data: The data to validate: a pandas dataframe, a Transformer or an iterator of dataframe chunks. May
+                     instead be passed to check or validate.
+        :param expectations: Expectations as dictionaries naming an expect_ method and its arguments, e.g. -
+                             [{"expect": "not_null", "col": "id"}, {"expect": "range", "col": "mpg", "min": 0}].
+        :param sample: A fraction (0 < sample < 1) or a number of rows to validate, chosen at random, instead of every
+                       row. Duplicates outside the sample are not detected. Default is None, which checks every row.
+        :param seed: The random seed of the sample. Default is 0.
+        :param fail_fast: Whether to stop evaluating at the first failed error expectation. Default is False.
+        :param max_examples: The number of failing values included in the report of each expectation. Default is 5.
+        '''
+        self.data = data
+        self.sample = sample
+        self.seed = seed
+        self.fail_fast = fail_fast
+        self.max_examples = max_examples
+        self.expectations = []
+        self.report = None
+        for expectation in expectations or []:
+            expectation = dict(expectation)
+            getattr(self, f'expect_{expectation.pop("expect")}')(**expectation)
+
+    def _expect(self, expectation: str, col=None, max_ratio: float = 0.0, severity: str = 'error', **params):
+        if severity not in ('error', 'warn'):
+            raise ValueError('severity must be "error" or "warn".')
+        self.expectations.append({'expectation': expectation, 'column': col, 'max_ratio': max_ratio,
+                                  'severity': severity, 'params': params})
+        return self
+
+    def expect_columns(self, columns: list, exact: bool = False, severity: str = 'error'):
+        '''
+        Expects columns to be present.
+        :param columns: The required column names.
+        :param exact: Whether no other columns may be present. Default is False.
+        :param severity: 'error' to fail validation or 'warn' to only report. Default is 'error'.
+        :return: The Validator.
+        '''
+        return self._expect('columns', severity=severity, columns=list(columns), exact=exact)
+
+    def expect_row_count(self, min: int = 1, max: int = None, severity: str = 'error'):
+        '''
+        Expects the number of rows to be within bounds. The default catches empty extracts.
+        :param min: The fewest rows allowed. Default is 1.
+        :param max: The most rows allowed. Default is no limit.
+        :param severity: 'error' to fail validation or 'warn' to only report. Default is 'error'.
+        :return: The Validator.
+        '''
+        return self._expect('row_count', severity=severity, min=min, max=max)
+
+    def expect_dtype(self, col: str, dtype: str, severity: str = 'error'):
+        '''
+        Expects a column to have a dtype.
+        :param col: The column name.
+        :param dtype: A kind (int, float, numeric, bool, datetime, string or category) or an exact dtype name.
+        :param severity: 'error' to fail validation or 'warn' to only report. Default is 'error'.
+        :return: The Validator.
+        '''
+        return self._expect('dtype', col, severity=severity, dtype=dtype)
+
+    def expect_not_null(self, col: str, max_ratio: float = 0.0, severity: str = 'error'):
+        '''
+        Expects a column to have no more than a ratio of null values.
+        :param col: The column name.
+        :param max_ratio: The largest ratio of null values allowed. Default is 0.
+        :param severity: 'error' to fail validation or 'warn' to only report. Default is 'error'.
+        :return: The Validator.
+        '''
+        return self._expect('not_null', col, max_ratio, severity)
+
+    def expect_range(self, col: str, min=None, max=None, max_ratio: float = 0.0, severity: str = 'error'):
+        '''
+        Expects the non-null values of a column to be within inclusive bounds.
+        :param col: The column name.
+        :param min: The smallest value allowed. Default is no lower bound.
+        :param max: The largest value allowed. Default is no upper bound.
+        :param max_ratio: The largest ratio of out of range rows allowed. Default is 0.
+        :param severity: 'error' to fail validation or 'warn' to only report. Default is 'error'.
+        :return: The Validator.
+        '''
+        return self._expect('range', col, max_ratio, severity, min=min, max=max)
+
+    def expect_values(self, col: str, values: list, max_ratio: float = 0.0, severity: str = 'error'):
+        '''
+        Expects the non-null values of a column to be one of a set of values.
+        :param col: The column name.
+        :param values: The allowed values.
+        :param max_ratio: The largest ratio of rows with other values allowed. Default is 0.
+        :param severity: 'error' to fail validation or 'warn' to only report. Default is 'error'.
+        :return: The Validator.
+        '''
+        return self._expect('values', col, max_ratio, severity, values=list(values))
+
+    def expect_unique(self, col: str | list, max_ratio: float = 0.0, severity: str = 'error'):
+        '''
+        Expects the non-null values of a column, or the combinations of values of several columns, to be unique.
+        Across the chunks of a stream, rows are compared by a 64-bit hash.
+        :param col: The column name, or a list of column names.
+        :param max_ratio: The largest ratio of duplicate rows (beyond the first occurrence) allowed. Default is 0.
+        :param severity: 'error' to fail validation or 'warn' to only report. Default is 'error'.
+        :return: The Validator.
+        '''
+        return self._expect('unique', col, max_ratio, severity)
+
+    def expect_pattern(self, col: str, pattern: str, max_ratio: float = 0.0, severity: str = 'error'):
+        '''
+        Expects the non-null values of a column to fully match a regular expression.
+        :param col: The column name.
+        :param pattern: The regular expression.
+        :param max_ratio: The largest ratio of non-matching rows allowed. Default is 0.
+        :param severity: 'error' to fail validation or 'warn' to only report. Default is 'error'.
+        :return: The Validator.
+        '''
+        re.compile(pattern)  # raises on an invalid pattern now rather than mid-load
+        return self._expect('pattern', col, max_ratio, severity, pattern=pattern)
+
+    def _sample(self, data: pd.DataFrame) -> pd.DataFrame:
+        '''
+        Draws the configured random sample of a dataframe.
+        '''
+        if self.sample is None:
+            return data
+        rows = round(len(data) * self.sample) if self.sample < 1 else int(self.sample)
+        return data if rows >= len(data) else data.sample(n=rows, random_state=self.seed)
+
+    def _failures(self, expectation: dict, data: pd.DataFrame, present: dict, seen: dict, rows: int) -> tuple:
+        '''
+        Evaluates one expectation against a dataframe.
+        :param expectation: The expectation, as added by _expect.
+        :param data: The dataframe, sample or chunk to check.
+        :param present: Per-column non-null masks, computed once per column and shared between expectations.
+        :param seen: Row hashes of earlier chunks, per uniqueness expectation, when validating a stream.
+        :param rows: The number of rows of the whole input, which may be larger than a sample or chunk.
+        :return: A tuple of the number of failing rows, the number of rows checked and a mask or list of examples.
+        '''
+        name, col, params = expectation['expectation'], expectation['column'], expectation['params']
+        if name == 'columns':
+            missing = [column for column in params['columns'] if column not in data.columns]
+            extra = [column for column in data.columns if column not in params['columns']] if params['exact'] else []
+            return len(missing) + len(extra), len(params['columns']), missing + extra
+        if name == 'row_count':
+            failed = rows < (params['min'] or 0) or (params['max'] is not None and rows > params['max'])
+            return int(failed), 1, [rows] if failed else []
+        columns = col if isinstance(col, list) else [col]
+        missing = [column for column in columns if column not in data.columns]
+        if missing:
+            return len(data) or 1, len(data) or 1, [f'missing column {column}' for column in missing]
+        if name == 'dtype':
+            dtype = data[col].dtype
+            check = _DTYPE_CHECKS.get(params['dtype'], lambda actual: str(actual) == params['dtype'])
+            return int(not check(dtype)), 1, [] if check(dtype) else [str(dtype)]
+        if name == 'unique' and isinstance(col, list):
+            keys = data[col]
+        else:
+            if col not in present:
+                present[col] = data[col].notna().to_numpy()
+            if name == 'not_null':
+                return int((~present[col]).sum()), len(data), ~present[col]
+            keys = data[col]
+        if name == 'unique':
+            mask = present[col] if not isinstance(col, list) else np.ones(len(data), dtype=bool)
+            if seen is None:
+                bad = keys.duplicated().to_numpy() & mask
+            else:  # a stream: compare hashes with every earlier chunk
+                hashes = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+                earlier = seen.setdefault(id(expectation), set())
+                bad = (pd.Series(hashes).duplicated().to_numpy()
+                       | np.fromiter(map(earlier.__contains__, hashes.tolist()), dtype=bool, count=len(hashes)))
+                bad &= mask
+                earlier.update(hashes[mask].tolist())
+            return int(bad.sum()), len(data), bad
+        values = keys[present[col]]
+        if name == 'range':
+            if values.dtype == object or pd.api.types.is_string_dtype(values.dtype):
+                values = pd.to_numeric(values, errors='coerce')  # e.g. - '12' is compared as 12
+            bad = values.isna()  # values that are not numbers fail, and are reported as examples
+            if params['min'] is not None:
+                bad |= values < params['min']
+            if params['max'] is not None:
+                bad |= values > params['max']
+        elif name == 'values':
+            bad = ~values.isin(params['values'])
+        else:
+            bad = ~values.astype(str).str.fullmatch(params['pattern']).fillna(False).astype(bool)
+        mask = np.zeros(len(data), dtype=bool)
+        mask[present[col]] = bad.to_numpy(dtype=bool)
+        return int(mask.sum()), len(data), mask
+
+    def _evaluate(self, data: pd.DataFrame, pairs: list, rows: int, seen: dict = None) -> bool:
+        '''
+        Evaluates expectations against a dataframe (or a chunk of a stream), adding to their running totals.
+        :param data: The dataframe, sample or chunk to check.
+        :param pairs: (expectation, totals) pairs to evaluate.
+        :param rows: The number of rows of the whole input, for row_count.
+        :param seen: Row hashes of earlier chunks, per uniqueness expectation, when validating a stream.
+        :return: Whether any error expectation has failed, over every chunk evaluated so far.
+        '''
+        present = {}
+        failed = False
+        for expectation, result in pairs:
+            if failed and self.fail_fast:
+                break
+            failures, checked, detail = self._failures(expectation, data, present, seen, rows)
+            table_level = expectation['expectation'] in ('columns', 'row_count', 'dtype')
+            result['evaluated'] = True
+            result['failed_rows'] = failures if table_level else result['failed_rows'] + failures
+            result['checked_rows'] = checked if table_level else result['checked_rows'] + checked
+            if isinstance(detail, np.ndarray):
+                column = expectation['column']
+                detail = data.loc[detail, column].head(self.max_examples)
+                detail = detail.to_dict('records') if isinstance(column, list) else detail.tolist()
+            result['examples'] = (result['examples'] + list(detail))[:self.max_examples]
+            ratio = result['failed_rows'] / result['checked_rows'] if result['checked_rows'] else 0.0
+            result['failed_ratio'] = ratio
+            result['passed'] = (result['failed_rows'] == 0) if table_level else ratio <= expectation['max_ratio']
+            failed = failed or (not result['passed'] and expectation['severity'] == 'error')
+        return failed
+
+    def _start(self) -> list:
+        '''
+        Creates the running totals of every expectation.
+        :return: A list of (expectation, totals) pairs.
+        '''
+        return [(expectation, {'expectation': expectation['expectation'], 'column': expectation['column'],
+                               'severity': expectation['severity'], 'max_ratio': expectation['max_ratio'],
+                               'passed': True, 'failed_rows': 0, 'checked_rows': 0, 'failed_ratio': 0.0,
+                               'examples': [], 'evaluated': False})
+                for expectation in self.expectations]
+
+    def _report(self, pairs: list, rows: int, rows_checked: int, start: float) -> dict:
+        totals = [result for _, result in pairs]
+        results = [{key: value for key, value in result.items() if key != 'evaluated'} for result in totals
+                   if result['evaluated']]
+        skipped = [result['expectation'] for result in totals if not result['evaluated']]
+        passed = all(result['passed'] or result['severity'] == 'warn' for result in results)
+        return {'passed': passed, 'rows': rows, 'rows_checked': rows_checked, 'sampled': rows_checked < rows,
+                'seconds': time.perf_counter() - start, 'results': results, 'skipped': skipped}
+
+    def _resolve_data(self, data):
+        data = self.data if data is None else data
+        if data is None:
+            raise ValueError('Data must be set at initialization or provided.')
+        if hasattr(data, 'get_data'):  # Transformer
+            data = data.get_data()
+        return data
+
+    @instrumented('validate')
+    def check(self, data=None) -> dict:
+        '''
+        Validates data without raising. A stream is consumed to be checked; use validate to check a stream while
+        passing it on.
+        :param data: The data to validate. If not provided, the data given at initialization is used.
+        :return: The report: passed, rows, rows_checked, sampled, seconds, skipped (expectations not evaluated after a
+                 fail-fast stop) and results, with the expectation, column, severity, max_ratio, passed, failed_rows,
+                 checked_rows, failed_ratio and example failing values of each expectation.
+        '''
+        data = self._resolve_data(data)
+        if isinstance(data, Iterator):
+            try:
+                for _ in self._validate_stream(data):
+                    pass
+            except ValidationError:
+                pass
+            return self.report
+        return self._check(data)
+
+    def _check(self, data: pd.DataFrame) -> dict:
+        start = time.perf_counter()
+        pairs = self._start()
+        sample = self._sample(data)
+        self._evaluate(sample, pairs, len(data))
+        self.report = self._report(pairs, len(data), len(sample), start)
+        return self.report
+
+    @instrumented('validate')
+    def validate(self, data=None):
+        '''
+        Validates data and passes it on, raising a ValidationError if an error expectation fails. A stream of chunks
+        is validated chunk by chunk as it is consumed, and the error is raised at the first chunk that takes the
+        failures of an expectation over its max_ratio. The report is kept in the report attribute.
+        :param data: The data to validate. If not provided, the data given at initialization is used.
+        :return: The data (a Transformer's data), or a generator of the chunks of a stream.
+        '''
+        data = self._resolve_data(data)
+        if isinstance(data, Iterator):
+            return self._validate_stream(data)
+        if not self._check(data)['passed']:
+            raise ValidationError(self.report)
+        return data
+
+    def _validate_stream(self, chunks: Iterator) -> Iterator[pd.DataFrame]:
+        '''
+        Generator backing validate for streams. Columns and dtype are checked on each chunk and row_count on the
+        total once the stream ends.
+        :param chunks: An iterator of dataframes.
+        :return: A generator of the same chunks, which raises ValidationError at the first chunk that fails.
+        '''
+        start = time.perf_counter()
+        pairs, seen = self._start(), {}
+        per_chunk = [pair for pair in pairs if pair[0]['expectation'] != 'row_count']
+        rows = rows_checked = 0
+        for chunk in chunks:
+            sample = self._sample(chunk)
+            rows += len(chunk)
+            rows_checked += len(sample)
+            if self._evaluate(sample, per_chunk, rows, seen):
+                self.report = self._report(pairs, rows, rows_checked, start)
+                raise ValidationError(self.report)
+            yield chunk
+        self._evaluate(None, [pair for pair in pairs if pair[0]['expectation'] == 'row_count'], rows)
+        self.report = self._report(pairs, rows, rows_checked, start)
+        if not self.report['passed']:
+            raise ValidationError(self.report)
+
+    def to_json(self, path: str = None) -> str:
+        '''
+        Serializes the last report to JSON.
+        :param path: If provided, the JSON is also written to this file.
+        :return: The JSON document.
+        '''
+        text = json.dumps(self.report, indent=2, default=str)
+        if path is not None:
+            with open(path, 'w') as file:
+                file.write(text)
+        return text